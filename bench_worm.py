@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the Worm skill's hot paths.
+
+Measures, on synthetic knowledge bases scaled 1x/10x/100x from the real one:
+
+    startup.*    fresh-interpreter import time (-X importtime) and wall clock to
+                 the first classification (target: STARTUP_TARGET_MS)
+    init.*       WormSkill() construction, cold index/store build, warm open
+    process.*    process() latency, both modes, short and multi-KB inputs (and
+                 with retrieved passages as reasoning sources)
+    search.*     search_knowledge_base() latency, common / rare / multi-term /
+                 phrase / misspelled (fuzzy-corrected) queries; semantic_search()
+    batch.*      process_batch() throughput
+    generate.*   aprocess_many() throughput against the fake LLM backend
+                 (simulated latency; num_variants=5 is one call per record)
+    dedup.*      MinHash/LSH near-duplicate index: insert throughput, query
+                 latency and reopen time over synthetic submissions
+    extract.*    extract_pdf_text() throughput on generated PDFs (needs PyMuPDF)
+
+Results are written as JSON; pass a previous run as --baseline to print the
+change per metric and flag regressions beyond --threshold.
+
+Usage:
+    python bench_worm.py                               # all scales -> bench_results.json
+    python bench_worm.py --scales 1 --output new.json --baseline bench_results.json
+"""
+
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from worm_kb_io import KnowledgeBaseWriter, iter_kb_sources, read_kb_header
+from worm_skill import WormSkill
+from worm_stem import stem
+
+
+TRIGGER_SHORT = ("A teenage girl is locked in a school locker for hours. She feels helpless, "
+                 "isolated and betrayed by her former best friend.")
+POWER_SHORT = "Controls insects within a few blocks, sensing everything they sense."
+# Paragraph repeated into multi-KB inputs
+TRIGGER_FILLER = ("Trapped under the rubble after the fire, he screamed for help while his family "
+                  "went silent one by one; desperate, alone and furious at the people who left. ")
+POWER_FILLER = ("She can project force fields, teleport short distances and create duplicates "
+                "that explode, while a danger sense warns her of incoming attacks. ")
+
+COMMON_QUERY = "power"
+MULTI_QUERY = "trigger event"
+PHRASE_QUERY = '"trigger event"'
+FUZZY_QUERY = "tirgger evnet"
+SEMANTIC_QUERY = "exposed and noticed by everyone, nowhere to hide"
+
+# Budget for import + WormSkill() + first process() in a fresh interpreter
+STARTUP_TARGET_MS = 50.0
+
+# Run in a fresh interpreter: time from first import to first classification
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from worm_skill import WormSkill
+imported = time.perf_counter()
+skill = WormSkill()
+constructed = time.perf_counter()
+skill.process({"mode": "trigger_to_power", "trigger_description": "Trapped alone in the fire"})
+done = time.perf_counter()
+print(json.dumps({"import": imported - start, "construct": constructed - imported,
+                  "first_process": done - constructed, "first_result": done - start}))
+"""
+
+# Metrics where a bigger number is better; everything else is a latency
+HIGHER_IS_BETTER = ("records_per_s", "pages_per_s")
+
+
+def measure(func: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Latency statistics of func in milliseconds."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "unit": "ms",
+        "n": repeat,
+        "mean": round(statistics.fmean(samples), 4),
+        "p50": round(samples[len(samples) // 2], 4),
+        "p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "min": round(samples[0], 4),
+    }
+
+
+def bench_startup(runs: int) -> Dict[str, Dict[str, Any]]:
+    """Cold-start cost, each run in a new interpreter (bytecode caches allowed, as in production)."""
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+    cwd = Path(__file__).parent
+
+    def run_once() -> Dict[str, float]:
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=cwd, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        return {**json.loads(out), "interpreter_wall": time.perf_counter() - start}
+
+    run_once()  # Writes .pyc files and the compiled matcher artifact
+    samples = [run_once() for _ in range(runs)]
+
+    results = {}
+    for stage in ("import", "construct", "first_process", "first_result", "interpreter_wall"):
+        values = sorted(sample[stage] * 1000 for sample in samples)
+        results[f"startup.{stage}"] = {
+            "unit": "ms", "n": runs,
+            "mean": round(statistics.fmean(values), 4),
+            "p50": round(values[len(values) // 2], 4),
+            "min": round(values[0], 4),
+        }
+
+    # Cumulative import time of worm_skill as reported by the interpreter (microseconds)
+    trace = subprocess.run([sys.executable, "-X", "importtime", "-c", "import worm_skill"], cwd=cwd, env=env,
+                           capture_output=True, text=True, check=True).stderr
+    for line in trace.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == "worm_skill":
+            results["startup.importtime_worm_skill"] = {"unit": "ms", "n": 1, "mean": round(int(parts[1]) / 1000, 4)}
+
+    first_result = results["startup.first_result"]["p50"]
+    status = "within" if first_result <= STARTUP_TARGET_MS else "[!] OVER"
+    print(f"[*] First classification after {first_result:.1f} ms ({status} {STARTUP_TARGET_MS:.0f} ms target)",
+          file=sys.stderr)
+    return results
+
+
+def make_scaled_kb(source_kb: Path, scale: int, out_path: Path) -> None:
+    """Write a knowledge base holding `scale` renamed copies of every source."""
+    with KnowledgeBaseWriter(out_path, read_kb_header(source_kb)) as writer:
+        for copy in range(scale):
+            for name, data in iter_kb_sources(source_kb):
+                writer.write_source(name if copy == 0 else f"copy{copy}_{name}", data)
+
+
+def rare_query(skill: WormSkill) -> str:
+    """A word with the lowest document frequency in the corpus (deterministic pick)."""
+    words = {term: len(postings) for term, postings in skill.index.postings.items()
+             if term.isalpha() and len(term) > 5 and stem(term) == term}
+    lowest = min(words.values())
+    rare = sorted(term for term, df in words.items() if df == lowest)
+    return rare[len(rare) // 2]
+
+
+def bench_scale(source_kb: Path, scale: int, workdir: Path, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """Run the KB-dependent benchmarks on one scaled corpus."""
+    results: Dict[str, Dict[str, Any]] = {}
+    kb_path = workdir / f"kb_{scale}x.json"
+    make_scaled_kb(source_kb, scale, kb_path)
+    tag = f"@{scale}x"
+
+    # Construction is lazy; the index/store are built on first search, then reopened from disk
+    results["init.construct" + tag] = measure(lambda: WormSkill(str(kb_path), cache=False), repeat, warmup=0)
+    start = time.perf_counter()
+    skill = WormSkill(str(kb_path), cache=False)
+    skill.index, skill.store
+    results["init.cold_build" + tag] = {"unit": "ms", "n": 1, "mean": round((time.perf_counter() - start) * 1000, 4)}
+
+    def warm_open():
+        warm = WormSkill(str(kb_path), cache=False)
+        warm.index, warm.store
+        warm.store.close()
+    results["init.warm_open" + tag] = measure(warm_open, max(3, repeat // 10), warmup=0)
+
+    rare = rare_query(skill)
+    skill.fuzzy
+    for label, query in (("common", COMMON_QUERY), ("rare", rare), ("multi", MULTI_QUERY),
+                         ("phrase", PHRASE_QUERY), ("fuzzy", FUZZY_QUERY)):
+        results[f"search.{label}{tag}"] = measure(lambda: skill.search_knowledge_base(query), repeat)
+    results["search.unranked" + tag] = measure(lambda: skill.search_knowledge_base(COMMON_QUERY, ranked=False), repeat)
+    if skill.semantic is not None:
+        results["search.semantic" + tag] = measure(lambda: skill.semantic_search(SEMANTIC_QUERY), repeat)
+
+    skill.store.close()
+    return results
+
+
+def bench_process(repeat: int) -> Dict[str, Dict[str, Any]]:
+    """process() latency; independent of KB size, cache disabled."""
+    skill = WormSkill(cache=False)
+    inputs = {
+        "trigger_short": {"mode": "trigger_to_power", "trigger_description": TRIGGER_SHORT},
+        "trigger_4kb": {"mode": "trigger_to_power", "trigger_description": TRIGGER_FILLER * 25},
+        "power_short": {"mode": "power_to_trigger", "power_description": POWER_SHORT},
+        "power_4kb": {"mode": "power_to_trigger", "power_description": POWER_FILLER * 28},
+    }
+    results = {f"process.{name}": measure(lambda: skill.process(data), repeat) for name, data in inputs.items()}
+
+    passages = WormSkill(cache=False, passages=True)
+    if passages.semantic is not None:
+        results["process.trigger_passages"] = measure(lambda: passages.process(inputs["trigger_short"]), repeat)
+    return results
+
+
+def bench_batch(records: int, workers: int) -> Dict[str, Dict[str, Any]]:
+    """process_batch() throughput on varied records (cache disabled so every record is analysed)."""
+    rng = random.Random(0)
+    words = (TRIGGER_FILLER + POWER_FILLER).split()
+    batch = [
+        {"mode": "trigger_to_power", "trigger_description": " ".join(rng.choices(words, k=40))}
+        if i % 2 else
+        {"mode": "power_to_trigger", "power_description": " ".join(rng.choices(words, k=30))}
+        for i in range(records)
+    ]
+    skill = WormSkill(cache=False)
+    results = {}
+    for n in sorted({1, workers}):
+        start = time.perf_counter()
+        count = sum(1 for _ in skill.process_batch(batch, workers=n))
+        elapsed = time.perf_counter() - start
+        results[f"batch.workers{n}"] = {"unit": "records_per_s", "n": count, "mean": round(count / elapsed, 1)}
+    return results
+
+
+def bench_generate(records: int, latency: float = 0.02) -> Dict[str, Dict[str, Any]]:
+    """aprocess_many() throughput with FakeBackend; reports backend calls per record."""
+    import asyncio
+    from worm_llm import FakeBackend
+
+    backend = FakeBackend(latency=latency)
+    skill = WormSkill(cache=False, llm=backend)
+    batch = [{"mode": "power_to_trigger", "power_description": f"{POWER_SHORT} ({i})", "num_variants": 5}
+             for i in range(records)]
+
+    start = time.perf_counter()
+    results = asyncio.run(skill.aprocess_many(batch))
+    elapsed = time.perf_counter() - start
+    return {
+        "generate.variants5": {"unit": "records_per_s", "n": len(results), "mean": round(len(results) / elapsed, 1)},
+        "generate.calls_per_record": {"unit": "calls", "n": len(results), "mean": round(backend.calls / len(results), 2)},
+    }
+
+
+def bench_dedup(workdir: Path, entries: int, repeat: int) -> Dict[str, Dict[str, Any]]:
+    """DedupIndex inserts, queries and reopening with `entries` synthetic submissions."""
+    from worm_dedup import DedupIndex
+
+    rng = random.Random(0)
+    words = (TRIGGER_FILLER + POWER_FILLER).split()
+    texts = [" ".join(f"{rng.choice(words)}{rng.randrange(100)}" for _ in range(30)) for _ in range(entries)]
+
+    index = DedupIndex()
+    start = time.perf_counter()
+    for i, text in enumerate(texts):
+        index.add(f"s{i}", text)
+    elapsed = time.perf_counter() - start
+    results = {"dedup.insert": {"unit": "records_per_s", "n": entries, "mean": round(entries / elapsed, 1)}}
+
+    # A submission with one word changed (found) and an unrelated one (no candidates)
+    near = texts[entries // 2].split()
+    near[3] = "changed"
+    results["dedup.query_near"] = measure(lambda: index.query(" ".join(near)), repeat)
+    results["dedup.query_new"] = measure(lambda: index.query(TRIGGER_SHORT), repeat)
+
+    path = workdir / "bench.dedup"
+    index.save(path)
+    results["dedup.open"] = measure(lambda: DedupIndex.open(path).close(), max(3, repeat // 10), warmup=0)
+    return results
+
+
+def bench_extract(workdir: Path, pages: int) -> Dict[str, Dict[str, Any]]:
+    """extract_pdf_text() throughput on a generated PDF; skipped without PyMuPDF."""
+    try:
+        import fitz
+        from extract_pdfs import extract_pdf_text
+    except ImportError:
+        print("[!] PyMuPDF not installed - skipping extract benchmark", file=sys.stderr)
+        return {}
+
+    pdf_path = workdir / "synthetic.pdf"
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), f"Page {n}\n\n" + (TRIGGER_FILLER + "\n\n") * 8, fontsize=9)
+    doc.save(str(pdf_path))
+    doc.close()
+
+    start = time.perf_counter()
+    extracted = extract_pdf_text(str(pdf_path))
+    elapsed = time.perf_counter() - start
+    return {"extract.pdf": {"unit": "pages_per_s", "n": len(extracted), "mean": round(len(extracted) / elapsed, 1)}}
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float) -> List[str]:
+    """Print per-metric change against a baseline; return the regressed metric names."""
+    regressions = []
+    print(f"\n{'metric':<32} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, current in results.items():
+        old = baseline.get(name)
+        # Medians are compared where available: they shrug off one-off stalls
+        stat = "p50" if "p50" in current and old and "p50" in old else "mean"
+        if not old or not old.get(stat):
+            print(f"{name:<32} {'-':>12} {current[stat]:>12} {'new':>9}")
+            continue
+        change = (current[stat] - old[stat]) / old[stat]
+        worse = -change if current["unit"] in HIGHER_IS_BETTER else change
+        flag = " [!]" if worse > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<32} {old[stat]:>12} {current[stat]:>12} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the Worm skill's hot paths")
+    parser.add_argument("--kb", default="worm_knowledge_base.json", help="Knowledge base the synthetic corpora are scaled from")
+    parser.add_argument("--scales", default="1,10,100", help="Comma-separated corpus scale factors")
+    parser.add_argument("--repeat", type=int, default=50, help="Iterations per latency benchmark")
+    parser.add_argument("--startup-runs", type=int, default=10, help="Fresh interpreters in the startup benchmark")
+    parser.add_argument("--batch-records", type=int, default=20000, help="Records in the batch benchmark")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Pool size for the parallel batch run")
+    parser.add_argument("--generate-records", type=int, default=200,
+                        help="Records in the generation benchmark (fake backend)")
+    parser.add_argument("--dedup-entries", type=int, default=50000,
+                        help="Synthetic submissions in the near-duplicate benchmark")
+    parser.add_argument("--pdf-pages", type=int, default=200, help="Pages in the synthetic PDF")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--baseline", help="Previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 if any metric regressed")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    results: Dict[str, Dict[str, Any]] = {}
+
+    with tempfile.TemporaryDirectory(prefix="worm_bench_") as tmp:
+        workdir = Path(tmp)
+        print("[*] cold start...", file=sys.stderr)
+        results.update(bench_startup(args.startup_runs))
+        print("[*] process() latency...", file=sys.stderr)
+        results.update(bench_process(args.repeat))
+        print("[*] batch throughput...", file=sys.stderr)
+        results.update(bench_batch(args.batch_records, args.workers))
+        print("[*] LLM generation (fake backend)...", file=sys.stderr)
+        results.update(bench_generate(args.generate_records))
+        print("[*] near-duplicate index...", file=sys.stderr)
+        results.update(bench_dedup(workdir, args.dedup_entries, args.repeat))
+        for scale in scales:
+            print(f"[*] search/init at {scale}x corpus...", file=sys.stderr)
+            results.update(bench_scale(Path(args.kb), scale, workdir, args.repeat))
+        print("[*] PDF extraction...", file=sys.stderr)
+        results.update(bench_extract(workdir, args.pdf_pages))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "scales": scales,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[+] Results written to {args.output}", file=sys.stderr)
+
+    if not args.baseline:
+        for name, result in results.items():
+            print(f"{name:<32} {result['mean']:>12} {result['unit']}")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n[-] {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+        return 1 if args.fail_on_regression else 0
+    print("\n[+] No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
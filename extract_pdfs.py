@@ -1,86 +1,227 @@
 #!/usr/bin/env python3
-"""Extract text from all Worm PDFs and create knowledge base."""
+"""
+Extract text from all Worm PDFs and create knowledge base.
+
+The PDF list and page limit come from worm_unified_config.json. Extraction is
+incremental: every PDF is hashed, PDFs whose hash matches the existing
+knowledge base entry are kept as they are, and only new or changed files are
+re-extracted (in parallel, one PDF per worker process) and merged back in.
+
+The knowledge base is rewritten as a stream: unchanged sources are copied
+over one at a time, re-extracted PDFs are appended as their workers finish,
+and the new file replaces the old one atomically. Memory stays proportional
+to the PDFs in flight, not to the whole corpus. The sharded copy index.html
+reads (worm_shards) is refreshed afterwards, and the search index, page store
+and fuzzy trigram index are rebuilt so the first search does not wait for them.
+"""
 
 import os
 import json
+import hashlib
 import fitz  # PyMuPDF
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-def extract_pdf_text(pdf_path):
-    """Extract text from a single PDF."""
+from worm_kb_io import DEFAULT_HEADER, KnowledgeBaseWriter, iter_kb_sources, read_kb_header
+from worm_shards import shards_dir_for, write_shards
+from worm_skill import WormSkill
+from worm_text import chunk_page
+
+def file_sha256(path):
+    """Hash a file's bytes without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def extract_pdf_text(pdf_path, max_pages=0):
+    """
+    Extract text from a single PDF.
+
+    Each page carries its paragraph chunks: stable ids plus character offsets
+    into the page text, so search can index and quote chunks directly. Pages
+    also carry a hash of their text so downstream consumers can tell which
+    pages changed.
+
+    Args:
+        pdf_path: PDF file to read
+        max_pages: Only read the first N pages (0 = all)
+    """
     doc = fitz.open(pdf_path)
     full_text = []
+    source_name = Path(pdf_path).name
 
     for page_num, page in enumerate(doc, 1):
+        if max_pages and page_num > max_pages:
+            break
         text = page.get_text()
         if text.strip():
+            text = text.strip()
             full_text.append({
                 "page": page_num,
-                "text": text.strip()
+                "text": text,
+                "sha256": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+                "chunks": chunk_page(source_name, page_num, text)
             })
 
     doc.close()
     return full_text
 
-def main():
+def load_pdf_sources(config_path):
+    """Read (source key, path) pairs for every PDF listed in the config."""
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    base_dir = Path(config_path).parent
+    pdf_sources = [
+        (Path(source["path"]).name, base_dir / source["path"])
+        for source in config.get("sources", [])
+        if source.get("type") == "pdf"
+    ]
+    return pdf_sources, config.get("max_pages_per_pdf", 0)
+
+def scan_knowledge_base(kb_path):
+    """
+    Read the existing knowledge base's header and per-source metadata.
+
+    Page texts are dropped as each source is decoded; PDF entries keep only
+    their page hashes.
+
+    Returns:
+        (header, {source name: metadata})
+    """
+    if not kb_path.exists():
+        return dict(DEFAULT_HEADER), {}
+
+    sources = {}
+    for name, data in iter_kb_sources(kb_path):
+        meta = {k: v for k, v in data.items() if k != "content"}
+        if data.get("type") == "pdf":
+            meta["page_hashes"] = {p["page"]: p.get("sha256") for p in data.get("content", [])}
+        sources[name] = meta
+    return read_kb_header(kb_path), sources
+
+def extract_all(to_extract, max_pages, workers):
+    """
+    Extract PDFs in parallel.
+
+    Yields (name, pages or the exception raised) in input order, with at most
+    2 * workers PDFs pending so finished results do not pile up in memory.
+    """
+    def result(name, future):
+        try:
+            return name, future.result()
+        except Exception as e:
+            return name, e
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for name, pdf_path in to_extract:
+            pending.append((name, pool.submit(extract_pdf_text, str(pdf_path), max_pages)))
+            if len(pending) >= workers * 2:
+                yield result(*pending.popleft())
+        while pending:
+            yield result(*pending.popleft())
+
+def write_viewer_shards(kb_path):
+    """Refresh the sharded copy index.html reads (only changed parts are rewritten)."""
+    stats = write_shards(kb_path)
+    print(f"[+] Viewer shards: {stats['parts']} parts in {shards_dir_for(kb_path)} "
+          f"({stats['written']} rewritten, {stats['gzip_bytes'] // 1024}KB gzipped)")
+
+def write_search_artifacts(kb_path):
+    """Build the search index, page store and trigram index now rather than on the first search."""
+    stats = WormSkill(str(kb_path), cache=False).prepare_search()
+    print(f"[+] Search index: {stats['chunks']} chunks, {stats['words']} words in the trigram index")
+
+def main(argv=None):
     import sys
     import io
+    import argparse
 
     # Fix Windows console encoding
     if sys.platform == 'win32':
         sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
-    pdf_files = [
-        "BLASTERS.pdf",
-        "BREAKERS.pdf",
-        "BRUTE.pdf",
-        "CHANGER.pdf",
-        "MOVERS.pdf",
-        "PRT Quest.pdf",
-        "Sample Multitrigger.pdf",
-        "STRANGERS.pdf",
-        "STRIKERS.pdf",
-        "THINKERS.pdf",
-        "TINKERS.pdf",
-        "TRUMP.pdf",
-        "Механика-Триггеров.pdf",
-        "Триггеры.pdf",
-        "Триггеры-Изломов-_Breaker_.pdf",
-        "Триггеры-Козырей-_Trump_.pdf",
-        "Триггеры-Повелителей-_Master_.pdf"
-    ]
+    parser = argparse.ArgumentParser(description="Extract Worm PDFs into the knowledge base")
+    parser.add_argument("--config", default="worm_unified_config.json", help="Source config")
+    parser.add_argument("--output", default="worm_knowledge_base.json", help="Knowledge base to update")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Extraction processes")
+    parser.add_argument("--force", action="store_true", help="Re-extract every PDF even if unchanged")
+    args = parser.parse_args(argv)
 
-    knowledge_base = {
-        "name": "worm_trigger_power_prt",
-        "description": "Worm universe trigger-power knowledge base",
-        "sources": {}
-    }
+    pdf_sources, max_pages = load_pdf_sources(args.config)
+    output_file = Path(args.output)
+    header, existing = scan_knowledge_base(output_file)
 
-    for pdf_file in pdf_files:
-        pdf_path = Path(pdf_file)
+    # Decide what needs extracting
+    to_extract = []
+    hashes = {}
+    for name, pdf_path in pdf_sources:
         if not pdf_path.exists():
-            print(f"[!] Skipping {pdf_file} - not found")
+            if name in existing:
+                print(f"[!] {name} not found - keeping existing entry")
+            else:
+                print(f"[!] Skipping {name} - not found")
             continue
 
-        print(f"[*] Processing {pdf_file}...")
-        try:
-            text_data = extract_pdf_text(pdf_path)
-            knowledge_base["sources"][pdf_file] = {
+        hashes[name] = file_sha256(pdf_path)
+        entry = existing.get(name, {})
+        if (not args.force and entry.get("sha256") == hashes[name]
+                and entry.get("max_pages", 0) == max_pages):
+            print(f"[=] {name} unchanged")
+            continue
+        to_extract.append((name, pdf_path))
+
+    # Drop PDFs that are no longer configured (wiki sources are left alone)
+    configured = {name for name, _ in pdf_sources}
+    removed = {n for n, s in existing.items() if s.get("type") == "pdf" and n not in configured}
+    for name in sorted(removed):
+        print(f"[-] Removing {name} - no longer in {args.config}")
+
+    if not to_extract and not removed:
+        print("\n[=] Knowledge base already up to date")
+        if output_file.exists():
+            if not (shards_dir_for(output_file) / "manifest.json").exists():
+                write_viewer_shards(output_file)
+            write_search_artifacts(output_file)
+        return
+
+    replaced = {name for name, _ in to_extract}
+    with KnowledgeBaseWriter(output_file, header) as writer:
+        # Copy untouched sources across, one at a time
+        if output_file.exists():
+            for name, data in iter_kb_sources(output_file):
+                if name not in replaced and name not in removed:
+                    writer.write_source(name, data)
+
+        # Append new/changed PDFs as they are extracted
+        if to_extract:
+            print(f"[*] Extracting {len(to_extract)} PDF(s) with {args.workers} worker(s)...")
+        for name, text_data in extract_all(to_extract, max_pages, args.workers):
+            if isinstance(text_data, Exception):
+                print(f"[-] Error processing {name}: {text_data}")
+                if name in existing:
+                    # The original file is untouched until the writer commits
+                    writer.write_source(name, next(d for n, d in iter_kb_sources(output_file) if n == name))
+                continue
+
+            old_hashes = existing.get(name, {}).get("page_hashes", {})
+            changed = sum(1 for p in text_data if old_hashes.get(p["page"]) != p["sha256"])
+            writer.write_source(name, {
                 "type": "pdf",
                 "pages": len(text_data),
-                "content": text_data
-            }
-            print(f"[+] Extracted {len(text_data)} pages from {pdf_file}")
-        except Exception as e:
-            print(f"[-] Error processing {pdf_file}: {e}")
-
-    # Save knowledge base
-    output_file = Path("worm_knowledge_base.json")
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(knowledge_base, f, ensure_ascii=False, indent=2)
+                "sha256": hashes[name],
+                "max_pages": max_pages
+            }, content=text_data)
+            print(f"[+] Extracted {len(text_data)} pages from {name} ({changed} new or changed)")
 
     print(f"\n[+] Knowledge base saved to {output_file}")
-    print(f"[*] Total sources: {len(knowledge_base['sources'])}")
+    print(f"[*] Total sources: {writer.count}")
+    write_viewer_shards(output_file)
+    write_search_artifacts(output_file)
 
 if __name__ == "__main__":
     main()
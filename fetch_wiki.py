@@ -1,21 +1,162 @@
 #!/usr/bin/env python3
-"""Fetch Worm Wiki pages and add to knowledge base."""
+"""
+Fetch Worm Wiki pages and add to knowledge base.
+
+Pages come from the "documentation" sources in worm_unified_config.json.
+They are fetched concurrently over one pooled HTTP session, throttled by a
+token bucket refilled at the config's rate_limit (requests per second).
+ETag / Last-Modified validators from the previous run are sent back, so a
+page that has not changed costs a 304 instead of a full download. 429/5xx
+answers are retried a few times with backoff (honouring Retry-After), each
+retry taking its own token, so retries never exceed the rate limit; the
+session's adapter only retries failed connections.
+
+Only the article body (the source's "content" selector) is stored, as
+plain-text sections split at headings; the page HTML itself is not kept.
+
+Only the existing wiki entries are loaded; every other source is streamed
+from the old knowledge base into the new one, which then replaces it
+atomically. The sharded copy index.html reads (worm_shards) is refreshed
+afterwards, and the search index, page store and fuzzy trigram index are
+rebuilt.
+"""
 
 import json
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
+from urllib3.util.retry import Retry
+
+from worm_html import DEFAULT_CONTENT_SELECTOR, extract_sections
+from worm_kb_io import DEFAULT_HEADER, KnowledgeBaseWriter, iter_kb_sources, read_kb_header
+from worm_shards import shards_dir_for, write_shards
+from worm_skill import WormSkill
+
+# Retries per request on connection errors and these statuses (exponential backoff
+# unless the server sends Retry-After)
+FETCH_RETRIES = 3
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_BACKOFF = 0.5
+
+class TokenBucket:
+    """Thread-safe token bucket: at most `rate` acquisitions per second on average."""
+
+    def __init__(self, rate, capacity=1):
+        """
+        Args:
+            rate: Tokens added per second (0 or None = unlimited)
+            capacity: Burst size
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available."""
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def make_session(pool_size):
+    """
+    HTTP session whose connection pool is sized for the fetch concurrency.
+
+    The adapter retries connection errors only: status retries happen in
+    fetch_wiki_page, where each attempt goes through the rate limiter.
+    """
+    session = requests.Session()
+    retry = Retry(total=FETCH_RETRIES, backoff_factor=RETRY_BACKOFF, allowed_methods=("GET",),
+                  respect_retry_after_header=False, raise_on_status=False)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                            max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def retry_delay(response, attempt):
+    """Seconds to wait before retry `attempt` (1-based): the server's Retry-After, else backoff."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    return RETRY_BACKOFF * 2 ** (attempt - 1)
+
+def fetch_wiki_page(url, session=None, previous=None, limiter=None, timeout=30,
+                    selector=DEFAULT_CONTENT_SELECTOR):
+    """
+    Fetch wiki page content.
+
+    Args:
+        url: Page URL
+        session: Pooled session to reuse (a one-off request otherwise)
+        previous: Existing knowledge base entry; its validators make the request conditional
+        limiter: TokenBucket to throttle by
+        timeout: Request timeout in seconds
+        selector: Element holding the article body
+    """
+    headers = {}
+    if previous and previous.get("status") == "success":
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+    def get(headers):
+        for attempt in range(FETCH_RETRIES + 1):
+            if attempt:
+                time.sleep(retry_delay(response, attempt))
+            if limiter:
+                limiter.acquire()
+            response = (session or requests).get(url, headers=headers, timeout=timeout)
+            if response.status_code not in RETRY_STATUSES:
+                break
+        return response
 
-def fetch_wiki_page(url):
-    """Fetch wiki page content."""
     try:
-        response = requests.get(url, timeout=30)
+        response = get(headers)
+        if response.status_code == 304 and previous and "sections" in previous:
+            return {**previous, "not_modified": True}
+        if response.status_code == 304 and headers:
+            # The stored copy predates text extraction (raw_html only), so
+            # there is nothing to keep: fetch the page itself
+            response = get({})
         response.raise_for_status()
-        return {
+        if response.status_code != 200:
+            raise requests.HTTPError(f"{response.status_code} for url: {url}", response=response)
+        sections = extract_sections(response.text, selector)
+        data = {
             "url": url,
             "status": "success",
             "content_length": len(response.text),
-            "raw_html": response.text[:50000]  # Limit to 50KB
+            "text_length": sum(len(section["text"]) for section in sections),
+            "sections": sections
         }
+        if response.headers.get("ETag"):
+            data["etag"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            data["last_modified"] = response.headers["Last-Modified"]
+        return data
     except Exception as e:
         return {
             "url": url,
@@ -23,44 +164,95 @@ def fetch_wiki_page(url):
             "error": str(e)
         }
 
+def load_wiki_sources(config_path):
+    """Read (page name, url, content selector) triples and the rate limit from the config."""
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    wiki_sources = [
+        (source["base_url"].rstrip("/").rsplit("/", 1)[-1], source["base_url"],
+         source.get("selectors", {}).get("content", DEFAULT_CONTENT_SELECTOR))
+        for source in config.get("sources", [])
+        if source.get("type") == "documentation"
+    ]
+    return wiki_sources, config.get("rate_limit", 0)
+
+def fetch_all(wiki_sources, existing, concurrency=4, rate_limit=0):
+    """
+    Fetch every page concurrently.
+
+    Returns:
+        (name, data) pairs in config order
+    """
+    limiter = TokenBucket(rate_limit, capacity=max(1, int(rate_limit or 1)))
+    with make_session(concurrency) as session, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            (name, pool.submit(fetch_wiki_page, url, session, existing.get(f"wiki_{name}"), limiter,
+                               selector=selector))
+            for name, url, selector in wiki_sources
+        ]
+        return [(name, future.result()) for name, future in futures]
+
 def main():
     import sys
     import io
+    import argparse
 
     # Fix Windows console encoding
     if sys.platform == 'win32':
         sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
-    # Load existing knowledge base
-    kb_file = Path("worm_knowledge_base.json")
-    with open(kb_file, "r", encoding="utf-8") as f:
-        knowledge_base = json.load(f)
+    parser = argparse.ArgumentParser(description="Fetch Worm Wiki pages into the knowledge base")
+    parser.add_argument("--config", default="worm_unified_config.json", help="Source config")
+    parser.add_argument("--output", default="worm_knowledge_base.json", help="Knowledge base to update")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel requests")
+    args = parser.parse_args()
 
-    wiki_urls = [
-        ("Trigger_Event", "https://worm.fandom.com/wiki/Trigger_Event"),
-        ("Power_Classifications", "https://worm.fandom.com/wiki/Power_Classifications"),
-        ("Shard", "https://worm.fandom.com/wiki/Shard")
-    ]
+    # Load existing wiki entries (their validators make the fetches conditional)
+    kb_file = Path(args.output)
+    existing = {}
+    if kb_file.exists():
+        existing = {name: data for name, data in iter_kb_sources(kb_file) if data.get("type") == "wiki"}
 
-    print("[*] Fetching Wiki pages...")
-    for name, url in wiki_urls:
-        print(f"[*] Fetching {name}...")
-        data = fetch_wiki_page(url)
-        knowledge_base["sources"][f"wiki_{name}"] = {
-            "type": "wiki",
-            **data
-        }
-        if data["status"] == "success":
-            print(f"[+] Fetched {name} ({data['content_length']} bytes)")
+    wiki_sources, rate_limit = load_wiki_sources(args.config)
+
+    print(f"[*] Fetching {len(wiki_sources)} Wiki pages ({args.concurrency} concurrent, {rate_limit or 'unlimited'} req/s)...")
+    updates = {}
+    for name, data in fetch_all(wiki_sources, existing, args.concurrency, rate_limit):
+        if data["status"] == "success" and data.pop("not_modified", False):
+            print(f"[=] {name} not modified")
+        elif data["status"] == "success":
+            print(f"[+] Fetched {name} ({data['content_length']} bytes HTML -> "
+                  f"{len(data['sections'])} sections, {data['text_length']} chars of text)")
         else:
             print(f"[-] Error fetching {name}: {data.get('error')}")
+            if existing.get(f"wiki_{name}", {}).get("status") == "success":
+                continue  # Keep the last good copy
+        updates[f"wiki_{name}"] = {
+            "type": "wiki",
+            **{k: v for k, v in data.items() if k not in ("type", "raw_html")}
+        }
 
-    # Save updated knowledge base
-    with open(kb_file, "w", encoding="utf-8") as f:
-        json.dump(knowledge_base, f, ensure_ascii=False, indent=2)
+    # Rewrite the knowledge base, replacing wiki entries in place
+    header = read_kb_header(kb_file) if kb_file.exists() else DEFAULT_HEADER
+    with KnowledgeBaseWriter(kb_file, header) as writer:
+        if kb_file.exists():
+            for name, data in iter_kb_sources(kb_file):
+                writer.write_source(name, updates.pop(name, data))
+        for name, data in updates.items():
+            writer.write_source(name, data)
 
     print(f"\n[+] Knowledge base updated")
-    print(f"[*] Total sources: {len(knowledge_base['sources'])}")
+    print(f"[*] Total sources: {writer.count}")
+
+    # Refresh the sharded copy index.html reads (only changed parts are rewritten)
+    stats = write_shards(kb_file)
+    print(f"[+] Viewer shards: {stats['parts']} parts in {shards_dir_for(kb_file)} "
+          f"({stats['written']} rewritten, {stats['gzip_bytes'] // 1024}KB gzipped)")
+
+    # Build the search index, page store and trigram index now rather than on the first search
+    stats = WormSkill(str(kb_file), cache=False).prepare_search()
+    print(f"[+] Search index: {stats['chunks']} chunks, {stats['words']} words in the trigram index")
 
 if __name__ == "__main__":
     main()
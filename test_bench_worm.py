@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Test the benchmark harness: statistics, baseline comparison and scaled corpora."""
+
+import sys
+import io
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from bench_worm import bench_dedup, compare, make_scaled_kb, measure
+from worm_kb_io import KnowledgeBaseWriter, iter_kb_sources, read_kb_header
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+def test_measure_reports_latency_statistics():
+    stats = measure(lambda: None, repeat=20)
+    assert stats["unit"] == "ms" and stats["n"] == 20
+    assert 0 <= stats["min"] <= stats["p50"] <= stats["p95"]
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {
+        "search.common": {"unit": "ms", "p50": 1.0, "mean": 1.0},
+        "process.short": {"unit": "ms", "p50": 2.0, "mean": 2.0},
+        "batch.sequential": {"unit": "records_per_s", "mean": 1000.0},
+    }
+    results = {
+        "search.common": {"unit": "ms", "p50": 1.5, "mean": 1.1},
+        "process.short": {"unit": "ms", "p50": 2.1, "mean": 2.1},
+        "batch.sequential": {"unit": "records_per_s", "mean": 700.0},
+        "dedup.insert": {"unit": "records_per_s", "mean": 50.0},
+    }
+    with redirect_stdout(io.StringIO()) as out:
+        regressions = compare(results, baseline, threshold=0.1)
+    assert regressions == ["search.common", "batch.sequential"]
+    assert "new" in out.getvalue()
+
+
+def test_scaled_kb_repeats_every_source():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "kb.json"
+        with KnowledgeBaseWriter(source, {"name": "test"}) as writer:
+            writer.write_source("A.pdf", {"type": "pdf", "content": [{"page": 1, "text": "trigger"}]})
+        scaled = Path(tmp) / "kb_x3.json"
+        make_scaled_kb(source, 3, scaled)
+        assert read_kb_header(scaled) == {"name": "test"}
+        assert [name for name, _ in iter_kb_sources(scaled)] == ["A.pdf", "copy1_A.pdf", "copy2_A.pdf"]
+
+
+def test_dedup_benchmark_smoke():
+    with tempfile.TemporaryDirectory() as tmp:
+        results = bench_dedup(Path(tmp), entries=50, repeat=3)
+    assert set(results) == {"dedup.insert", "dedup.query_near", "dedup.query_new", "dedup.open"}
+    assert results["dedup.insert"]["mean"] > 0
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
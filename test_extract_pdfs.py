@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Test incremental PDF ingestion on small generated PDFs."""
+
+import json
+import sys
+import io
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from extract_pdfs import main
+from worm_fuzzy import TrigramIndex
+from worm_index import KnowledgeIndex, index_path_for, kb_fingerprint
+from worm_kb_io import KnowledgeBaseWriter, iter_kb_sources
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+WIKI_ENTRY = {"type": "wiki", "status": "success", "url": "https://worm.fandom.com/wiki/Shard",
+              "sections": [{"heading": "", "text": "Shards bud and connect."}]}
+
+
+def _write_pdf(path, pages):
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_text((72, 72), text)
+    doc.save(path)
+    doc.close()
+
+
+def _setup(tmp, pdfs, max_pages=0):
+    """Write PDFs and a config listing them; return (config path, knowledge base path)."""
+    tmp = Path(tmp)
+    for name, pages in pdfs.items():
+        _write_pdf(tmp / name, pages)
+    config = tmp / "config.json"
+    _write_config(config, list(pdfs), max_pages)
+    return config, tmp / "kb.json"
+
+
+def _write_config(config, names, max_pages=0):
+    config.write_text(json.dumps({
+        "sources": [{"type": "pdf", "path": f"./{name}"} for name in names]
+        + [{"type": "wiki", "url": "https://worm.fandom.com/wiki/Shard"}],
+        "max_pages_per_pdf": max_pages,
+    }), encoding="utf-8")
+
+
+def _run(config, kb_path):
+    """Run the extractor; return its printed lines and the resulting sources."""
+    with redirect_stdout(io.StringIO()) as out:
+        main(["--config", str(config), "--output", str(kb_path), "--workers", "1"])
+    return out.getvalue().splitlines(), dict(iter_kb_sources(kb_path))
+
+
+def _pages(source):
+    return [page["text"] for page in source["content"]]
+
+
+def test_unchanged_pdfs_are_skipped_and_changed_ones_merged():
+    with tempfile.TemporaryDirectory() as tmp:
+        config, kb_path = _setup(tmp, {"A.pdf": ["Brute trigger"], "B.pdf": ["Mover trigger"]})
+        _, first = _run(config, kb_path)
+        assert _pages(first["A.pdf"]) == ["Brute trigger"] and _pages(first["B.pdf"]) == ["Mover trigger"]
+
+        # Wiki entries (fetch_wiki's) survive PDF updates
+        with KnowledgeBaseWriter(kb_path) as writer:
+            for name, data in first.items():
+                writer.write_source(name, data)
+            writer.write_source("wiki_Shard", WIKI_ENTRY)
+
+        lines, unchanged = _run(config, kb_path)
+        assert "[=] Knowledge base already up to date" in lines
+        assert unchanged == {**first, "wiki_Shard": WIKI_ENTRY}
+
+        _write_pdf(Path(tmp) / "B.pdf", ["Mover trigger, rewritten"])
+        lines, merged = _run(config, kb_path)
+        assert "[=] A.pdf unchanged" in lines
+        assert any(line.startswith("[+] Extracted 1 pages from B.pdf (1 new or changed)") for line in lines)
+        assert merged["A.pdf"] == first["A.pdf"]
+        assert _pages(merged["B.pdf"]) == ["Mover trigger, rewritten"]
+        assert merged["B.pdf"]["sha256"] != first["B.pdf"]["sha256"]
+        assert merged["wiki_Shard"] == WIKI_ENTRY
+
+
+def test_pdfs_dropped_from_config_are_removed():
+    with tempfile.TemporaryDirectory() as tmp:
+        config, kb_path = _setup(tmp, {"A.pdf": ["Brute trigger"], "B.pdf": ["Mover trigger"]})
+        _run(config, kb_path)
+        _write_config(config, ["A.pdf"])
+        lines, sources = _run(config, kb_path)
+        assert any(line.startswith("[-] Removing B.pdf") for line in lines)
+        assert list(sources) == ["A.pdf"]
+
+
+def test_failed_extraction_keeps_previous_entry():
+    with tempfile.TemporaryDirectory() as tmp:
+        config, kb_path = _setup(tmp, {"A.pdf": ["Brute trigger"], "B.pdf": ["Mover trigger"]})
+        _, before = _run(config, kb_path)
+        (Path(tmp) / "B.pdf").write_bytes(b"%PDF-1.4 truncated")
+        lines, after = _run(config, kb_path)
+        assert any(line.startswith("[-] Error processing B.pdf") for line in lines)
+        assert after == before
+
+
+def test_max_pages_per_pdf_is_respected():
+    with tempfile.TemporaryDirectory() as tmp:
+        config, kb_path = _setup(tmp, {"A.pdf": ["Page one", "Page two", "Page three"]}, max_pages=2)
+        _, sources = _run(config, kb_path)
+        assert _pages(sources["A.pdf"]) == ["Page one", "Page two"]
+        assert sources["A.pdf"]["max_pages"] == 2
+
+        # Raising the limit re-extracts the unchanged file
+        _write_config(config, ["A.pdf"], max_pages=0)
+        _, sources = _run(config, kb_path)
+        assert _pages(sources["A.pdf"]) == ["Page one", "Page two", "Page three"]
+
+
+def test_search_artifacts_are_built_at_ingestion():
+    with tempfile.TemporaryDirectory() as tmp:
+        config, kb_path = _setup(tmp, {"A.pdf": ["Tinker trigger"]})
+        lines, _ = _run(config, kb_path)
+        assert any(line.startswith("[+] Search index: 1 chunks") for line in lines)
+        fingerprint = kb_fingerprint(kb_path)
+        assert "tinker" in TrigramIndex.open(kb_path, fingerprint).terms
+        index = KnowledgeIndex.load(index_path_for(kb_path), fingerprint)
+        assert len(index.docs) == 1
+        index.close()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
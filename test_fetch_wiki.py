@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Test the wiki fetcher against a local stub server."""
+
+import sys
+import io
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import fetch_wiki
+from fetch_wiki import TokenBucket, fetch_all, fetch_wiki_page, make_session
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+PAGE = ('<html><body><div class="mw-parser-output"><p>A trigger event is the worst day.</p>'
+        '<h2>Causes</h2><p>Trauma.</p></div></body></html>')
+ETAG = '"v1"'
+LAST_MODIFIED = "Sat, 17 Oct 2026 10:00:00 GMT"
+
+
+class StubWiki(BaseHTTPRequestHandler):
+    """Serves PAGE with validators; paths in `failures` answer 503 that many times first."""
+
+    requests = []
+    failures = {}
+    retry_after = "0"
+
+    def do_GET(self):
+        self.requests.append((self.path, dict(self.headers)))
+        if self.failures.get(self.path, 0) > 0:
+            self.failures[self.path] -= 1
+            self.send_response(503)
+            self.send_header("Retry-After", self.retry_after)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == ETAG or self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = PAGE.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def stub_server():
+    StubWiki.requests = []
+    StubWiki.failures = {}
+    StubWiki.retry_after = "0"
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWiki)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_fetch_stores_sections_and_validators():
+    with stub_server() as base:
+        data = fetch_wiki_page(base + "/wiki/Trigger_Event")
+    assert data["status"] == "success"
+    assert data["sections"] == [{"heading": "", "text": "A trigger event is the worst day."},
+                                {"heading": "Causes", "text": "Trauma."}]
+    assert data["etag"] == ETAG and data["last_modified"] == LAST_MODIFIED
+    assert "If-None-Match" not in StubWiki.requests[0][1]
+
+
+def test_not_modified_keeps_previous_entry():
+    with stub_server() as base:
+        previous = fetch_wiki_page(base + "/wiki/Trigger_Event")
+        data = fetch_wiki_page(base + "/wiki/Trigger_Event", previous=previous)
+    assert data == {**previous, "not_modified": True}
+    headers = StubWiki.requests[1][1]
+    assert headers["If-None-Match"] == ETAG and headers["If-Modified-Since"] == LAST_MODIFIED
+
+
+def test_not_modified_without_sections_refetches():
+    # Entry stored before text extraction: validators but only raw_html
+    previous = {"url": "", "status": "success", "raw_html": "<html><head>", "etag": ETAG,
+                "last_modified": LAST_MODIFIED}
+    with stub_server() as base:
+        data = fetch_wiki_page(base + "/wiki/Trigger_Event", previous=previous)
+    assert data["status"] == "success" and "not_modified" not in data
+    assert len(data["sections"]) == 2
+    assert [("If-None-Match" in headers) for _, headers in StubWiki.requests] == [True, False]
+
+
+def test_transient_errors_are_retried():
+    backoff, fetch_wiki.RETRY_BACKOFF = fetch_wiki.RETRY_BACKOFF, 0
+    try:
+        with stub_server() as base, make_session(2) as session:
+            StubWiki.failures["/flaky/1"] = 2
+            StubWiki.failures["/flaky/2"] = fetch_wiki.FETCH_RETRIES + 1
+            recovered = fetch_wiki_page(base + "/flaky/1", session=session)
+            failed = fetch_wiki_page(base + "/flaky/2", session=session)
+    finally:
+        fetch_wiki.RETRY_BACKOFF = backoff
+    assert recovered["status"] == "success"
+    assert failed["status"] == "error"
+    assert [path for path, _ in StubWiki.requests].count("/flaky/1") == 3
+
+
+class CountingBucket(TokenBucket):
+    def __init__(self):
+        super().__init__(rate=0)
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+
+
+def test_retries_take_rate_limit_tokens_and_honour_retry_after():
+    limiter = CountingBucket()
+    with stub_server() as base, make_session(1) as session:
+        StubWiki.failures["/flaky/1"] = 1
+        StubWiki.retry_after = "1"
+        start = time.monotonic()
+        data = fetch_wiki_page(base + "/flaky/1", session=session, limiter=limiter)
+        elapsed = time.monotonic() - start
+    assert data["status"] == "success"
+    assert limiter.acquired == len(StubWiki.requests) == 2
+    assert elapsed >= 1.0
+
+
+def test_fetch_all_keeps_config_order():
+    with stub_server() as base:
+        sources = [(name, f"{base}/wiki/{name}", ".mw-parser-output") for name in ("A", "B", "C", "D")]
+        results = fetch_all(sources, {}, concurrency=3, rate_limit=0)
+    assert [name for name, _ in results] == ["A", "B", "C", "D"]
+    assert all(data["status"] == "success" for _, data in results)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Test JSONL batch processing."""
+
+import io
+import json
+import sys
+
+from worm_batch import read_jsonl, write_jsonl
+from worm_skill import WormSkill
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+RECORDS = [
+    {"mode": "trigger_to_power", "trigger_description": "Trapped and helpless, nobody came."},
+    {"mode": "power_to_trigger", "power_description": "Controls insects in a wide radius.",
+     "known_classification": "Master 8"},
+    {"mode": "unknown"},
+    "not an object",
+]
+
+JSONL = ('{"mode": "trigger_to_power", "trigger_description": "Alone and afraid."}\n'
+         '\n'
+         '{"mode": broken\n'
+         '{"mode": "power_to_trigger", "power_description": "Shoots fire."}\n')
+
+
+def test_read_jsonl_keeps_bad_lines_in_place():
+    records = list(read_jsonl(io.StringIO(JSONL)))
+    assert len(records) == 3
+    assert records[0]["mode"] == "trigger_to_power" and records[2]["mode"] == "power_to_trigger"
+    assert isinstance(records[1], ValueError) and "line 3" in str(records[1])
+
+
+def test_batch_matches_single_requests():
+    skill = WormSkill(cache=False)
+    results = list(skill.process_batch(RECORDS, chunk_size=2))
+    assert len(results) == len(RECORDS)
+    assert results[0] == skill.process(RECORDS[0])
+    assert results[1] == skill.process(RECORDS[1])
+    assert results[2]["index"] == 2 and results[2]["error"]["type"] == "ValueError"
+    assert results[3]["index"] == 3 and results[3]["error"]["type"] == "TypeError"
+
+
+def test_worker_pool_matches_sequential_run():
+    skill = WormSkill(cache=False)
+    records = RECORDS * 3
+    assert list(skill.process_batch(records, workers=2, chunk_size=2)) == list(skill.process_batch(records))
+
+
+def test_write_jsonl_counts_errors():
+    skill = WormSkill(cache=False)
+    out = io.StringIO()
+    stats = write_jsonl(skill.process_batch(read_jsonl(io.StringIO(JSONL))), out)
+    assert stats == {"records": 3, "errors": 1}
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [("error" in line) for line in lines] == [False, True, False]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Test the process() result cache."""
+
+import sys
+import io
+import tempfile
+
+from worm_cache import ResultCache
+from worm_skill import WormSkill
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+REQUEST = {"mode": "trigger_to_power", "trigger_description": "Trapped and helpless, nobody came."}
+
+
+def test_key_covers_exact_text():
+    cache = ResultCache()
+    spaced = {**REQUEST, "trigger_description": "Trapped  and helpless,\nnobody came. "}
+    assert cache.key(REQUEST) == cache.key(dict(REQUEST))
+    assert cache.key(REQUEST) != cache.key(spaced)
+    assert cache.key(REQUEST) != cache.key({**REQUEST, "num_variants": 2})
+    # Fields that do not shape the response are ignored
+    assert cache.key(REQUEST) == cache.key({**REQUEST, "power_description": "unused"})
+
+
+def test_whitespace_variants_get_their_own_responses():
+    skill = WormSkill(cache=True)
+    short = skill.process(REQUEST)
+    padded = skill.process({**REQUEST, "trigger_description": REQUEST["trigger_description"] + " " * 200})
+    assert skill.cache_stats()["hits"] == 0
+    assert padded != short
+    assert padded == WormSkill(cache=False).process(
+        {**REQUEST, "trigger_description": REQUEST["trigger_description"] + " " * 200})
+    assert skill.process(REQUEST) == short
+    assert skill.cache_stats()["hits"] == 1
+
+
+def test_lru_and_disk_tier():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(max_entries=1, disk_path=tmp)
+        cache.set_generation("g1")
+        cache.put("a", {"n": 1})
+        cache.put("b", {"n": 2})
+        assert cache.stats()["evictions"] == 1
+        assert cache.get("a") == {"n": 1}
+        assert cache.stats()["disk_hits"] == 1
+
+        cache.set_generation("g2")
+        assert cache.get("b") is None
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
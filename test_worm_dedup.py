@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Test MinHash/LSH near-duplicate detection and its on-disk index."""
+
+import sys
+import io
+import tempfile
+from pathlib import Path
+
+from worm_dedup import DedupIndex
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+LOCKER = ("A girl is locked in a school locker full of biohazard waste for hours, "
+          "mocked by the students outside and betrayed by her best friend.")
+LOCKER_EDITED = ("A girl is locked in a school locker full of biohazard waste for days, "
+                 "mocked by the students outside and betrayed by her best friend.")
+ALLEY = "A boy is jumped by a gang in an alley and beaten while he cannot fight back."
+
+
+def _index(path=None):
+    index = DedupIndex(path=path)
+    index.add("locker", LOCKER, "TESTS.md Example 1")
+    index.add("alley", ALLEY)
+    index.add("empty", "...")
+    return index
+
+
+def test_near_duplicates_are_found():
+    index = _index()
+    match = index.closest(LOCKER_EDITED)
+    assert match["key"] == "locker" and match["label"] == "TESTS.md Example 1"
+    assert 0.5 <= match["similarity"] < 1.0
+    assert index.query(LOCKER)[0]["similarity"] == 1.0
+    assert index.closest("Power over weather and storms across a whole city.") is None
+    assert index.query("!!!") == []
+
+
+def test_saved_index_reopens_and_appends():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "submissions.dedup"
+        index = _index(path)
+        index.save()
+        index.close()
+
+        reopened = DedupIndex.open(path)
+        assert len(reopened) == 3
+        assert reopened.closest(LOCKER_EDITED)["key"] == "locker"
+        reopened.add("alley-2", ALLEY + " Again.")
+        reopened.close()
+
+        appended = DedupIndex.open(path)
+        assert len(appended) == 4
+        assert [match["key"] for match in appended.query(ALLEY)] == ["alley", "alley-2"]
+        appended.close()
+
+
+def test_bands_must_divide_signature():
+    try:
+        DedupIndex(num_perm=128, bands=30)
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
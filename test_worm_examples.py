@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Test the few-shot example store and prompt assembly."""
+
+import sys
+import io
+import tempfile
+from pathlib import Path
+
+from worm_examples import ExampleStore, PromptBuilder, parse_examples
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+TESTS_PATH = Path(__file__).with_name("TESTS.md")
+
+CLASS_NAMES = {"master": ["Master", "Повелитель"], "brute": ["Brute", "Громила"], "mover": ["Mover"]}
+
+TESTS = """# Tests
+
+### Example 1: Locker
+**Input:**
+```json
+{"mode": "trigger_to_power", "trigger_description": "Locked in a locker, isolated and mocked.", "language": "en"}
+```
+**Expected Output:**
+- Primary: Master 8
+
+---
+
+### Example 2: Alley beating
+**Input:**
+```json
+{"mode": "trigger_to_power", "trigger_description": "Beaten in an alley, rage and pain.", "language": "en"}
+```
+**Expected Output:**
+- Primary: Brute 6
+
+---
+
+### Example 3: Broken input
+**Input:**
+```json
+{"mode": oops}
+```
+
+---
+
+### Example 4: Speed power
+**Input:**
+```json
+{"mode": "power_to_trigger", "power_description": "Runs faster than cars.", "language": "en"}
+```
+**Expected Output:**
+- Trigger: chased, Mover
+"""
+
+
+def _analyze(input_data):
+    return {"emotion": {"rage": 1}} if "rage" in input_data.get("trigger_description", "") else {}
+
+
+def test_parse_examples():
+    examples = parse_examples(TESTS)
+    assert [example["number"] for example in examples] == [1, 2, 4]
+    assert examples[0]["title"] == "Locker"
+    assert examples[1]["expected"] == "- Primary: Brute 6"
+    assert len(parse_examples(TESTS_PATH.read_text(encoding="utf-8"))) == 25
+
+
+def test_select_ranks_by_mode_terms_and_classes():
+    store = ExampleStore.build(TESTS, CLASS_NAMES, _analyze)
+    assert [example["classes"] for example in store.examples] == [["master"], ["brute"], ["mover"]]
+
+    request = {"mode": "trigger_to_power", "trigger_description": "An alley fight full of rage"}
+    assert [example["number"] for example in store.select(request, k=2)] == [2, 1]
+    assert [example["number"] for example in store.select({"mode": "power_to_trigger"}, k=1)] == [4]
+    picked = store.select({"mode": "trigger_to_power"}, k=1, classes=["master"])
+    assert picked[0]["number"] == 1
+
+
+def test_store_cache_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        tests_path = Path(tmp) / "TESTS.md"
+        tests_path.write_text(TESTS, encoding="utf-8")
+        store = ExampleStore.build(TESTS, CLASS_NAMES, _analyze)
+        store.save(tests_path, "v1")
+        assert ExampleStore.open(tests_path, "v1").examples == store.examples
+        assert ExampleStore.open(tests_path, "v2") is None
+
+
+def test_prompt_builder_messages():
+    with tempfile.TemporaryDirectory() as tmp:
+        skill_path = Path(tmp) / "SKILL.md"
+        skill_path.write_text("You classify Worm triggers.", encoding="utf-8")
+        builder = PromptBuilder(skill_path, ExampleStore.build(TESTS, CLASS_NAMES, _analyze))
+        request = {"mode": "power_to_trigger", "power_description": "fast"}
+
+        system, user = builder.build(request, k=1)
+        assert system == {"role": "system", "content": "You classify Worm triggers."}
+        assert user["content"].startswith("Examples from TESTS.md:\n\n### Example 4: Speed power")
+        assert user["content"].endswith('"power_description": "fast"\n}\n```')
+        assert "Examples" not in builder.build(request, k=0)[1]["content"]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
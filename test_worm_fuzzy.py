@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Test typo-tolerant term lookup and query correction."""
+
+import sys
+import io
+import tempfile
+from pathlib import Path
+
+from worm_fuzzy import TrigramIndex, apply_corrections, correct_query, edit_distance, fold_homoglyphs, missing_words
+from worm_query import And, Not, Term, parse
+from worm_stem import stem
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+VOCABULARY = {"shaker": 40, "shakers": 5, "master": 30, "mover": 12, "шейкер": 20, "триггер": 50}
+
+
+def test_edit_distance():
+    assert edit_distance("shaker", "shaker", 2) == 0
+    assert edit_distance("shaker", "shkaer", 2) == 1
+    assert edit_distance("shaker", "shakr", 2) == 1
+    assert edit_distance("shaker", "mover", 2) == 3
+
+
+def test_homoglyphs_fold_to_majority_script():
+    assert fold_homoglyphs("mаster") == "master"
+    assert fold_homoglyphs("шeйкер") == "шейкер"
+    assert fold_homoglyphs("master") == "master"
+
+
+def test_lookup_prefers_close_then_frequent_terms():
+    fuzzy = TrigramIndex.build(VOCABULARY)
+    assert fuzzy.lookup("shakre") == [("shaker", 1), ("shakers", 2)]
+    assert fuzzy.suggest("mаstr") == "master"
+    assert fuzzy.suggest("тригер") == "триггер"
+    assert fuzzy.suggest("zzz") is None
+
+
+def test_save_and_open_check_fingerprint():
+    fuzzy = TrigramIndex.build(VOCABULARY)
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = Path(tmp) / "kb.json"
+        fuzzy.save(kb_path, {"size": 1, "mtime_ns": 2})
+        loaded = TrigramIndex.open(kb_path, {"size": 1, "mtime_ns": 2})
+        assert loaded.terms == fuzzy.terms and loaded.counts == fuzzy.counts
+        assert TrigramIndex.open(kb_path, {"size": 1, "mtime_ns": 3}) is None
+
+
+def test_correct_query_rewrites_missing_words():
+    postings = {stem(term): [] for term in VOCABULARY}
+    node, corrections = correct_query(parse("shakr master"), postings, TrigramIndex.build(VOCABULARY))
+    assert corrections == {"shakr": "shaker"}
+    assert node.children[0] == Term(stem("shaker"), "shaker")
+    assert node.children[1] == Term(stem("master"), "master")
+    assert apply_corrections("Shakr master", corrections) == "shaker master"
+
+
+def test_words_under_not_are_not_corrected():
+    postings = {stem(term): [] for term in VOCABULARY}
+    node = parse("master NOT mastr")
+    assert missing_words(node, postings) == []
+    corrected, corrections = correct_query(node, postings, TrigramIndex.build(VOCABULARY))
+    assert corrections == {}
+    assert corrected == And([Term(stem("master"), "master"), Not(Term(stem("mastr"), "mastr"))])
+    # A misspelling outside the NOT is still corrected
+    _, corrections = correct_query(parse("shakr NOT mastr"), postings, TrigramIndex.build(VOCABULARY))
+    assert corrections == {"shakr": "shaker"}
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
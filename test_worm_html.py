@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Test wiki HTML extraction and that wiki pages reach the search index."""
+
+import shutil
+import sys
+import io
+import tempfile
+from pathlib import Path
+
+from worm_html import extract_sections
+from worm_skill import WormSkill
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+KB_PATH = Path(__file__).with_name("worm_knowledge_base.json")
+
+
+def test_content_element_sections():
+    html = ('<html><body><nav>Menu</nav><div class="mw-parser-output"><p>Lead text.</p>'
+            '<h2>Powers<span class="mw-editsection">edit</span></h2><p>Bugs.</p>'
+            '<script>var x = 1;</script></div><footer>Footer</footer></body></html>')
+    assert extract_sections(html) == [{"heading": "", "text": "Lead text."},
+                                      {"heading": "Powers", "text": "Bugs."}]
+
+
+def test_fallback_to_body():
+    html = "<html><body><h2>Trigger</h2><p>A bad day.</p><script>x()</script></body></html>"
+    assert extract_sections(html) == [{"heading": "Trigger", "text": "A bad day."}]
+
+
+def test_fallback_to_document_with_description():
+    # HTML cut short inside <head>, before the article body (the committed wiki entries)
+    html = ('<html><head><title>Shard | Worm Wiki</title><meta name="description" content="Short.">'
+            '<meta property="og:description" content="Shards are the source of powers.">'
+            '<script>var config = {"trigger": 1')
+    sections = extract_sections(html)
+    assert sections == [{"heading": "", "text": "Shard | Worm Wiki\n\nShards are the source of powers."}]
+
+
+def test_committed_kb_indexes_wiki_pages():
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = Path(tmp) / KB_PATH.name
+        shutil.copy(KB_PATH, kb_path)
+        skill = WormSkill(str(kb_path), cache=False)
+
+        wiki_docs = [doc for doc in skill.index.docs if doc["type"] == "wiki"]
+        assert {doc["source"] for doc in wiki_docs} == {"wiki_Trigger_Event", "wiki_Power_Classifications",
+                                                        "wiki_Shard"}
+        results = skill.search_knowledge_base("trigger", source_types=["wiki"])
+        assert results and all(r["type"] == "wiki" for r in results)
+        assert results[0]["source"] == "wiki_Trigger_Event"
+        skill.index.close()
+        skill.store.close()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Test the inverted index and its memory-mapped on-disk form."""
+
+import sys
+import io
+import tempfile
+from pathlib import Path
+
+from worm_index import KnowledgeIndex, PostingLists, index_path_for, kb_fingerprint
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+KNOWLEDGE_BASE = {
+    "sources": {
+        "BREAKERS.pdf": {"type": "pdf", "content": [
+            {"page": 1, "text": "A breaker trigger changes the body. Триггер меняет тело."},
+            {"page": 2, "text": "Breaker states are not always physical."},
+        ]},
+        "wiki_Trigger_Event": {"type": "wiki", "status": "success",
+                               "url": "https://worm.fandom.com/wiki/Trigger_Event", "sections": [
+            {"heading": "", "text": "A trigger event is the worst day of a person's life."},
+        ]},
+    }
+}
+
+QUERIES = ["trigger", "триггеров", "breaker", '"trigger event"', "breaker -physical", "missing"]
+
+
+def _round_trip(index: KnowledgeIndex, tmp: str) -> KnowledgeIndex:
+    kb_path = Path(tmp) / "kb.json"
+    kb_path.write_text("{}", encoding="utf-8")
+    path = index_path_for(kb_path)
+    index.save(path, kb_fingerprint(kb_path))
+    return KnowledgeIndex.load(path, kb_fingerprint(kb_path))
+
+
+def test_loaded_index_matches_built_index():
+    built = KnowledgeIndex.build(KNOWLEDGE_BASE)
+    with tempfile.TemporaryDirectory() as tmp:
+        loaded = _round_trip(built, tmp)
+        assert isinstance(loaded.postings, PostingLists)
+        assert len(loaded.docs) == len(built.docs) == 3
+        assert list(loaded.docs) == built.docs
+        assert sorted(loaded.postings) == sorted(built.postings)
+        assert all(loaded.postings[term] == lists for term, lists in built.postings.items())
+        assert all(loaded.positions[term] == lists for term, lists in built.positions.items())
+        assert loaded.avg_length == built.avg_length
+        for query in QUERIES:
+            assert loaded.top_k(query, 5) == built.top_k(query, 5), query
+        loaded.close()
+
+
+def test_top_k_is_the_head_of_the_full_ranking():
+    index = KnowledgeIndex.build(KNOWLEDGE_BASE)
+    for query in QUERIES:
+        ranked = sorted(((index.bm25(doc_id, term_offsets), doc_id, term_offsets)
+                         for doc_id, term_offsets in index.match(query)),
+                        key=lambda item: (-item[0], item[1]))
+        for k in (1, 2, 10):
+            assert index.top_k(query, k) == ranked[:k], (query, k)
+    pdf_only = index.top_k("trigger", 10, lambda doc: doc["type"] == "pdf")
+    assert [index.docs[doc_id]["type"] for _, doc_id, _ in pdf_only] == ["pdf"]
+    assert index.top_k("", 5) == []
+
+
+def test_postings_are_decoded_per_term():
+    built = KnowledgeIndex.build(KNOWLEDGE_BASE)
+    with tempfile.TemporaryDirectory() as tmp:
+        loaded = _round_trip(built, tmp)
+        assert "trigger" in loaded.postings and "nonexistent" not in loaded.postings
+        assert loaded.postings.count("trigger") == 2
+        assert loaded.postings.get("nonexistent") is None
+        assert list(loaded.postings._cache) == []
+        loaded.postings["trigger"]
+        assert list(loaded.postings._cache) == ["trigger"]
+        assert list(loaded.positions._cache) == []
+        loaded.close()
+
+
+def test_stale_index_is_not_loaded():
+    built = KnowledgeIndex.build(KNOWLEDGE_BASE)
+    with tempfile.TemporaryDirectory() as tmp:
+        loaded = _round_trip(built, tmp)
+        loaded.close()
+        kb_path = Path(tmp) / "kb.json"
+        kb_path.write_text("{} ", encoding="utf-8")
+        assert KnowledgeIndex.load(index_path_for(kb_path), kb_fingerprint(kb_path)) is None
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Test the streaming knowledge base reader and writer."""
+
+import json
+import sys
+import io
+import tempfile
+from pathlib import Path
+
+from worm_kb_io import DEFAULT_HEADER, KnowledgeBaseWriter, iter_kb_sources, read_kb_header
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+KB = {
+    **DEFAULT_HEADER,
+    "sources": {
+        "BRUTE.pdf": {"type": "pdf", "content": [{"page": 1, "text": "Брут — «сила»"}, {"page": 2, "text": ""}]},
+        "Wiki: Shaker": {"type": "wiki", "sections": [{"heading": "Intro", "text": "waves"}]},
+        "EMPTY.pdf": {"type": "pdf", "content": []},
+    },
+}
+
+
+def _write(kb_path, stream_content):
+    with KnowledgeBaseWriter(kb_path) as writer:
+        for name, data in KB["sources"].items():
+            if stream_content and "content" in data:
+                writer.write_source(name, data, content=iter(data["content"]))
+            else:
+                writer.write_source(name, data)
+
+
+def test_writer_matches_json_dump():
+    expected = json.dumps(KB, ensure_ascii=False, indent=2)
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = Path(tmp) / "kb.json"
+        for stream_content in (False, True):
+            _write(kb_path, stream_content)
+            assert kb_path.read_text(encoding="utf-8") == expected
+
+
+def test_reader_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = Path(tmp) / "kb.json"
+        _write(kb_path, True)
+        assert read_kb_header(kb_path) == DEFAULT_HEADER
+        assert dict(iter_kb_sources(kb_path)) == KB["sources"]
+
+
+def test_failed_write_keeps_previous_kb():
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = Path(tmp) / "kb.json"
+        _write(kb_path, False)
+        before = kb_path.read_text(encoding="utf-8")
+        try:
+            with KnowledgeBaseWriter(kb_path) as writer:
+                writer.write_source("partial.pdf", {"type": "pdf"})
+                raise RuntimeError("extraction failed")
+        except RuntimeError:
+            pass
+        assert kb_path.read_text(encoding="utf-8") == before
+        assert list(Path(tmp).iterdir()) == [kb_path]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Test the LLM client: variant batching, coalescing, retries and streaming."""
+
+import asyncio
+import sys
+import io
+
+from worm_llm import Backend, FakeBackend, GenerationError, LLMClient, TransientError, parse_completion
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+MESSAGES = [
+    {"role": "system", "content": "SKILL.md"},
+    {"role": "user", "content": 'Request:\n```json\n{"mode": "trigger_to_power"}\n```'},
+]
+
+
+class FlakyBackend(Backend):
+    """Fails with a transient error a set number of times, then answers."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    async def complete_one(self, messages):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise TransientError("503 Service Unavailable")
+        return '{"output": {"power_description": "ok"}}'
+
+
+def test_variants_are_one_backend_call():
+    backend = FakeBackend()
+    client = LLMClient(backend)
+    texts = asyncio.run(client.generate(MESSAGES, n=3))
+    assert len(texts) == 3 and len(set(texts)) == 3
+    assert backend.calls == 1
+    assert parse_completion(texts[0])["power_description"].startswith("Generated power")
+
+
+def test_identical_requests_in_flight_are_coalesced():
+    backend = FakeBackend(latency=0.05)
+    client = LLMClient(backend)
+
+    async def run():
+        return await asyncio.gather(*(client.generate(MESSAGES) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert all(result == results[0] for result in results)
+    assert backend.calls == 1
+    assert client.stats()["coalesced"] == 4
+
+
+def test_transient_errors_are_retried():
+    client = LLMClient(FlakyBackend(failures=2), retries=2, backoff=0)
+    assert parse_completion(asyncio.run(client.generate(MESSAGES))[0]) == {"power_description": "ok"}
+    assert client.stats()["retries"] == 2
+
+    client = LLMClient(FlakyBackend(failures=3), retries=2, backoff=0)
+    try:
+        asyncio.run(client.generate(MESSAGES))
+        assert False, "expected GenerationError"
+    except GenerationError:
+        pass
+    assert client.stats()["failures"] == 1
+
+
+def test_stream_joins_to_the_completion():
+    backend = FakeBackend(chunk_words=2)
+    client = LLMClient(backend)
+
+    async def run():
+        return [chunk async for chunk in client.stream(MESSAGES)]
+
+    chunks = asyncio.run(run())
+    assert len(chunks) > 1
+    assert "".join(chunks) == asyncio.run(LLMClient(FakeBackend()).generate(MESSAGES))[0]
+
+
+def test_backend_without_complete_one_fails_at_construction():
+    class Incomplete(Backend):
+        async def stream(self, messages):
+            yield ""
+
+    try:
+        Incomplete()
+        assert False, "expected TypeError"
+    except TypeError:
+        pass
+
+
+def test_parse_completion_accepts_wrapped_json():
+    assert parse_completion('Sure:\n```json\n{"mode": "x", "output": {"a": 1}}\n```') == {"a": 1}
+    assert parse_completion('{"a": 1}') == {"a": 1}
+    try:
+        parse_completion("no json here")
+        assert False, "expected GenerationError"
+    except GenerationError:
+        pass
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Test the compiled keyword matcher against the substring matching it replaced."""
+
+import sys
+import io
+import tempfile
+from pathlib import Path
+
+from worm_examples import parse_examples
+from worm_matcher import KeywordMatcher, hit_counts
+from worm_skill import WormSkill
+from worm_stem import stem
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+TESTS_PATH = Path(__file__).with_name("TESTS.md")
+
+TABLES = {
+    "trigger": {"stranger": ["escape", "escape attention", "noticed"], "brute": ["pain"]},
+    "emotion": {"betrayal": ["betray", "trust"], "rage": ["hate"]},
+}
+
+
+def _substring_labels(text: str, table):
+    """Labels the original matcher found: any keyword as a substring of the lowercased text."""
+    text = text.lower()
+    return {label for label, keywords in table.items() if any(keyword in text for keyword in keywords)}
+
+
+def test_derived_forms_match():
+    matcher = KeywordMatcher(TABLES, normalize=stem, prefix=True)
+    hits = matcher.scan("I felt the betrayal of my friends")
+    assert hit_counts(hits["emotion"]) == {"betrayal": 1}
+    hits = matcher.scan("They betrayed me. Betrayal, again.")
+    assert hits["emotion"]["betrayal"] == [("betray", 5), ("betray", 18)]
+
+
+def test_nested_keywords_and_whole_words():
+    matcher = KeywordMatcher(TABLES, normalize=stem, prefix=True)
+    hits = matcher.scan("Whatever happens, she tries to escape attention.")
+    assert hits["trigger"]["stranger"] == [("escape attention", 31), ("escape", 31)]
+    assert hits["emotion"] == {}
+
+
+def test_compiled_tables_are_cached():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = Path(tmp) / "keywords.matcher.json"
+        text = "Nobody noticed the pain; the betrayal of trust."
+        expected = KeywordMatcher(TABLES, cache_path, normalize=stem, prefix=True).scan(text)
+        assert cache_path.exists()
+        assert KeywordMatcher(TABLES, cache_path, normalize=stem, prefix=True).scan(text) == expected
+
+
+def test_hits_cover_substring_matcher_on_tests_md():
+    groups = {"trigger": WormSkill.TRIGGER_KEYWORDS, "emotion": WormSkill.EMOTION_KEYWORDS,
+              "mechanic": WormSkill.MECHANIC_KEYWORDS}
+    examples = parse_examples(TESTS_PATH.read_text(encoding="utf-8"))
+    assert examples
+    for example in examples:
+        for field in ("trigger_description", "power_description"):
+            text = example["input"].get(field)
+            if not text:
+                continue
+            hits = WormSkill.KEYWORD_MATCHER.scan(text)
+            for group, table in groups.items():
+                missing = _substring_labels(text, table) - set(hits[group])
+                assert not missing, (example["title"], field, group, missing)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
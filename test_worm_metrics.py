@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Test stage timers, counters and their exports."""
+
+import sys
+import io
+
+from worm_metrics import Metrics
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+def test_snapshot_reports_stages_and_counters():
+    metrics = Metrics()
+    for ms in range(1, 101):
+        metrics.observe("analyze", ms / 1000)
+    metrics.incr("requests")
+    metrics.incr("requests", 2)
+    with metrics.timer("score"):
+        pass
+
+    snapshot = metrics.snapshot()
+    analyze = snapshot["stages"]["analyze"]
+    assert analyze["calls"] == 100
+    assert analyze["total_ms"] == 5050.0 and analyze["mean_ms"] == 50.5
+    assert (analyze["p50_ms"], analyze["p95_ms"], analyze["p99_ms"], analyze["max_ms"]) == (51.0, 96.0, 100.0, 100.0)
+    assert snapshot["stages"]["score"]["calls"] == 1
+    assert snapshot["counters"] == {"requests": 3}
+
+    metrics.reset()
+    assert metrics.snapshot() == {"stages": {}, "counters": {}}
+
+
+def test_prometheus_export():
+    metrics = Metrics()
+    metrics.observe("search", 0.25)
+    metrics.incr("cache_hits", 4)
+    text = metrics.to_prometheus()
+    assert '# TYPE worm_stage_seconds summary' in text
+    assert 'worm_stage_seconds{stage="search",quantile="0.95"} 0.250000000' in text
+    assert 'worm_stage_seconds_count{stage="search"} 1' in text
+    assert "worm_cache_hits_total 4" in text.splitlines()
+
+
+def test_disabled_metrics_still_trace():
+    metrics = Metrics(enabled=False)
+    metrics.incr("requests")
+    with metrics.trace() as timings:
+        with metrics.timer("analyze"):
+            pass
+    assert set(timings) == {"analyze"}
+    assert metrics.snapshot() == {"stages": {}, "counters": {}}
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Test the search query language and class: filters."""
+
+import shutil
+import sys
+import io
+import tempfile
+from pathlib import Path
+
+from worm_index import KnowledgeIndex
+from worm_query import And, Filter, Phrase, QuerySyntaxError, Term, anchor_terms, parse
+from worm_skill import WormSkill
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+KB_PATH = Path(__file__).with_name("worm_knowledge_base.json")
+
+CLASS_NAMES = {key: [key, names["en"], names["ru"]] for key, names in WormSkill.CLASSIFICATIONS.items()}
+
+KNOWLEDGE_BASE = {
+    "sources": {
+        "SHAKERS.pdf": {"type": "pdf", "content": [{"page": 1, "text": "Area effects and force fields."}]},
+        "Триггеры-Изломов-_Breaker_.pdf": {"type": "pdf", "content": [{"page": 1, "text": "Состояние излома."}]},
+        "wiki_Power_Classifications": {"type": "wiki", "status": "success",
+                                       "url": "https://worm.fandom.com/wiki/Power_Classifications",
+                                       "sections": [{"heading": "Shaker", "text": "Area effects."},
+                                                    {"heading": "", "text": "Brutes are tough."}]},
+    }
+}
+
+
+def test_parse():
+    assert parse('type:pdf "trigger event"') == And([Filter("type", "pdf"), Phrase(["trigger", "event"], ["trigger", "event"])])
+    assert parse("class:повелитель", WormSkill.CLASS_ALIASES) == Filter("class", "master")
+    assert parse("and") == Term("and", "and")
+    try:
+        parse("(trigger")
+    except QuerySyntaxError:
+        pass
+    else:
+        raise AssertionError("unbalanced parentheses accepted")
+
+
+def test_class_filter_uses_tagged_classes():
+    index = KnowledgeIndex.build(KNOWLEDGE_BASE, CLASS_NAMES)
+    sources = lambda query: [index.docs[doc_id]["section"] if index.docs[doc_id]["type"] == "wiki"
+                             else index.docs[doc_id]["source"] for doc_id, _ in index.match(query)]
+    assert sources("class:shaker") == ["SHAKERS.pdf", "Shaker"]
+    assert sources("class:brute") == [""]
+    assert sources("class:breaker") == ["Триггеры-Изломов-_Breaker_.pdf"]
+    assert sources("class:shaker area") == ["SHAKERS.pdf", "Shaker"]
+
+
+def test_class_filter_trusts_tags_over_source_names():
+    kb = {"sources": {"Moonshaker.pdf": {"type": "pdf", "content": [{"page": 1, "text": "Brutes shrug off hits."}]}}}
+    tagged = KnowledgeIndex.build(kb, CLASS_NAMES)
+    assert tagged.docs[0]["classes"] == ["brute"]
+    assert tagged.match("class:shaker") == []
+    assert [doc_id for doc_id, _ in tagged.match("class:brute")] == [0]
+    # Built without class names: the source name is all there is
+    untagged = KnowledgeIndex.build(kb)
+    assert "classes" not in untagged.docs[0]
+    assert [doc_id for doc_id, _ in untagged.match("class:shaker")] == [0]
+
+
+def test_snippet_anchor_ignores_query_syntax():
+    assert anchor_terms(parse('"master trigger" AND class:tinker')) == ["master", "trigger"]
+    assert anchor_terms(parse("trigger NOT tinker type:pdf")) == ["trigger"]
+    assert anchor_terms(parse("class:tinker")) == []
+
+    text = "A master of gadgets. Years later, the master - trigger of a tinker."
+    kb = {"sources": {"TINKERS.pdf": {"type": "pdf", "content": [{"page": 1, "text": text}]}}}
+    index = KnowledgeIndex.build(kb, CLASS_NAMES)
+    node = parse('"master trigger" AND class:tinker', WormSkill.CLASS_ALIASES)
+    [(doc_id, term_offsets)] = index.match(node)
+    start = text.index("master - trigger")
+    assert WormSkill._anchor_span(text, term_offsets, anchor_terms(node)) == (start, len("master - trigger"))
+    # Terms that never follow each other: the first anchor term, one word long
+    node = parse("trigger master")
+    [(doc_id, term_offsets)] = index.match(node)
+    assert WormSkill._anchor_span(text, term_offsets, anchor_terms(node)) == (text.index("trigger"), len("trigger"))
+    assert WormSkill._anchor_span(text, {}, []) == (0, 0)
+
+
+def test_committed_kb_class_filters():
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = Path(tmp) / KB_PATH.name
+        shutil.copy(KB_PATH, kb_path)
+        skill = WormSkill(str(kb_path), cache=False)
+
+        shaker = skill.search_knowledge_base("class:shaker", k=50)
+        assert shaker
+        assert all("shaker" in skill.index.docs[doc_id]["classes"]
+                   for doc_id, _ in skill.index.match("class:shaker"))
+
+        brute = skill.search_knowledge_base("class:brute", k=20)
+        assert len(brute) == 20 and {r["source"] for r in brute} == {"BRUTE.pdf"}
+        skill.index.close()
+        skill.store.close()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Test classification scoring with the feature x class weight matrix."""
+
+import math
+import sys
+import io
+
+from worm_scoring import NUMPY_MIN_BATCH, ClassificationScorer
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+SCORER = ClassificationScorer(["brute", "master", "stranger"], {
+    ("trigger", "brute"): {"brute": 1.0},
+    ("trigger", "master"): {"master": 1.0},
+    ("emotion", "isolation"): {"master": 0.5, "stranger": 0.3},
+})
+
+
+def test_scores_are_log_damped_weighted_sums():
+    [scores] = SCORER.score([{"trigger": {"master": 2}, "emotion": {"isolation": 1, "unknown": 5}}])
+    assert scores[0] == 0.0
+    assert math.isclose(scores[1], math.log1p(2) + 0.5 * math.log1p(1))
+    assert math.isclose(scores[2], 0.3 * math.log1p(1))
+
+
+def test_rank_and_rating():
+    ranked = SCORER.rank([0.0, 2.0, 0.5])
+    assert [(cls, rating) for cls, _, rating in ranked] == [("master", SCORER.rating(2.0)), ("stranger", SCORER.rating(0.5))]
+    assert SCORER.rank([0.0, 0.0, 0.0]) == []
+    assert SCORER.rating(0.0) == 1 and SCORER.rating(100.0) == 12
+
+
+def test_large_batches_score_like_single_inputs():
+    batch = [{"trigger": {"brute": n % 3, "master": n % 2}, "emotion": {"isolation": n % 4}}
+             for n in range(NUMPY_MIN_BATCH + 5)]
+    together = SCORER.score(batch)
+    one_by_one = [SCORER.score([counts])[0] for counts in batch]
+    assert all(math.isclose(a, b, abs_tol=1e-12) for row, other in zip(together, one_by_one)
+               for a, b in zip(row, other))
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Test semantic retrieval and that keyword search never loads it."""
+
+import shutil
+import subprocess
+import sys
+import io
+import tempfile
+from pathlib import Path
+
+from worm_skill import WormSkill
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+KB_PATH = Path(__file__).with_name("worm_knowledge_base.json")
+
+try:
+    import numpy  # noqa: F401
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+KEYWORD_SEARCH = """
+import sys
+from worm_skill import WormSkill
+skill = WormSkill(sys.argv[1], cache=False)
+assert skill.search_knowledge_base("trigger")
+print(sorted(name for name in ("numpy", "worm_semantic") if name in sys.modules))
+"""
+
+
+def test_keyword_search_does_not_import_numpy():
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = Path(tmp) / KB_PATH.name
+        shutil.copy(KB_PATH, kb_path)
+        # Cold rebuild of every search artifact, then a warm open
+        for _ in range(2):
+            result = subprocess.run([sys.executable, "-c", KEYWORD_SEARCH, str(kb_path)], capture_output=True,
+                                    text=True, cwd=Path(__file__).parent, check=True)
+            assert result.stdout.strip() == "[]"
+        assert not kb_path.with_name(kb_path.stem + ".vectors.npy").exists()
+
+
+def test_semantic_search_finds_related_chunks():
+    if not HAVE_NUMPY:
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = Path(tmp) / KB_PATH.name
+        shutil.copy(KB_PATH, kb_path)
+        skill = WormSkill(str(kb_path), cache=False)
+        assert skill.search_knowledge_base("build gadgets", fuzzy=False) == []
+
+        results = skill.semantic_search("build gadgets", k=3)
+        assert [result["source"] for result in results] == ["TINKERS.pdf"] * 3
+        assert results[0]["score"] > results[-1]["score"] > 0
+        assert kb_path.with_name(kb_path.stem + ".vectors.npy").exists()
+
+        # Reopened from the saved matrices
+        reopened = WormSkill(str(kb_path), cache=False).semantic_search("build gadgets", k=3)
+        assert reopened == results
+        skill.index.close()
+        skill.store.close()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Test the HTTP service end to end over a local socket."""
+
+import asyncio
+import http.client
+import json
+import sys
+import io
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import worm_server
+from worm_server import WormServer
+from worm_skill import WormSkill
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+REQUEST = {"mode": "trigger_to_power", "trigger_description": "Trapped and helpless, nobody came."}
+
+
+@contextmanager
+def running_server():
+    server = WormServer(WormSkill(cache=False))
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    state = {}
+
+    async def serve():
+        state["server"] = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        state["port"] = state["server"].sockets[0].getsockname()[1]
+        started.set()
+
+    async def stop():
+        state["server"].close()
+        # Connection handlers still waiting on keep-alive reads
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    thread = threading.Thread(target=lambda: (loop.run_until_complete(serve()), loop.run_forever()), daemon=True)
+    thread.start()
+    started.wait(10)
+    try:
+        yield state["port"]
+    finally:
+        asyncio.run_coroutine_threadsafe(stop(), loop).result(10)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(10)
+        loop.close()
+        server.close()
+
+
+def _post(port: int, path: str, body) -> tuple:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        connection.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def test_process():
+    with running_server() as port:
+        status, payload = _post(port, "/process", REQUEST)
+    assert status == 200 and payload["mode"] == "trigger_to_power"
+
+
+def test_malformed_requests_get_400():
+    bad = [
+        ("/process", [REQUEST]),
+        ("/process", {"mode": "unknown", "trigger_description": "x"}),
+        ("/process", {"mode": "trigger_to_power", "trigger_description": 42}),
+        ("/process", {"mode": "trigger_to_power"}),
+        ("/process", {**REQUEST, "language": ["en"]}),
+        ("/process", {**REQUEST, "num_variants": "two"}),
+        ("/process", {**REQUEST, "num_variants": 100}),
+        ("/search", {"query": "trigger", "k": "abc"}),
+        ("/search", {"query": "trigger", "k": "abc", "semantic": True}),
+        ("/search", {"query": "trigger", "k": 0}),
+        ("/search", {"query": "trigger", "source_types": "pdf"}),
+        ("/search", {"query": "(trigger"}),
+        ("/dedup", {"request": {"mode": "trigger_to_power", "trigger_description": None}}),
+        ("/dedup", {"request": REQUEST, "k": "many"}),
+    ]
+    with running_server() as port:
+        for path, body in bad:
+            status, payload = _post(port, path, body)
+            assert status == 400, (path, body, status, payload)
+            assert payload["error"]
+
+
+def test_search_accepts_numeric_k():
+    with running_server() as port:
+        status, payload = _post(port, "/search", {"query": "trigger", "k": "2", "source_types": ["pdf"]})
+    assert status == 200 and len(payload["results"]) == 2
+    assert all(result["type"] == "pdf" for result in payload["results"])
+
+
+@contextmanager
+def patched(**values):
+    """Temporarily override worm_server module constants."""
+    saved = {name: getattr(worm_server, name) for name in values}
+    for name, value in values.items():
+        setattr(worm_server, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(worm_server, name, value)
+
+
+def _slow_post(port: int, path: str, body: bytes, pause: float, sent: int = None) -> tuple:
+    """POST with the body trickling in after a pause; `sent` bytes of it only, if given."""
+    with socket.create_connection(("127.0.0.1", port), timeout=30) as sock:
+        sock.sendall(f"POST {path} HTTP/1.1\r\nHost: x\r\nContent-Length: {len(body)}\r\n"
+                     "Connection: close\r\n\r\n".encode("latin-1"))
+        half = len(body) // 2 if sent is None else sent
+        sock.sendall(body[:half])
+        time.sleep(pause)
+        if sent is None:
+            sock.sendall(body[half:])
+        response = b""
+        while chunk := sock.recv(65536):
+            response += chunk
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+def test_slow_body_is_not_an_idle_connection():
+    body = json.dumps(REQUEST).encode("utf-8")
+    with patched(KEEPALIVE_TIMEOUT=0.2, BODY_TIMEOUT=5.0), running_server() as port:
+        status, payload = _slow_post(port, "/process", body, pause=0.5)
+        assert status == 200 and payload["mode"] == "trigger_to_power"
+    with patched(BODY_TIMEOUT=0.2), running_server() as port:
+        status, payload = _slow_post(port, "/process", body, pause=0.5, sent=10)
+        assert status == 408 and payload["error"]
+
+
+def test_oversized_batch_gets_413():
+    with patched(MAX_BATCH_RECORDS=2), running_server() as port:
+        status, payload = _post(port, "/process_batch", [REQUEST] * 3)
+        assert status == 413 and payload["error"]
+        status, payload = _post(port, "/process_batch", [REQUEST] * 2)
+        assert status == 200 and len(payload["results"]) == 2
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
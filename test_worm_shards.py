@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Test the sharded knowledge base copy written for index.html."""
+
+import gzip
+import json
+import sys
+import io
+import tempfile
+from pathlib import Path
+
+from worm_kb_io import DEFAULT_HEADER, KnowledgeBaseWriter
+from worm_shards import write_shards
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+KB_PATH = Path(__file__).with_name("worm_knowledge_base.json")
+
+PAGES = [{"page": n, "text": f"Page {n} " + "x" * 300} for n in range(1, 11)]
+RAW_HTML = ('<html><head><title>Shard | Worm Wiki</title>'
+            '<meta property="og:description" content="Shards are the source of powers."><script>var a = 1')
+
+
+def _write_kb(path: Path) -> None:
+    with KnowledgeBaseWriter(path, DEFAULT_HEADER) as writer:
+        writer.write_source("BRUTE.pdf", {"type": "pdf", "pages": len(PAGES), "content": PAGES})
+        writer.write_source("wiki_Shard", {"type": "wiki", "url": "https://worm.fandom.com/wiki/Shard",
+                                           "status": "success", "raw_html": RAW_HTML})
+
+
+def _items(out_dir: Path, source) -> list:
+    items = []
+    for part in source["parts"]:
+        data = json.loads((out_dir / part["file"]).read_bytes())
+        assert data["first"] == part["first"] and len(data["items"]) == part["count"]
+        assert gzip.decompress((out_dir / (part["file"] + ".gz")).read_bytes()) == (out_dir / part["file"]).read_bytes()
+        items.extend(data["items"])
+    return items
+
+
+def test_sources_are_split_into_parts():
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = Path(tmp) / "kb.json"
+        _write_kb(kb_path)
+        out_dir = Path(tmp) / "shards"
+        stats = write_shards(kb_path, out_dir, shard_bytes=1024)
+        manifest = json.loads((out_dir / "manifest.json").read_text(encoding="utf-8"))
+
+        pdf = manifest["sources"][0]
+        assert (pdf["name"], pdf["item_field"], pdf["items"]) == ("BRUTE.pdf", "content", 10)
+        assert len(pdf["parts"]) > 1
+        assert _items(out_dir, pdf) == PAGES
+        assert stats["sources"] == 2 and stats["written"] == stats["parts"]
+
+        # Unchanged parts are not rewritten
+        assert write_shards(kb_path, out_dir, shard_bytes=1024)["written"] == 0
+
+
+def test_raw_html_wiki_entries_get_sections():
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = Path(tmp) / "kb.json"
+        _write_kb(kb_path)
+        out_dir = Path(tmp) / "shards"
+        write_shards(kb_path, out_dir)
+        wiki = json.loads((out_dir / "manifest.json").read_text(encoding="utf-8"))["sources"][1]
+        assert (wiki["item_field"], wiki["items"]) == ("sections", 1)
+
+        first = json.loads((out_dir / wiki["parts"][0]["file"]).read_bytes())
+        assert "raw_html" not in first["fields"]
+        assert first["items"] == [{"heading": "", "text": "Shard | Worm Wiki\n\nShards are the source of powers."}]
+
+
+def test_committed_manifest_has_wiki_sections():
+    manifest = json.loads((KB_PATH.with_name(KB_PATH.stem + ".shards") / "manifest.json").read_text(encoding="utf-8"))
+    wiki = [source for source in manifest["sources"] if source["type"] == "wiki"]
+    assert wiki and all(source["item_field"] == "sections" and source["items"] > 0 for source in wiki)
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
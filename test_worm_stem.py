@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""Test Russian/English stemming."""
+
+import sys
+import io
+
+from worm_stem import stem, stem_en, stem_ru, stem_text
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+def test_russian_inflections_share_a_stem():
+    assert {stem_ru(word) for word in ("триггер", "триггера", "триггеры", "триггеров", "триггером")} == {"триггер"}
+    assert {stem(word) for word in ("трясун", "трясуна", "трясуны")} == {"трясун"}
+    assert stem("ёлки") == "елк"
+
+
+def test_english_porter_stems():
+    assert [stem_en(word) for word in ("running", "runs", "caresses", "ponies", "relational", "happiness")] == \
+        ["run", "run", "caress", "poni", "relat", "happi"]
+
+
+def test_other_terms_are_left_alone():
+    assert stem("42") == "42"
+    assert stem("x2") == "x2"
+
+
+def test_stem_text_keeps_punctuation_and_spacing():
+    assert stem_text("Триггеры: Breaking points, 2 раза!") == "триггер: break point, 2 раз!"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
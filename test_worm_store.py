@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Test the memory-mapped page store."""
+
+import sys
+import io
+import tempfile
+from pathlib import Path
+
+from worm_index import KnowledgeIndex, iter_kb_documents, kb_fingerprint
+from worm_store import PageStore
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+KNOWLEDGE_BASE = {
+    "sources": {
+        "BRUTE.pdf": {"type": "pdf", "content": [
+            {"page": 1, "text": "Тело выдерживает удар.\n\nThe brute shrugs it off."},
+            {"page": 2, "text": "Second page."},
+        ]},
+    }
+}
+
+
+def test_store_holds_index_documents():
+    store = PageStore.build(KNOWLEDGE_BASE)
+    texts = [text for _, text in iter_kb_documents(KNOWLEDGE_BASE)]
+    assert len(store) == len(KnowledgeIndex.build(KNOWLEDGE_BASE).docs) == len(texts)
+    assert [store.text(doc_id) for doc_id in range(len(store))] == texts
+    assert store.size(0) == len(texts[0].encode("utf-8"))
+
+
+def test_saved_store_is_memory_mapped():
+    store = PageStore.build(KNOWLEDGE_BASE)
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = Path(tmp) / "kb.json"
+        kb_path.write_text("{}", encoding="utf-8")
+        store.save(kb_path, kb_fingerprint(kb_path))
+
+        opened = PageStore.open(kb_path, kb_fingerprint(kb_path))
+        assert opened is not None
+        assert [opened.text(i) for i in range(len(opened))] == [store.text(i) for i in range(len(store))]
+        opened.close()
+
+        kb_path.write_text("{ }", encoding="utf-8")
+        assert PageStore.open(kb_path, kb_fingerprint(kb_path)) is None
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
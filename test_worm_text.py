@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Test tokenization and chunking shared by extraction and the search index."""
+
+import sys
+import io
+
+from worm_text import chunk_page, iter_tokens, split_chunks, tokenize
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+def test_tokens_keep_offsets():
+    text = "The ﬁrst Trigger — Триггер!"
+    tokens = list(iter_tokens(text))
+    assert [term for term, _ in tokens] == ["the", "first", "trigger", "триггер"]
+    assert [text[offset:offset + 3] for _, offset in tokens] == ["The", "ﬁrs", "Tri", "Три"]
+    assert tokenize("Ｆｕｌｌ-width") == ["full", "width"]
+
+
+def test_paragraphs_are_packed_into_chunks():
+    paragraphs = ["First paragraph.", "Second paragraph.", "x" * 50]
+    text = "\n \n".join(paragraphs)
+    chunks = split_chunks(text, max_chars=40)
+    assert all(end - start <= 40 for start, end in chunks)
+    assert text[chunks[0][0]:chunks[0][1]] == "First paragraph.\n \nSecond paragraph."
+    assert "".join(text[start:end] for start, end in chunks[1:]) == "x" * 50
+
+
+def test_long_paragraphs_split_at_sentences():
+    text = "One sentence here. Another one follows! " * 3
+    chunks = split_chunks(text.strip(), max_chars=45)
+    assert [text[start:end] for start, end in chunks] == ["One sentence here. Another one follows!"] * 3
+
+
+def test_chunk_ids_are_stable():
+    text = "Alpha.\n\nBeta."
+    assert chunk_page("BRUTE.pdf", 3, text) == chunk_page("BRUTE.pdf", 3, text) == [
+        {"id": "BRUTE.pdf#p3.0", "start": 0, "end": 13}]
+    assert [c["id"] for c in chunk_page("BRUTE.pdf", 3, "a" * 700)] == ["BRUTE.pdf#p3.0", "BRUTE.pdf#p3.1"]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"[+] {name}")
+    print("\n✅ All tests completed successfully!")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Batch processing helpers for WormSkill.
+
+Requests are streamed one record at a time from JSONL input and responses are
+written back as JSONL in input order. A record that fails (bad JSON, unknown
+mode, missing field) produces an error line instead of aborting the run.
+
+Large runs can be spread over a process pool: records are dispatched in
+chunks, each worker builds its WormSkill once in the pool initializer, and at
+most a few chunks per worker are in flight so memory stays bounded.
+"""
+
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, TextIO, Tuple, Union
+
+
+class RecordError(ValueError):
+    """A batch input line that could not be decoded into a request."""
+
+
+def read_jsonl(stream: Iterable[str]) -> Iterator[Union[Dict[str, Any], RecordError]]:
+    """
+    Lazily decode JSONL requests.
+
+    Blank lines are skipped. Malformed lines yield a RecordError in their
+    place so the output stays aligned with the input.
+    """
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield RecordError(f"line {line_no}: invalid JSON: {e}")
+
+
+def error_response(index: int, error: Exception) -> Dict[str, Any]:
+    """Response written in place of a record that failed."""
+    return {
+        "index": index,
+        "error": {
+            "type": type(error).__name__,
+            "message": str(error)
+        }
+    }
+
+
+def iter_chunks(records: Iterable[Any], chunk_size: int) -> Iterator[List[Tuple[int, Any]]]:
+    """Lazily group records into lists of (index, record) pairs."""
+    indexed = enumerate(records)
+    while True:
+        chunk = list(islice(indexed, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def process_chunk(skill: Any, chunk: List[Tuple[int, Any]]) -> List[Dict[str, Any]]:
+    """
+    Process a chunk of (index, record) pairs with one WormSkill.process_many call.
+
+    Failures (undecodable lines, non-object records, processing errors) become
+    error responses in place.
+    """
+    responses: Dict[int, Dict[str, Any]] = {}
+    valid = []
+    for index, record in chunk:
+        if isinstance(record, RecordError):
+            responses[index] = error_response(index, record)
+        elif not isinstance(record, dict):
+            responses[index] = error_response(index, TypeError("request must be a JSON object"))
+        else:
+            valid.append((index, record))
+
+    results = skill.process_many([record for _, record in valid])
+    for (index, _), result in zip(valid, results):
+        responses[index] = error_response(index, result) if isinstance(result, Exception) else result
+
+    return [responses[index] for index, _ in chunk]
+
+
+# Per-process skill instance, set up once by the pool initializer
+_worker_skill = None
+
+
+def _init_worker(kb_path: str, passages: bool = False) -> None:
+    """Process pool initializer: load one WormSkill per worker."""
+    global _worker_skill
+    from worm_skill import WormSkill
+
+    _worker_skill = WormSkill(kb_path, passages=passages)
+
+
+def _process_chunk(chunk: List[Tuple[int, Any]]) -> List[Dict[str, Any]]:
+    """Process pool task: handle a chunk of (index, record) pairs."""
+    return process_chunk(_worker_skill, chunk)
+
+
+def process_parallel(records: Iterable[Any], kb_path: str, workers: int,
+                     chunk_size: int = 256, passages: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Process records on a pool of worker processes.
+
+    Args:
+        records: Iterable of requests (consumed lazily)
+        kb_path: Knowledge base each worker opens in its initializer
+        workers: Number of worker processes
+        chunk_size: Records sent to a worker per task
+        passages: Workers cite retrieved KB passages (see WormSkill)
+
+    Returns:
+        Iterator of responses in input order
+    """
+    max_pending = workers * 2
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(kb_path, passages)) as pool:
+        pending = deque()
+        for chunk in iter_chunks(records, chunk_size):
+            pending.append(pool.submit(_process_chunk, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
+def write_jsonl(responses: Iterable[Dict[str, Any]], stream: TextIO) -> Dict[str, int]:
+    """
+    Write responses as JSONL.
+
+    Returns:
+        Counts of written records and errors
+    """
+    stats = {"records": 0, "errors": 0}
+    for response in responses:
+        stream.write(json.dumps(response, ensure_ascii=False) + "\n")
+        stats["records"] += 1
+        if "error" in response:
+            stats["errors"] += 1
+    stream.flush()
+    return stats
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Result cache for WormSkill.process.
+
+Responses are cached under a hash of the request fields that determine them
+(mode, text, language, known_classification, num_variants) together with a fingerprint
+of everything that can change the answer (keyword tables, knowledge base
+file). When the fingerprint changes the cache starts a new generation, so
+stale entries are never served.
+
+The in-memory tier is an LRU bounded by entry count and total bytes, with an
+optional TTL. An optional on-disk tier keeps entries across processes.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+def normalize_request(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce a request to the fields that determine its response.
+
+    Values are kept exactly as sent: the response echoes the text
+    (input_summary) and depends on its length, so requests differing only in
+    whitespace get different responses and must not share an entry.
+    """
+    mode = input_data.get("mode")
+    text_field = "power_description" if mode == "power_to_trigger" else "trigger_description"
+    return {
+        "mode": mode,
+        "text": input_data.get(text_field),
+        "language": input_data.get("language", "en"),
+        "known_classification": input_data.get("known_classification"),
+        "num_variants": input_data.get("num_variants", 1),
+    }
+
+
+class ResultCache:
+    """LRU/TTL response cache with an optional on-disk tier."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024,
+                 ttl: Optional[float] = None, disk_path: Optional[str] = None):
+        """
+        Args:
+            max_entries: In-memory entry limit
+            max_bytes: In-memory limit on serialized response size
+            ttl: Seconds an entry stays valid (None = no expiry)
+            disk_path: Directory for the on-disk tier (None = memory only)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_path = Path(disk_path) if disk_path else None
+
+        # key -> (serialized response, size in bytes, expiry timestamp or None)
+        self._entries: "OrderedDict[str, Tuple[str, int, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self._generation = ""
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def set_generation(self, fingerprint: str) -> None:
+        """Drop every entry made under a different fingerprint."""
+        if fingerprint == self._generation:
+            return
+        if self._generation:
+            self._stats["invalidations"] += 1
+        self._generation = fingerprint
+        self.clear()
+
+        if self.disk_path and self.disk_path.is_dir():
+            for child in self.disk_path.iterdir():
+                if child.is_dir() and child.name != self._generation_dir():
+                    shutil.rmtree(child, ignore_errors=True)
+
+    def key(self, input_data: Dict[str, Any]) -> str:
+        """Cache key for a request."""
+        data = json.dumps(normalize_request(input_data), ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of the cached response, or None."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            data, _, expires = entry
+            if expires is None or expires > time.time():
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return json.loads(data)
+            self._remove(key)
+            self._stats["expirations"] += 1
+
+        data = self._disk_get(key)
+        if data is not None:
+            self._stats["disk_hits"] += 1
+            self._store(key, data)
+            return json.loads(data)
+
+        self._stats["misses"] += 1
+        return None
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """Cache a response (serialized, so later mutation by the caller is harmless)."""
+        data = json.dumps(response, ensure_ascii=False)
+        self._store(key, data)
+        self._disk_put(key, data)
+
+    def clear(self) -> None:
+        """Empty the in-memory tier."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        lookups = self._stats["hits"] + self._stats["disk_hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hit_rate": round((self._stats["hits"] + self._stats["disk_hits"]) / lookups, 4) if lookups else 0.0,
+        }
+
+    def _store(self, key: str, data: str) -> None:
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+
+        expires = time.time() + self.ttl if self.ttl else None
+        self._entries[key] = (data, size, expires)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self._stats["evictions"] += 1
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _generation_dir(self) -> str:
+        return self._generation[:16] or "default"
+
+    def _disk_file(self, key: str) -> Path:
+        return self.disk_path / self._generation_dir() / key[:2] / f"{key}.json"
+
+    def _disk_get(self, key: str) -> Optional[str]:
+        if not self.disk_path:
+            return None
+        path = self._disk_file(key)
+        try:
+            if self.ttl and path.stat().st_mtime + self.ttl <= time.time():
+                path.unlink()
+                self._stats["expirations"] += 1
+                return None
+            return path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, data: str) -> None:
+        if not self.disk_path:
+            return
+        path = self._disk_file(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+            tmp_path.write_text(data, encoding="utf-8")
+            os.replace(tmp_path, path)
+        except OSError:
+            pass  # The disk tier is best-effort
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection for submitted triggers and powers (MinHash + LSH).
+
+Each text becomes a set of shingles (consecutive stemmed word pairs), and
+the set is summarised by a MinHash signature: for each of NUM_PERM hash
+functions, the minimum hash over the shingles. The share of signature
+positions two texts agree on estimates the Jaccard similarity of their
+shingle sets.
+
+Signatures are split into BANDS bands of ROWS values; texts that agree on a
+whole band land in the same bucket. A lookup only compares the texts sharing
+at least one bucket with the query (pairs at Jaccard 0.5 share one with
+~87% probability, pairs at 0.2 with ~5%), so finding the closest entry among
+a million never compares all pairs.
+
+On disk (next to a base path such as worm_submissions.dedup):
+
+    .json         {"format", "num_perm", "bands", "seed", "compacted"}
+    .keys.jsonl   one [key, label] line per entry, appended on insert
+    .sig          uint32 signatures, NUM_PERM per entry, appended on insert
+    .bands        per band: `compacted` sorted uint64 bucket keys, then the
+                  matching uint32 entry ids (written by save())
+
+Opening memory-maps .sig and .bands and binary-searches the sorted band
+arrays, so nothing is rebuilt at load; entries appended since the last
+save() are re-bucketed in memory. Byte order is the machine's (little-endian
+on every supported platform).
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import random
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from worm_stem import stem
+from worm_text import tokenize
+
+
+# Bump when the on-disk layout or the shingling changes
+DEDUP_FORMAT = 1
+
+# Signature length, and its split into bands x rows (LSH threshold ~ (1/BANDS)^(1/ROWS) = 0.42)
+NUM_PERM = 128
+BANDS = 32
+
+# Words per shingle
+SHINGLE_SIZE = 2
+
+# Estimated Jaccard similarity from which entries are reported as near-duplicates
+DEDUP_THRESHOLD = 0.5
+
+# Hash family h(x) = (a*x + b) mod p, truncated to 32 bits
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fills the band arrays' slots of entries without words (sorts last, never looked up)
+_PADDING_KEY = (1 << 64) - 1
+
+_np = None
+
+
+def _is_empty(signature) -> bool:
+    """True for the signature of a text without words (it goes in no bucket)."""
+    return all(v == _MAX_HASH for v in signature)
+
+
+def _numpy():
+    """NumPy module, or False if it is not installed (imported on first use)."""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = False
+    return _np
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> List[int]:
+    """32-bit hashes of the text's stemmed word n-grams (the words themselves if it is shorter)."""
+    words = [stem(word) for word in tokenize(text)]
+    grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)] or words
+    return sorted({zlib.crc32(gram.encode("utf-8")) for gram in grams})
+
+
+class DedupIndex:
+    """MinHash signatures with an LSH band index; incremental inserts, persisted append-only."""
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS, seed: int = 1,
+                 path: Optional[Path] = None):
+        """
+        Args:
+            num_perm: Signature length (hash functions)
+            bands: LSH bands (must divide num_perm); more bands find less similar pairs
+            seed: Seed of the hash family (entries are only comparable under the same seed)
+            path: Base path to append inserts to (see open()/save()); None keeps it in memory
+        """
+        if num_perm % bands:
+            raise ValueError(f"bands ({bands}) must divide num_perm ({num_perm})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.seed = seed
+        self.path = path
+
+        rng = random.Random(seed)
+        self._a = [rng.randrange(1, 1 << 32) for _ in range(num_perm)]
+        self._b = [rng.randrange(0, 1 << 32) for _ in range(num_perm)]
+
+        self.keys: List[str] = []
+        self.labels: List[Optional[str]] = []
+        # Compacted part (memory-mapped after open()), then entries added since
+        self._compacted = 0
+        self._base_sigs: Any = array("I")
+        self._base_bands: List[Tuple[Any, Any]] = []
+        self._sigs = array("I")
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(bands)]
+        self._maps: List[mmap.mmap] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    # Signatures
+
+    def signature(self, text: str) -> List[int]:
+        """MinHash signature of a text (all _MAX_HASH if it has no words)."""
+        hashes = shingles(text)
+        if not hashes:
+            return [_MAX_HASH] * self.num_perm
+
+        np = _numpy() if len(hashes) > 8 else None
+        if np:
+            xs = np.array(hashes, dtype=np.uint64)
+            a = np.array(self._a, dtype=np.uint64)[:, None]
+            b = np.array(self._b, dtype=np.uint64)[:, None]
+            # a, x < 2^32 and b < 2^32, so a*x + b never overflows uint64
+            return ((a * xs + b) % _MERSENNE_PRIME & _MAX_HASH).min(axis=1).tolist()
+
+        return [min((a * x + b) % _MERSENNE_PRIME & _MAX_HASH for x in hashes)
+                for a, b in zip(self._a, self._b)]
+
+    def _band_keys(self, signature: List[int]) -> List[int]:
+        """64-bit bucket key of each band."""
+        rows = self.rows
+        packer = struct.Struct(f"<{rows}I")
+        return [int.from_bytes(hashlib.blake2b(packer.pack(*signature[i:i + rows]), digest_size=8).digest(), "little")
+                for i in range(0, self.num_perm, rows)]
+
+    def _signature_of(self, entry: int) -> Any:
+        start = entry * self.num_perm
+        if entry < self._compacted:
+            return self._base_sigs[start:start + self.num_perm]
+        start -= self._compacted * self.num_perm
+        return self._sigs[start:start + self.num_perm]
+
+    @staticmethod
+    def similarity(sig_a, sig_b) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+    # Index
+
+    def add(self, key: str, text: str, label: Optional[str] = None) -> int:
+        """
+        Insert a text (appended to the files when the index has a path).
+
+        Args:
+            key: Caller's id for the entry (returned by query)
+            text: Submission text
+            label: Optional display name (e.g. "TESTS.md Example 14")
+
+        Returns:
+            Entry number
+        """
+        return self._insert(key, label, self.signature(text))
+
+    def _insert(self, key: str, label: Optional[str], signature: List[int], persist: bool = True) -> int:
+        entry = len(self.keys)
+        self.keys.append(key)
+        self.labels.append(label)
+        self._sigs.extend(signature)
+        if not _is_empty(signature):
+            for band, bucket_key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(bucket_key, []).append(entry)
+
+        if persist and self.path is not None:
+            with open(self._file(".sig"), "ab") as f:
+                array("I", signature).tofile(f)
+            with open(self._file(".keys.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps([key, label], ensure_ascii=False) + "\n")
+        return entry
+
+    def _candidates(self, signature: List[int]) -> set:
+        found = set()
+        for band, bucket_key in enumerate(self._band_keys(signature)):
+            found.update(self._buckets[band].get(bucket_key, ()))
+            if band < len(self._base_bands):
+                keys, ids = self._base_bands[band]
+                i = bisect_left(keys, bucket_key)
+                while i < len(keys) and keys[i] == bucket_key:
+                    found.add(ids[i])
+                    i += 1
+        return found
+
+    def query(self, text: str, k: int = 5, threshold: float = DEDUP_THRESHOLD) -> List[Dict[str, Any]]:
+        """
+        Entries similar to a text, most similar first.
+
+        Only entries sharing an LSH bucket with the text are compared, so
+        the cost depends on the number of candidates, not the index size.
+
+        Returns:
+            [{"key", "label", "similarity"}, ...] with similarity >= threshold
+        """
+        signature = self.signature(text)
+        if _is_empty(signature):
+            return []
+        scored = []
+        for entry in self._candidates(signature):
+            similarity = self.similarity(signature, self._signature_of(entry))
+            if similarity >= threshold:
+                scored.append((similarity, entry))
+        scored.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [{"key": self.keys[entry], "label": self.labels[entry], "similarity": round(similarity, 4)}
+                for similarity, entry in scored[:k]]
+
+    def closest(self, text: str, threshold: float = DEDUP_THRESHOLD) -> Optional[Dict[str, Any]]:
+        """The most similar entry at or above threshold, or None."""
+        matches = self.query(text, 1, threshold)
+        return matches[0] if matches else None
+
+    # Persistence
+
+    def _file(self, suffix: str) -> Path:
+        return self.path.with_name(self.path.name + suffix)
+
+    @classmethod
+    def open(cls, path: Path) -> Optional["DedupIndex"]:
+        """
+        Open a saved index (None if missing or in an older format). Later
+        add() calls are appended to its files.
+        """
+        try:
+            with open(path.with_name(path.name + ".json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("format") != DEDUP_FORMAT:
+            return None
+
+        index = cls(meta["num_perm"], meta["bands"], meta["seed"], path)
+        try:
+            with open(index._file(".keys.jsonl"), "r", encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            sigs = index._map(".sig", "I")
+            bands = index._map(".bands", "B") if meta["compacted"] else None
+        except (OSError, ValueError):
+            index.close()
+            return None
+
+        # A crash between the two appends can leave one file an entry ahead
+        n = min(len(entries), len(sigs) // index.num_perm)
+        compacted = min(meta["compacted"], n)
+        index.keys = [key for key, _ in entries[:n]]
+        index.labels = [label for _, label in entries[:n]]
+        index._compacted = compacted
+        index._base_sigs = sigs[:compacted * index.num_perm]
+
+        if bands is not None and compacted == meta["compacted"]:
+            stride = meta["compacted"] * 12  # uint64 keys + uint32 ids per entry
+            for band in range(index.bands):
+                section = bands[band * stride:(band + 1) * stride]
+                index._base_bands.append((section[:meta["compacted"] * 8].cast("Q"),
+                                          section[meta["compacted"] * 8:].cast("I")))
+        else:
+            # Band file missing or ahead of the entries: bucket everything in memory
+            index._compacted = 0
+            index._base_sigs = array("I")
+            compacted = 0
+
+        # Entries appended since the last save(): re-bucket in memory
+        index._sigs = array("I", sigs[compacted * index.num_perm:n * index.num_perm])
+        for entry in range(compacted, n):
+            signature = list(index._signature_of(entry))
+            if not _is_empty(signature):
+                for band, bucket_key in enumerate(index._band_keys(signature)):
+                    index._buckets[band].setdefault(bucket_key, []).append(entry)
+        return index
+
+    def _map(self, suffix: str, typecode: str) -> memoryview:
+        """Read-only memoryview over a file (empty view for an empty file)."""
+        with open(self._file(suffix), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(array(typecode))
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return memoryview(mapped).cast(typecode) if typecode != "B" else memoryview(mapped)
+
+    def save(self, path: Optional[Path] = None) -> None:
+        """
+        Write the whole index (compacting the band arrays) atomically. Later
+        add() calls are appended to the files at `path`.
+        """
+        self.path = path or self.path
+        if self.path is None:
+            raise ValueError("no path to save the dedup index to")
+        n = len(self.keys)
+
+        # Every bucket entry, as (band, key, entry) sorted per band
+        band_entries: List[List[Tuple[int, int]]] = [[] for _ in range(self.bands)]
+        for entry in range(n):
+            signature = list(self._signature_of(entry))
+            if _is_empty(signature):
+                continue
+            for band, bucket_key in enumerate(self._band_keys(signature)):
+                band_entries[band].append((bucket_key, entry))
+
+        sigs = array("I")
+        for entry in range(n):
+            sigs.extend(self._signature_of(entry))
+        bands = bytearray()
+        for pairs in band_entries:
+            pairs.sort()
+            # Entries without words are in no bucket: pad so every band has n slots
+            padding = n - len(pairs)
+            bands += array("Q", [bucket_key for bucket_key, _ in pairs] + [_PADDING_KEY] * padding).tobytes()
+            bands += array("I", [entry for _, entry in pairs] + [0] * padding).tobytes()
+
+        # Band/signature files first, metadata last (it says how much is compacted)
+        self.close()
+        for suffix, data in ((".sig", sigs.tobytes()), (".bands", bytes(bands)),
+                             (".keys.jsonl", "".join(json.dumps([key, label], ensure_ascii=False) + "\n"
+                                                     for key, label in zip(self.keys, self.labels)).encode("utf-8")),
+                             (".json", json.dumps({"format": DEDUP_FORMAT, "num_perm": self.num_perm,
+                                                   "bands": self.bands, "seed": self.seed,
+                                                   "compacted": n}).encode("utf-8"))):
+            target = self._file(suffix)
+            tmp_path = target.with_name(target.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, target)
+
+        # Keep working from memory: everything is now one in-memory delta
+        self._compacted = 0
+        self._base_sigs = array("I")
+        self._base_bands = []
+        self._sigs = sigs
+        self._buckets = [{} for _ in range(self.bands)]
+        for band, pairs in enumerate(band_entries):
+            for bucket_key, entry in pairs:
+                self._buckets[band].setdefault(bucket_key, []).append(entry)
+
+    def close(self) -> None:
+        """Release memory-mapped files (the index is unusable for compacted entries afterwards)."""
+        self._base_bands = []
+        self._base_sigs = array("I")
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # A view is still referenced; the map closes when it is collected
+        self._maps = []
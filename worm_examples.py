@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Few-shot example store and prompt assembly for LLM generation.
+
+TESTS.md holds 25 worked examples ("### Example N: Title", an **Input:** JSON
+block and an **Expected Output:** list). Sending all of them with every
+request wastes tokens, so each example is parsed once with precomputed
+features:
+
+    mode, language      from the input JSON
+    classes             PRT classes named in the title / expected output /
+                        known_classification, in order of first mention
+    features            keyword hit counts from WormSkill's own analysis
+    terms               L2-normalized TF-IDF vector over stemmed words
+
+and cached next to TESTS.md (TESTS.examples.json, rebuilt when the file or
+the keyword tables change). ExampleStore.select() ranks the examples for an
+input through a term -> example inverted index plus class/feature overlap
+(tens of microseconds for 25 examples), and PromptBuilder puts the chosen
+examples after a cached SKILL.md system prefix, so the static part of the
+prompt is read once and stays byte-identical between requests.
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from worm_stem import stem
+from worm_text import TOKEN_RE, normalize
+
+
+# Bump when the cached layout or the features change so stale files are rebuilt
+EXAMPLES_FORMAT = 1
+
+# Examples put in a prompt by default
+FEW_SHOT_K = 3
+
+# Selection score: term cosine + these weights (an example of the input's
+# own mode always outranks one of the other mode)
+CLASS_WEIGHT = 0.5
+FEATURE_WEIGHT = 0.5
+MODE_BONUS = 10.0
+
+_EXAMPLE_RE = re.compile(r"^### Example (\d+): (.+)$", re.MULTILINE)
+_INPUT_RE = re.compile(r"\*\*Input[^*]*:\*\*\s*```json\s*(.*?)```", re.DOTALL)
+_EXPECTED_RE = re.compile(r"\*\*Expected Output:\*\*\s*(.*?)\s*(?=^---|^## |\Z)", re.DOTALL | re.MULTILINE)
+
+# Input fields holding the free-text description, per mode
+DESCRIPTION_FIELDS = {"trigger_to_power": "trigger_description", "power_to_trigger": "power_description"}
+
+FeatureCounts = Dict[str, Dict[str, int]]
+
+
+def examples_path_for(tests_path: Path) -> Path:
+    """Return the parsed-example cache path stored next to TESTS.md."""
+    return tests_path.with_name(tests_path.stem + ".examples.json")
+
+
+def description_of(input_data: Dict[str, Any]) -> str:
+    """The trigger or power description of a request ('' if missing)."""
+    return input_data.get(DESCRIPTION_FIELDS.get(input_data.get("mode"), ""), "") or ""
+
+
+def parse_examples(text: str) -> List[Dict[str, Any]]:
+    """
+    Split TESTS.md into examples.
+
+    Returns:
+        [{"number", "title", "input", "expected"}, ...] in file order;
+        sections without a parseable JSON input are skipped
+    """
+    headings = list(_EXAMPLE_RE.finditer(text))
+    examples = []
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+        section = text[heading.end():end]
+        input_match = _INPUT_RE.search(section)
+        if not input_match:
+            continue
+        try:
+            input_data = json.loads(input_match.group(1))
+        except ValueError:
+            continue
+        expected = _EXPECTED_RE.search(section, input_match.end())
+        examples.append({
+            "number": int(heading.group(1)),
+            "title": heading.group(2).strip(),
+            "input": input_data,
+            "expected": expected.group(1) if expected else "",
+        })
+    return examples
+
+
+def _class_pattern(class_names: Dict[str, List[str]]) -> "re.Pattern":
+    names = sorted((name.lower() for names in class_names.values() for name in names), key=len, reverse=True)
+    return re.compile(r"(?<!\w)(" + "|".join(map(re.escape, names)) + r")s?(?!\w)")
+
+
+def _stems(text: str) -> List[str]:
+    """Stemmed words of text (normalized in one pass rather than per token)."""
+    text = text.lower() if text.isascii() else normalize(text)
+    return [stem(word) for word in TOKEN_RE.findall(text)]
+
+
+def _feature_set(features: FeatureCounts) -> frozenset:
+    return frozenset(f"{group}:{label}" for group, counts in features.items() for label in counts)
+
+
+def render_example(example: Dict[str, Any]) -> str:
+    """Prompt text of one example (rendered once and cached with the store)."""
+    return (f"### Example {example['number']}: {example['title']}\n"
+            f"Input:\n```json\n{json.dumps(example['input'], ensure_ascii=False, indent=2)}\n```\n"
+            f"Expected output:\n{example['expected']}")
+
+
+class ExampleStore:
+    """Parsed TESTS.md examples with features and a top-k selector."""
+
+    def __init__(self, examples: List[Dict[str, Any]], idf: Dict[str, float]):
+        """
+        Args:
+            examples: Parsed examples with "mode", "language", "classes",
+                "features", "terms" and "prompt" added
+            idf: stemmed term -> IDF over the example descriptions
+        """
+        self.examples = examples
+        self.idf = idf
+        self._modes = [example["mode"] for example in examples]
+        # Inverted lists, so selection only touches examples sharing something with the request:
+        # term -> [(example position, weight), ...], class / feature -> [example position, ...]
+        self._postings: Dict[str, List[Tuple[int, float]]] = {}
+        self._by_class: Dict[str, List[int]] = {}
+        self._by_feature: Dict[str, List[int]] = {}
+        self._feature_sizes: List[int] = []
+        for i, example in enumerate(examples):
+            for term, weight in example["terms"].items():
+                self._postings.setdefault(term, []).append((i, weight))
+            for c in example["classes"]:
+                self._by_class.setdefault(c, []).append(i)
+            features = _feature_set(example["features"])
+            for feature in features:
+                self._by_feature.setdefault(feature, []).append(i)
+            self._feature_sizes.append(len(features))
+
+    @classmethod
+    def build(cls, text: str, class_names: Dict[str, List[str]],
+              analyze: Callable[[Dict[str, Any]], FeatureCounts]) -> "ExampleStore":
+        """
+        Parse TESTS.md text and compute example features.
+
+        Args:
+            text: TESTS.md contents
+            class_names: class key -> names it appears under, e.g.
+                {"master": ["Master", "Повелитель"], ...}
+            analyze: Keyword feature counts for a request (WormSkill's analysis)
+        """
+        examples = parse_examples(text)
+        class_re = _class_pattern(class_names)
+        by_name = {name.lower(): key for key, names in class_names.items() for name in names}
+
+        counts = [Counter(_stems(description_of(example["input"]))) for example in examples]
+        df = Counter(term for terms in counts for term in terms)
+        idf = {term: math.log((1 + len(examples)) / (1 + n)) + 1.0 for term, n in df.items()}
+
+        for example, terms in zip(examples, counts):
+            input_data = example["input"]
+            mentions = " ".join([example["title"], input_data.get("known_classification", ""), example["expected"]])
+            example["mode"] = input_data.get("mode", "")
+            example["language"] = input_data.get("language", "en")
+            example["classes"] = list(dict.fromkeys(by_name[m.group(1)] for m in class_re.finditer(mentions.lower())))
+            example["features"] = analyze(input_data)
+            example["terms"] = cls._weigh(terms, idf)
+            example["prompt"] = render_example(example)
+        return cls(examples, idf)
+
+    @classmethod
+    def open(cls, tests_path: Path, features_version: str) -> Optional["ExampleStore"]:
+        """Load cached examples, or None if missing or stale (TESTS.md or keyword tables changed)."""
+        try:
+            with open(examples_path_for(tests_path), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            stat = tests_path.stat()
+        except (OSError, ValueError):
+            return None
+
+        if (data.get("format") != EXAMPLES_FORMAT or data.get("features") != features_version
+                or data.get("source") != [stat.st_size, stat.st_mtime_ns]):
+            return None
+        return cls(data["examples"], data["idf"])
+
+    def save(self, tests_path: Path, features_version: str) -> None:
+        """Persist the parsed examples atomically (write to temp file, then rename)."""
+        stat = tests_path.stat()
+        path = examples_path_for(tests_path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "format": EXAMPLES_FORMAT,
+                "source": [stat.st_size, stat.st_mtime_ns],
+                "features": features_version,
+                "idf": self.idf,
+                "examples": self.examples
+            }, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _weigh(counts: Dict[str, int], idf: Dict[str, float]) -> Dict[str, float]:
+        """L2-normalized TF-IDF weights (terms unknown to idf are dropped)."""
+        weights = {term: (1.0 + math.log(n)) * idf[term] for term, n in counts.items() if term in idf}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {term: w / norm for term, w in weights.items()}
+
+    def select(self, input_data: Dict[str, Any], k: int = FEW_SHOT_K, classes: Optional[List[str]] = None,
+               features: Optional[FeatureCounts] = None) -> List[Dict[str, Any]]:
+        """
+        The k examples most relevant to a request, best first.
+
+        Args:
+            input_data: Request (mode and description are used)
+            k: Number of examples
+            classes: Classes predicted for the request, most likely first
+            features: Keyword feature counts of the request (as for build)
+
+        Returns:
+            Examples (dicts with "prompt", "number", "classes", ...)
+        """
+        mode = input_data.get("mode")
+        scores = [MODE_BONUS if example_mode == mode else 0.0 for example_mode in self._modes]
+
+        # Cosine of the TF-IDF vectors over the terms the request shares with the examples
+        counts: Dict[str, int] = {}
+        for term in _stems(description_of(input_data)):
+            if term in self._postings:
+                counts[term] = counts.get(term, 0) + 1
+        for term, weight in self._weigh(counts, self.idf).items():
+            for i, example_weight in self._postings[term]:
+                scores[i] += weight * example_weight
+
+        # Classes the example shares with the prediction, the most likely counting most
+        for rank, c in enumerate(classes or ()):
+            for i in self._by_class.get(c, ()):
+                scores[i] += CLASS_WEIGHT / (rank + 1)
+
+        # Jaccard overlap of the keyword features
+        wanted = _feature_set(features) if features else frozenset()
+        shared: Dict[int, int] = {}
+        for feature in wanted:
+            for i in self._by_feature.get(feature, ()):
+                shared[i] = shared.get(i, 0) + 1
+        for i, n in shared.items():
+            scores[i] += FEATURE_WEIGHT * n / (len(wanted) + self._feature_sizes[i] - n)
+
+        # Stable sort: ties keep file order
+        best = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:k]
+        return [self.examples[i] for i in best]
+
+
+class PromptBuilder:
+    """Chat prompts: cached SKILL.md system prefix + selected few-shot examples + the request."""
+
+    def __init__(self, skill_path: Path, store: ExampleStore):
+        """
+        Args:
+            skill_path: SKILL.md (read once, re-read only if the file changes)
+            store: Example store to select few-shot examples from
+        """
+        self.skill_path = skill_path
+        self.store = store
+        self._prefix: Optional[str] = None
+        self._prefix_version: Optional[Tuple[int, int]] = None
+
+    @property
+    def prefix(self) -> str:
+        """The static system prompt (SKILL.md contents)."""
+        stat = self.skill_path.stat()
+        version = (stat.st_size, stat.st_mtime_ns)
+        if self._prefix is None or version != self._prefix_version:
+            self._prefix = self.skill_path.read_text(encoding="utf-8")
+            self._prefix_version = version
+        return self._prefix
+
+    def build(self, input_data: Dict[str, Any], k: int = FEW_SHOT_K, classes: Optional[List[str]] = None,
+              features: Optional[FeatureCounts] = None) -> List[Dict[str, str]]:
+        """
+        Assemble the messages for one request.
+
+        Returns:
+            [{"role": "system", "content": SKILL.md},
+             {"role": "user", "content": examples + request JSON}]
+        """
+        examples = self.store.select(input_data, k, classes, features) if k else []
+        parts = ["Examples from TESTS.md:", *(example["prompt"] for example in examples)] if examples else []
+        parts.append("Request:\n```json\n" + json.dumps(input_data, ensure_ascii=False, indent=2) + "\n```")
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "user", "content": "\n\n".join(parts)},
+        ]
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Typo-tolerant term lookup over the knowledge base vocabulary.
+
+Every distinct word of the corpus is indexed by its character trigrams
+(padded with a space on both sides, so word starts and ends count). A
+lookup collects the terms sharing the most trigrams with the query word,
+keeps those of a plausible length and verifies them with a bounded
+edit distance (insertions, deletions, substitutions and adjacent
+transpositions), so only a few dozen terms are ever compared.
+
+Latin and Cyrillic letters that look alike ("mаster" typed with a Cyrillic
+"а", "Шeйкер" with a Latin "e") are folded to the word's majority script
+before trigrams are taken, so mixed-script input finds the intended word.
+
+Built together with the search index and stored next to it:
+
+    worm_knowledge_base.fuzzy.json   {"format", "kb", "terms", "counts", "trigrams"}
+"""
+
+import heapq
+import json
+import os
+import re
+from collections import Counter
+from itertools import chain
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from worm_query import And, Node, Or, Phrase, Term
+from worm_stem import stem
+from worm_text import normalize
+
+
+# Bump when the on-disk layout changes so stale files are rebuilt
+FUZZY_FORMAT = 1
+
+# Terms verified with the edit distance per lookup (best trigram overlap first)
+FUZZY_CANDIDATES = 32
+
+# Corrected terms a misspelled query word is expanded to
+FUZZY_EXPANSIONS = 3
+
+# Latin letter -> Cyrillic look-alike (upper-case shapes, compared lower-cased)
+_LATIN_TO_CYRILLIC = dict(zip("abekmhopctxy", "авекмнорстху"))
+_TO_CYRILLIC = str.maketrans(_LATIN_TO_CYRILLIC)
+_TO_LATIN = str.maketrans({cyr: lat for lat, cyr in _LATIN_TO_CYRILLIC.items()})
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def fuzzy_path_for(kb_path: Path) -> Path:
+    """Return the trigram index path stored next to a knowledge base file."""
+    return kb_path.with_name(kb_path.stem + ".fuzzy.json")
+
+
+def fold_homoglyphs(word: str) -> str:
+    """Rewrite look-alike letters of a mixed Latin/Cyrillic word in its majority script."""
+    if word.isascii():
+        return word
+    cyrillic = sum(1 for ch in word if "а" <= ch <= "я" or ch == "ё")
+    latin = sum(1 for ch in word if "a" <= ch <= "z")
+    if not cyrillic or not latin:
+        return word
+    return word.translate(_TO_CYRILLIC if cyrillic >= latin else _TO_LATIN)
+
+
+def trigrams(word: str) -> List[str]:
+    """Character trigrams of a word padded with one space on each side."""
+    padded = f" {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein + adjacent transpositions).
+
+    Bit-parallel (Hyyrö 2003): one machine-word step per character of b
+    instead of a full dynamic-programming row. Distances above `limit` are
+    reported as limit + 1.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if not a or not b:
+        return min(len(a) + len(b), limit + 1)
+
+    # Bit i of match[c] is set when a[i] == c
+    match: Dict[str, int] = {}
+    for i, char in enumerate(a):
+        match[char] = match.get(char, 0) | (1 << i)
+    mask = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+
+    vp, vn, d0, pm_prev = mask, 0, 0, 0
+    distance = len(a)
+    for char in b:
+        pm = match.get(char, 0)
+        transposed = ((~d0 & pm) << 1) & pm_prev
+        d0 = ((((pm & vp) + vp) ^ vp) | pm | vn | transposed) & mask
+        hp = (vn | ~(d0 | vp)) & mask
+        hn = d0 & vp
+        if hp & last:
+            distance += 1
+        elif hn & last:
+            distance -= 1
+        hp = ((hp << 1) | 1) & mask
+        hn = (hn << 1) & mask
+        vp = (hn | ~(d0 | hp)) & mask
+        vn = d0 & hp
+        pm_prev = pm
+    return min(distance, limit + 1)
+
+
+def default_max_distance(word: str) -> int:
+    """Edits tolerated for a word of this length (short words need to be close)."""
+    return 1 if len(word) <= 4 else 2
+
+
+class TrigramIndex:
+    """Trigram -> vocabulary term index with bounded edit-distance verification."""
+
+    def __init__(self, terms: List[str], counts: List[int], grams: Dict[str, List[int]]):
+        """
+        Args:
+            terms: Corpus vocabulary (normalized surface forms); position is the term id
+            counts: Occurrences of each term in the corpus
+            grams: trigram -> [term id, ...]
+        """
+        self.terms = terms
+        self.counts = counts
+        self.grams = grams
+
+    @classmethod
+    def build(cls, term_counts: Dict[str, int]) -> "TrigramIndex":
+        """Index a vocabulary (term -> occurrences)."""
+        terms = sorted(term_counts)
+        grams: Dict[str, List[int]] = {}
+        for term_id, term in enumerate(terms):
+            for gram in dict.fromkeys(trigrams(fold_homoglyphs(term))):
+                grams.setdefault(gram, []).append(term_id)
+        return cls(terms, [term_counts[term] for term in terms], grams)
+
+    @classmethod
+    def open(cls, kb_path: Path, fingerprint: Dict[str, int]) -> Optional["TrigramIndex"]:
+        """Load a persisted trigram index, or None if it is missing or stale."""
+        try:
+            with open(fuzzy_path_for(kb_path), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if data.get("format") != FUZZY_FORMAT or data.get("kb") != fingerprint:
+            return None
+
+        return cls(data["terms"], data["counts"], data["trigrams"])
+
+    def save(self, kb_path: Path, fingerprint: Dict[str, int]) -> None:
+        """Persist the trigram index atomically (write to temp file, then rename)."""
+        path = fuzzy_path_for(kb_path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "format": FUZZY_FORMAT,
+                "kb": fingerprint,
+                "terms": self.terms,
+                "counts": self.counts,
+                "trigrams": self.grams
+            }, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def lookup(self, word: str, max_distance: Optional[int] = None, limit: int = 5) -> List[Tuple[str, int]]:
+        """
+        Vocabulary terms within an edit distance of word.
+
+        Args:
+            word: Word as typed (normalized and homoglyph-folded here)
+            max_distance: Edits allowed (default: 1 for words up to 4 letters, else 2)
+            limit: Maximum number of terms returned
+
+        Returns:
+            (term, distance) closest first, more frequent terms first on ties
+        """
+        word = fold_homoglyphs(normalize(word))
+        if max_distance is None:
+            max_distance = default_max_distance(word)
+
+        overlap = Counter(chain.from_iterable(self.grams.get(gram, ()) for gram in set(trigrams(word))))
+
+        terms = self.terms
+        length = len(word)
+        candidates = heapq.nlargest(
+            FUZZY_CANDIDATES,
+            [term_id for term_id in overlap if abs(len(terms[term_id]) - length) <= max_distance],
+            key=overlap.__getitem__,
+        )
+
+        matches = []
+        for term_id in candidates:
+            distance = edit_distance(word, fold_homoglyphs(terms[term_id]), max_distance)
+            if distance <= max_distance:
+                matches.append((distance, -self.counts[term_id], terms[term_id]))
+        return [(term, distance) for distance, _, term in sorted(matches)[:limit]]
+
+    def suggest(self, word: str) -> Optional[str]:
+        """Did-you-mean: the best vocabulary term for a word (None if nothing is close)."""
+        matches = self.lookup(word, limit=1)
+        return matches[0][0] if matches else None
+
+
+def missing_words(node: Optional[Node], postings: Dict[str, list]) -> List[str]:
+    """
+    Query words (as typed) whose stem is not in the index.
+
+    Words under NOT are not counted: excluding a word the corpus lacks
+    excludes nothing, and "correcting" it would exclude the word meant.
+    """
+    if isinstance(node, Term):
+        return [] if node.term in postings else [node.word]
+    if isinstance(node, Phrase):
+        return [word for term, word in zip(node.terms, node.words) if term not in postings]
+    if isinstance(node, (And, Or)):
+        return [word for child in node.children for word in missing_words(child, postings)]
+    return []
+
+
+def correct_query(node: Optional[Node], postings: Dict[str, list], fuzzy: TrigramIndex,
+                  expansions: int = FUZZY_EXPANSIONS) -> Tuple[Optional[Node], Dict[str, str]]:
+    """
+    Replace query words missing from the index with their closest vocabulary terms.
+
+    A misspelled word becomes an OR of its best corrections (up to
+    `expansions`, all at the smallest distance found); inside a phrase it is
+    replaced by the single best one. Words with no close term, and words under
+    NOT, are left as is.
+
+    Returns:
+        (corrected query tree, {word as typed: best correction})
+    """
+    corrections: Dict[str, str] = {}
+
+    def candidates(word: str) -> List[str]:
+        matches = [(term, distance) for term, distance in fuzzy.lookup(word, limit=expansions * 2)
+                   if stem(term) in postings]
+        best = [term for term, distance in matches if distance == matches[0][1]][:expansions] if matches else []
+        if best:
+            corrections[word] = best[0]
+        return best
+
+    def rewrite(node: Node) -> Node:
+        if isinstance(node, Term):
+            if node.term in postings:
+                return node
+            found = candidates(node.word)
+            if not found:
+                return node
+            terms = [Term(stem(term), term) for term in found]
+            return terms[0] if len(terms) == 1 else Or(terms)
+        if isinstance(node, Phrase):
+            words = [word if term in postings else next(iter(candidates(word)), word)
+                     for term, word in zip(node.terms, node.words)]
+            return Phrase([stem(word) for word in words], words)
+        if isinstance(node, (And, Or)):
+            return type(node)([rewrite(child) for child in node.children])
+        return node
+
+    return (rewrite(node) if node is not None else None), corrections
+
+
+def apply_corrections(query: str, corrections: Dict[str, str]) -> str:
+    """Query text with each corrected word replaced (for did-you-mean display)."""
+    if not corrections:
+        return query
+    return _WORD_RE.sub(lambda match: corrections.get(normalize(match.group()), match.group()), query)
+
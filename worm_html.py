@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+HTML-to-text extraction for wiki pages.
+
+Keeps only the article body (the element matched by the config's content
+selector, ".mw-parser-output" for Fandom) and returns it as plain-text
+sections split at headings. Scripts, styles, edit links, tables of contents,
+navboxes and reference lists are dropped.
+
+Pages without the content element (a different skin, or HTML stored cut
+short before the article starts, as in older knowledge bases) fall back to
+the text of the whole <body>, or of the whole document plus its title and
+meta description when there is no <body> either.
+"""
+
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+
+DEFAULT_CONTENT_SELECTOR = ".mw-parser-output"
+
+# Elements whose content is never article text
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "math", "button", "nav", "form"}
+
+# Wiki chrome inside the article body
+SKIP_CLASSES = {"mw-editsection", "toc", "navbox", "reference", "reflist", "mw-references-wrap",
+                "printfooter", "noprint", "mw-empty-elt"}
+
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+# Elements that end a line of text
+BLOCK_TAGS = HEADING_TAGS | {"p", "div", "li", "br", "tr", "dd", "dt", "blockquote", "pre",
+                             "table", "ul", "ol", "dl", "section", "figcaption", "caption", "title"}
+
+# Meta tags whose content summarises the page (the longest one is kept)
+DESCRIPTION_METAS = {"description", "og:description", "twitter:description"}
+
+# Table cells are separated by a space
+CELL_TAGS = {"td", "th"}
+
+# Elements that never have a closing tag
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+             "param", "source", "track", "wbr"}
+
+
+def _parse_selector(selector: str) -> Tuple[str, str]:
+    """Split a simple CSS selector ('.class', '#id' or 'tag') into (kind, value)."""
+    selector = selector.strip()
+    if selector.startswith("."):
+        return "class", selector[1:]
+    if selector.startswith("#"):
+        return "id", selector[1:]
+    return "tag", selector.lower()
+
+
+class _SectionParser(HTMLParser):
+    """
+    Collects heading-delimited text inside the selected content element
+    (selector None: the whole document is content).
+    """
+
+    def __init__(self, selector: Optional[str]):
+        super().__init__(convert_charrefs=True)
+        self._selector = _parse_selector(selector) if selector is not None else None
+        # Open elements: (tag, is content root, is skipped)
+        self._stack: List[Tuple[str, bool, bool]] = []
+        self._in_content = 0 if selector is not None else 1
+        self._skipping = 0
+        self._heading: Optional[List[str]] = None
+        self.found = selector is None
+        self.description = ""
+        self.sections: List[Dict[str, List[str]]] = [{"heading": [], "text": []}]
+
+    def _matches(self, tag: str, attrs: Dict[str, str]) -> bool:
+        if self._selector is None:
+            return False
+        kind, value = self._selector
+        if kind == "class":
+            return value in (attrs.get("class") or "").split()
+        if kind == "id":
+            return attrs.get("id") == value
+        return tag == value
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "meta" and (attrs.get("name") or attrs.get("property")) in DESCRIPTION_METAS:
+            if len(attrs.get("content") or "") > len(self.description):
+                self.description = attrs["content"]
+        is_root = not self._in_content and self._matches(tag, attrs)
+        self.found = self.found or is_root
+        classes = set((attrs.get("class") or "").split())
+        is_skipped = bool(self._in_content) and (tag in SKIP_TAGS or bool(classes & SKIP_CLASSES))
+
+        if self._in_content and not self._skipping:
+            if tag in HEADING_TAGS and not is_skipped:
+                self._heading = []
+            elif tag in BLOCK_TAGS:
+                self._text().append("\n")
+            elif tag in CELL_TAGS:
+                self._text().append(" ")
+
+        if tag in VOID_TAGS:
+            return
+        self._stack.append((tag, is_root, is_skipped))
+        self._in_content += is_root
+        self._skipping += is_skipped
+
+    def handle_endtag(self, tag):
+        if not any(open_tag == tag for open_tag, _, _ in self._stack):
+            return  # Stray closing tag
+        while self._stack:
+            open_tag, is_root, is_skipped = self._stack.pop()
+            self._in_content -= is_root
+            self._skipping -= is_skipped
+            if open_tag in HEADING_TAGS and self._heading is not None and not self._skipping:
+                heading = " ".join("".join(self._heading).split())
+                self._heading = None
+                self.sections.append({"heading": [heading], "text": []})
+            elif open_tag in BLOCK_TAGS and self._in_content:
+                self._text().append("\n")
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self._in_content and not self._skipping:
+            (self._heading if self._heading is not None else self._text()).append(data)
+
+    def _text(self) -> List[str]:
+        return self.sections[-1]["text"]
+
+
+def extract_sections(html: str, selector: str = DEFAULT_CONTENT_SELECTOR) -> List[Dict[str, str]]:
+    """
+    Extract the article body of a wiki page as plain-text sections.
+
+    Args:
+        html: Page HTML
+        selector: Content element ('.class', '#id' or 'tag')
+
+    Returns:
+        [{"heading": ..., "text": ...}] in page order; the lead section has an
+        empty heading. Without the content element: the text of <body>, or
+        of the whole document led by its meta description.
+    """
+    for candidate in (selector, "body", None):
+        parser = _SectionParser(candidate)
+        parser.feed(html)
+        parser.close()
+        if parser.found:
+            break
+
+    if candidate is None and parser.description:
+        parser.sections[0]["text"].extend(["\n", parser.description, "\n"])
+
+    sections = []
+    for section in parser.sections:
+        lines = (" ".join(line.split()) for line in "".join(section["text"]).split("\n"))
+        # Blank line between blocks, so chunking can pack them as paragraphs
+        text = "\n\n".join(line for line in lines if line)
+        if text:
+            sections.append({"heading": "".join(section["heading"]), "text": text})
+    return sections
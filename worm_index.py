@@ -0,0 +1,511 @@
+#!/usr/bin/env python3
+"""
+Inverted index over the Worm knowledge base.
+
+Maps every term to postings of (document, char offsets), where a document is
+a paragraph-sized chunk of a PDF page or of a wiki page section. Terms are
+stemmed (worm_stem) at index and query time, so "триггеров" finds "триггер"
+and "betrayed" finds "betraying"; offsets still point at the surface words.
+
+Built once from worm_knowledge_base.json and persisted next to it:
+
+    worm_knowledge_base.index.json      {"format", "stemmer", "kb", "docs", "terms", "avg_length",
+                                         "postings": {"size", "sections"}, "positions": {...}}
+    worm_knowledge_base.postings.bin    terms, postings, document metadata and lengths
+    worm_knowledge_base.positions.bin   token positions of every posting
+
+Both binary files hold uint32 arrays and UTF-8 blobs at the offsets listed
+in the header and are memory-mapped like the page store: terms are sorted
+and found by binary search, and a term's postings, positions or a
+document's metadata are decoded only when a query touches them, so opening
+the index costs the same however large the corpus is. Positions are only
+read by phrase queries (worm_query). Byte order is the machine's
+(little-endian on every supported platform).
+
+Every document is tagged with the PRT classes it is about, for class:
+filters: the classes its source file is named after (BRUTE.pdf,
+Триггеры-Повелителей-_Master_.pdf), or, for general sources such as the
+wiki, the classes its text or section heading names.
+"""
+
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import (AbstractSet, Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence,
+                    Set, Tuple, Union)
+
+from worm_query import Node, evaluate, parse
+from worm_stem import STEMMER_VERSION, stem
+from worm_text import chunk_page, iter_tokens, split_chunks, tokenize
+
+
+# Bump when the on-disk layout changes so stale indexes are rebuilt
+INDEX_FORMAT = 11
+
+# BM25 parameters (standard defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Endings tried on class names before stemming, so inflections the stemmer
+# reduces differently (Излом -> "изл", Изломов -> "излом") tag the same class
+CLASS_NAME_ENDINGS = ("", "а", "ы", "и", "ов", "ей", "ом")
+
+# Decoded posting lists kept per index (most recently used terms)
+POSTINGS_CACHE_TERMS = 512
+
+_LETTERS_RE = re.compile(r"[^\W\d_]+")
+
+IntLists = List[List[int]]
+
+
+def index_path_for(kb_path: Path) -> Path:
+    """Return the index header path stored next to a knowledge base file."""
+    return kb_path.with_name(kb_path.stem + ".index.json")
+
+
+def postings_path_for(index_path: Path) -> Path:
+    """Return the binary postings file that belongs to an index header."""
+    return index_path.with_name(index_path.name[:-len(".index.json")] + ".postings.bin")
+
+
+def positions_path_for(index_path: Path) -> Path:
+    """Return the binary token positions file that belongs to an index header."""
+    return index_path.with_name(index_path.name[:-len(".index.json")] + ".positions.bin")
+
+
+def kb_fingerprint(kb_path: Path) -> Dict[str, int]:
+    """Cheap change detector for the knowledge base file."""
+    stat = kb_path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def iter_kb_documents(knowledge_base: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], str]]:
+    """
+    Yield (document metadata, text) for every searchable unit of the KB.
+
+    PDF pages and wiki sections are split into chunks; pages extracted before
+    chunking existed are chunked here with the same rules, so chunk ids match
+    either way. Wiki entries fetched before text extraction (raw_html only)
+    are converted to sections here.
+    """
+    for source_name, source_data in knowledge_base["sources"].items():
+        if source_data["type"] == "pdf":
+            for page_data in source_data.get("content", []):
+                text = page_data["text"]
+                chunks = page_data.get("chunks") or chunk_page(source_name, page_data["page"], text)
+                for chunk in chunks:
+                    doc = {"source": source_name, "type": "pdf", "page": page_data["page"], "chunk_id": chunk["id"]}
+                    yield doc, text[chunk["start"]:chunk["end"]]
+
+        elif source_data["type"] == "wiki":
+            if source_data.get("status") == "success":
+                sections = source_data.get("sections")
+                if sections is None:
+                    from worm_html import extract_sections
+                    sections = extract_sections(source_data.get("raw_html", ""))
+                for n, section in enumerate(sections):
+                    text = section["text"]
+                    for m, (start, end) in enumerate(split_chunks(text)):
+                        doc = {"source": source_name, "type": "wiki", "url": source_data["url"],
+                               "section": section["heading"], "chunk_id": f"{source_name}#s{n}.{m}"}
+                        yield doc, text[start:end]
+
+
+def _write_sections(path: Path, sections: Dict[str, bytes]) -> Dict[str, Any]:
+    """
+    Write named byte sections to one file atomically.
+
+    Returns:
+        {"size": file size, "sections": {name: [offset, length]}} for the index header
+    """
+    layout: Dict[str, List[int]] = {}
+    offset = 0
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        for name, data in sections.items():
+            layout[name] = [offset, len(data)]
+            # Keep every section 4-byte aligned for the uint32 views
+            padding = -len(data) % 4
+            f.write(data + b"\0" * padding)
+            offset += len(data) + padding
+    os.replace(tmp_path, path)
+    return {"size": offset, "sections": layout}
+
+
+def _map_sections(path: Path, entry: Dict[str, Any]
+                  ) -> Optional[Tuple[Optional[mmap.mmap], Dict[str, memoryview]]]:
+    """Memory-map a file written by _write_sections, or None if it is missing or truncated."""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size != entry["size"]:
+                return None
+            # mmap cannot map an empty file
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if entry["size"] else None
+    except OSError:
+        return None
+    view = memoryview(buffer) if buffer is not None else memoryview(b"")
+    return buffer, {name: view[start:start + length] for name, (start, length) in entry["sections"].items()}
+
+
+def class_stems(class_names: Dict[str, List[str]]) -> Dict[str, Set[str]]:
+    """class key -> stems of its names and their common inflections."""
+    return {key: {stem(term + ending) for name in names for term in tokenize(name)
+                  for ending in CLASS_NAME_ENDINGS}
+            for key, names in class_names.items()}
+
+
+def _name_stems(name: str) -> Set[str]:
+    # Letters only: "Триггеры-Повелителей-_Master_.pdf" -> триггер, повелител, master, pdf
+    return {stem(word) for word in _LETTERS_RE.findall(name.lower())}
+
+
+def _classes_named(stems: Dict[str, Set[str]], terms: AbstractSet[str]) -> List[str]:
+    return [key for key, names in stems.items() if not names.isdisjoint(terms)]
+
+
+class TermTable:
+    """Sorted UTF-8 terms in one blob, found by binary search on their bytes."""
+
+    def __init__(self, bounds: Sequence[int], blob: Union[memoryview, bytes]):
+        """
+        Args:
+            bounds: Byte boundaries, term i spans bounds[i]:bounds[i + 1]
+            blob: Concatenated UTF-8 terms, sorted by their bytes
+        """
+        self._bounds = bounds
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._bounds) - 1
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self.term(i)
+
+    def term(self, i: int) -> str:
+        return bytes(self._blob[self._bounds[i]:self._bounds[i + 1]]).decode("utf-8")
+
+    def find(self, term: str) -> int:
+        """Position of a term, or -1 if it is not in the table."""
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe = bytes(self._blob[self._bounds[mid]:self._bounds[mid + 1]])
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+
+class PostingLists(Mapping):
+    """
+    term -> [[int, ...], ...] read lazily from flat uint32 records.
+
+    The record of term i spans ints[bounds[i]:bounds[i + 1]] and holds the
+    number of lists, then each list as its length followed by its values.
+    Decoded lists are kept for the POSTINGS_CACHE_TERMS most recent terms.
+    """
+
+    def __init__(self, terms: TermTable, bounds: Sequence[int], ints: Sequence[int]):
+        self._terms = terms
+        self._bounds = bounds
+        self._ints = ints
+        self._cache: "OrderedDict[str, IntLists]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._terms)
+
+    def __contains__(self, term: object) -> bool:
+        return isinstance(term, str) and self._terms.find(term) >= 0
+
+    def __getitem__(self, term: str) -> IntLists:
+        lists = self._cache.get(term)
+        if lists is not None:
+            self._cache.move_to_end(term)
+            return lists
+        i = self._terms.find(term)
+        if i < 0:
+            raise KeyError(term)
+        lists = decode_lists(self._ints[self._bounds[i]:self._bounds[i + 1]])
+        self._cache[term] = lists
+        if len(self._cache) > POSTINGS_CACHE_TERMS:
+            self._cache.popitem(last=False)
+        return lists
+
+    def count(self, term: str) -> int:
+        """Number of lists of a term (its document frequency) without decoding them."""
+        i = self._terms.find(term)
+        return self._ints[self._bounds[i]] if i >= 0 else 0
+
+
+def encode_lists(lists: IntLists, out: array) -> None:
+    """Append one term's lists to a uint32 array (see PostingLists)."""
+    out.append(len(lists))
+    for values in lists:
+        out.append(len(values))
+        out.extend(values)
+
+
+def decode_lists(record: Sequence[int]) -> IntLists:
+    """Inverse of encode_lists for one record."""
+    values = record.tolist() if hasattr(record, "tolist") else list(record)
+    lists = []
+    pos = 1
+    for _ in range(values[0]):
+        n = values[pos]
+        lists.append(values[pos + 1:pos + 1 + n])
+        pos += 1 + n
+    return lists
+
+
+class DocTable(Sequence):
+    """Document metadata decoded on first access (JSON per document) plus token lengths."""
+
+    def __init__(self, lengths: Sequence[int], bounds: Sequence[int], blob: Union[memoryview, bytes]):
+        self.lengths = lengths
+        self._bounds = bounds
+        self._blob = blob
+        self._docs: List[Optional[Dict[str, Any]]] = [None] * len(lengths)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __getitem__(self, doc_id: int) -> Dict[str, Any]:
+        if not 0 <= doc_id < len(self._docs):
+            raise IndexError(doc_id)
+        doc = self._docs[doc_id]
+        if doc is None:
+            doc = json.loads(bytes(self._blob[self._bounds[doc_id]:self._bounds[doc_id + 1]]))
+            doc["length"] = self.lengths[doc_id]
+            self._docs[doc_id] = doc
+        return doc
+
+
+class KnowledgeIndex:
+    """Positional term -> postings index with query evaluation and BM25 ranking."""
+
+    def __init__(self, docs: Sequence[Dict[str, Any]], postings: Mapping[str, IntLists],
+                 positions: Mapping[str, IntLists], vocabulary: Optional[Dict[str, int]] = None,
+                 avg_length: Optional[float] = None, buffers: Optional[List[mmap.mmap]] = None):
+        """
+        Args:
+            docs: Document metadata (including token "length"), position in the list is the doc id
+            postings: stemmed term -> [[doc_id, offset, offset, ...], ...] sorted by doc_id
+            positions: stemmed term -> token positions, parallel to postings
+                ([[position, position, ...], ...], one list per posting entry)
+            vocabulary: Surface term -> occurrences (only kept after a build, for
+                building the fuzzy trigram index)
+            avg_length: Mean document length in tokens (computed from docs if omitted)
+            buffers: Memory maps the lazy docs/postings/positions read from (closed by close())
+        """
+        self.docs = docs
+        self.postings = postings
+        self.positions = positions
+        self.vocabulary = vocabulary
+        self._buffers = buffers or []
+        if avg_length is None:
+            avg_length = sum(doc["length"] for doc in docs) / len(docs) if docs else 0.0
+        self.avg_length = avg_length
+
+    @classmethod
+    def build(cls, knowledge_base: Dict[str, Any],
+              class_names: Optional[Dict[str, List[str]]] = None) -> "KnowledgeIndex":
+        """
+        Tokenize every document of a loaded knowledge base.
+
+        Args:
+            knowledge_base: Parsed worm_knowledge_base.json
+            class_names: PRT class key -> names (any language) to tag documents
+                with, for class: filters (see document_classes); without them
+                documents carry no "classes" and filters match source names
+        """
+        stems = class_stems(class_names or {})
+        source_classes: Dict[str, List[str]] = {}
+        docs = []
+        postings: Dict[str, IntLists] = {}
+        positions: Dict[str, IntLists] = {}
+        vocabulary: Dict[str, int] = {}
+
+        for doc_id, (doc, text) in enumerate(iter_kb_documents(knowledge_base)):
+            doc_terms: Dict[str, Tuple[List[int], List[int]]] = {}
+            length = 0
+            for term, offset in iter_tokens(text):
+                vocabulary[term] = vocabulary.get(term, 0) + 1
+                offsets, term_positions = doc_terms.setdefault(stem(term), ([], []))
+                offsets.append(offset)
+                term_positions.append(length)
+                length += 1
+            if stems:
+                if doc["source"] not in source_classes:
+                    source_classes[doc["source"]] = _classes_named(stems, _name_stems(doc["source"]))
+                doc = {**doc, "classes": source_classes[doc["source"]] or _classes_named(
+                    stems, doc_terms.keys() | _name_stems(doc.get("section", "")))}
+            docs.append({**doc, "length": length})
+            for term, (offsets, term_positions) in doc_terms.items():
+                postings.setdefault(term, []).append([doc_id] + offsets)
+                positions.setdefault(term, []).append(term_positions)
+
+        return cls(docs, postings, positions, vocabulary)
+
+    @classmethod
+    def load(cls, path: Path, fingerprint: Dict[str, int]) -> Optional["KnowledgeIndex"]:
+        """Memory-map a persisted index, or None if it is missing or stale."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                header = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if (header.get("format") != INDEX_FORMAT or header.get("stemmer") != STEMMER_VERSION
+                or header.get("kb") != fingerprint):
+            return None
+
+        postings_file = _map_sections(postings_path_for(path), header["postings"])
+        positions_file = _map_sections(positions_path_for(path), header["positions"])
+        if postings_file is None or positions_file is None:
+            return None
+        buffers = [postings_file[0], positions_file[0]]
+        section, positions_section = postings_file[1], positions_file[1]
+
+        terms = TermTable(section["term_bounds"].cast("I"), section["terms"])
+        docs = DocTable(section["lengths"].cast("I"), section["doc_bounds"].cast("I"), section["docs"])
+        postings = PostingLists(terms, section["postings_bounds"].cast("I"), section["postings"].cast("I"))
+        positions = PostingLists(terms, positions_section["positions_bounds"].cast("I"),
+                                 positions_section["positions"].cast("I"))
+        return cls(docs, postings, positions, avg_length=header["avg_length"], buffers=buffers)
+
+    def save(self, path: Path, fingerprint: Dict[str, int]) -> None:
+        """Persist the index atomically (binary files first, then the header naming them)."""
+        lengths = array("I")
+        doc_bounds = array("I", [0])
+        doc_blob = bytearray()
+        for doc in self.docs:
+            lengths.append(doc["length"])
+            doc_blob += json.dumps({k: v for k, v in doc.items() if k != "length"},
+                                   ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            doc_bounds.append(len(doc_blob))
+
+        # Both files share the term table order, so a term index addresses either
+        terms = sorted(self.postings, key=lambda term: term.encode("utf-8"))
+        term_bounds = array("I", [0])
+        term_blob = bytearray()
+        postings_bounds = array("I", [0])
+        postings = array("I")
+        positions_bounds = array("I", [0])
+        positions = array("I")
+        for term in terms:
+            term_blob += term.encode("utf-8")
+            term_bounds.append(len(term_blob))
+            encode_lists(self.postings[term], postings)
+            postings_bounds.append(len(postings))
+            encode_lists(self.positions[term], positions)
+            positions_bounds.append(len(positions))
+
+        postings_file = _write_sections(postings_path_for(path), {
+            "lengths": lengths.tobytes(), "doc_bounds": doc_bounds.tobytes(), "docs": bytes(doc_blob),
+            "term_bounds": term_bounds.tobytes(), "terms": bytes(term_blob),
+            "postings_bounds": postings_bounds.tobytes(), "postings": postings.tobytes()})
+        positions_file = _write_sections(positions_path_for(path), {
+            "positions_bounds": positions_bounds.tobytes(), "positions": positions.tobytes()})
+
+        # The header is written last: an index is only valid once it names the KB
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "format": INDEX_FORMAT,
+                "stemmer": STEMMER_VERSION,
+                "kb": fingerprint,
+                "docs": len(self.docs),
+                "terms": len(terms),
+                "avg_length": self.avg_length,
+                "postings": postings_file,
+                "positions": positions_file
+            }, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def close(self) -> None:
+        """Release the memory maps (no-op for a freshly built index)."""
+        if self._buffers:
+            self.docs = self.postings = self.positions = None
+            for buffer in self._buffers:
+                try:
+                    buffer.close()
+                except BufferError:
+                    pass  # Views still referenced elsewhere; the map closes when they are collected
+            self._buffers = []
+
+    def match(self, query: Union[str, Node, None]) -> List[Tuple[int, Dict[str, List[int]]]]:
+        """
+        Find documents matching a query (see worm_query for the syntax).
+
+        Args:
+            query: Query string, or a tree already parsed with worm_query.parse
+
+        Returns:
+            (doc_id, {stemmed term: offsets}) in doc id order
+
+        Raises:
+            QuerySyntaxError: If a query string is malformed
+        """
+        node = parse(query) if isinstance(query, str) else query
+        if node is None:
+            return []
+        return sorted(evaluate(self, node).items())
+
+    def df(self, term: str) -> int:
+        """Number of documents containing a stemmed term."""
+        if isinstance(self.postings, PostingLists):
+            return self.postings.count(term)
+        return len(self.postings.get(term, ()))
+
+    def idf(self, term: str) -> float:
+        """BM25 inverse document frequency (never negative)."""
+        df = self.df(term)
+        return math.log(1.0 + (len(self.docs) - df + 0.5) / (df + 0.5))
+
+    def bm25(self, doc_id: int, term_offsets: Dict[str, List[int]]) -> float:
+        """Score one matched document against the query terms."""
+        length = self.docs.lengths[doc_id] if isinstance(self.docs, DocTable) else self.docs[doc_id]["length"]
+        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * length / (self.avg_length or 1.0))
+        score = 0.0
+        for term, offsets in term_offsets.items():
+            tf = len(offsets)
+            score += self.idf(term) * tf * (BM25_K1 + 1.0) / (tf + norm)
+        return score
+
+    def top_k(self, query: Union[str, Node, None], k: int,
+              accept: Optional[Callable[[Dict[str, Any]], bool]] = None
+              ) -> List[Tuple[float, int, Dict[str, List[int]]]]:
+        """
+        Return the k best BM25 matches, best first.
+
+        Matches are scored as the query evaluation yields them (not sorted
+        by doc id like match()), and a bounded heap keeps only the k best.
+
+        Args:
+            query: Query string or parsed query tree
+            k: Number of results
+            accept: Optional predicate on document metadata (e.g. source type filter)
+        """
+        node = parse(query) if isinstance(query, str) else query
+        if node is None:
+            return []
+        scored = (
+            (self.bm25(doc_id, term_offsets), doc_id, term_offsets)
+            for doc_id, term_offsets in evaluate(self, node).items()
+            if accept is None or accept(self.docs[doc_id])
+        )
+        return heapq.nlargest(k, scored, key=lambda item: (item[0], -item[1]))
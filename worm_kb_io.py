@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Streaming reader and writer for worm_knowledge_base.json.
+
+The knowledge base is one JSON document, but nothing here holds more than one
+source in memory at a time: the reader decodes `sources` entry by entry, and
+the writer serializes each source as it is handed over (a PDF's pages one page
+at a time) into a temp file that atomically replaces the original on success.
+A crash mid-write leaves the previous knowledge base untouched.
+
+The output is byte-for-byte what `json.dump(kb, f, ensure_ascii=False,
+indent=2)` produces, so regenerated files diff cleanly.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+
+DEFAULT_HEADER = {
+    "name": "worm_trigger_power_prt",
+    "description": "Worm universe trigger-power knowledge base",
+}
+
+# Bytes read from disk per refill
+READ_BLOCK = 1 << 16
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class _StreamDecoder:
+    """Decodes one JSON value at a time from a text file, refilling a small buffer."""
+
+    def __init__(self, f):
+        self._file = f
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Drop consumed text and append the next block; False at end of file."""
+        if self._eof:
+            return False
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        block = self._file.read(max(READ_BLOCK, len(self._buffer)))
+        if not block:
+            self._eof = True
+            return False
+        self._buffer += block
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of file)."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer) or not self._fill():
+                return self._buffer[self._pos:self._pos + 1]
+
+    def expect(self, char: str) -> None:
+        """Consume a structural character."""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed knowledge base: expected {char!r}, found {found!r}")
+        self._pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next block
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def members(self) -> Iterator[Tuple[str, "_StreamDecoder"]]:
+        """Walk an object's members; the caller must consume each value before resuming."""
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key, self
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("}")
+            return
+
+
+def read_kb_header(kb_path: Path) -> Dict[str, Any]:
+    """Top-level fields stored before `sources` (name, description, ...)."""
+    header: Dict[str, Any] = {}
+    with open(kb_path, "r", encoding="utf-8") as f:
+        for key, decoder in _StreamDecoder(f).members():
+            if key == "sources":
+                break
+            header[key] = decoder.value()
+    return header
+
+
+def iter_kb_sources(kb_path: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield (source name, source data) pairs one at a time.
+
+    Only the source being yielded is held in memory, however large the
+    knowledge base is.
+    """
+    with open(kb_path, "r", encoding="utf-8") as f:
+        for key, decoder in _StreamDecoder(f).members():
+            if key != "sources":
+                decoder.value()
+                continue
+            for name, source_decoder in decoder.members():
+                yield name, source_decoder.value()
+            return
+
+
+def _indented(value: Any, depth: int) -> str:
+    """Serialize value as it would appear nested `depth` levels deep in an indent=2 dump."""
+    return json.dumps(value, ensure_ascii=False, indent=2).replace("\n", "\n" + "  " * depth)
+
+
+class KnowledgeBaseWriter:
+    """
+    Writes a knowledge base source by source, then atomically swaps it in.
+
+    Use as a context manager: the temp file replaces `kb_path` only if the
+    block finishes without an exception.
+
+        with KnowledgeBaseWriter(kb_path, header) as writer:
+            writer.write_source(name, data)
+    """
+
+    def __init__(self, kb_path: Path, header: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            kb_path: Knowledge base file to (re)write
+            header: Top-level fields written before `sources` (defaults to DEFAULT_HEADER)
+        """
+        self.kb_path = Path(kb_path)
+        self.header = DEFAULT_HEADER if header is None else header
+        self.tmp_path = self.kb_path.with_name(self.kb_path.name + ".tmp")
+        self.count = 0
+        self._file = None
+
+    def __enter__(self) -> "KnowledgeBaseWriter":
+        self._file = open(self.tmp_path, "w", encoding="utf-8")
+        self._file.write("{")
+        for key, value in self.header.items():
+            self._file.write(f"\n  {_indented(key, 1)}: {_indented(value, 1)},")
+        self._file.write('\n  "sources": {')
+        return self
+
+    def write_source(self, name: str, data: Dict[str, Any], content: Optional[Iterable[Any]] = None) -> None:
+        """
+        Append one source.
+
+        Args:
+            name: Source key
+            data: Source fields
+            content: Items of the source's "content" list, serialized one at a
+                time as they are produced (overrides data["content"])
+        """
+        f = self._file
+        f.write(",\n    " if self.count else "\n    ")
+        f.write(f"{_indented(name, 2)}: ")
+        self.count += 1
+
+        if content is None:
+            f.write(_indented(data, 2))
+            return
+
+        fields = [(k, v) for k, v in data.items() if k != "content"] + [("content", None)]
+        f.write("{")
+        for i, (key, value) in enumerate(fields):
+            f.write(f"\n      {_indented(key, 3)}: ")
+            if key != "content":
+                f.write(_indented(value, 3) + ",")
+                continue
+            items = 0
+            for item in content:
+                f.write(",\n        " if items else "[\n        ")
+                f.write(_indented(item, 4))
+                items += 1
+            f.write("\n      ]" if items else "[]")
+        f.write("\n    }")
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        f = self._file
+        try:
+            if exc_type is None:
+                f.write("\n  }\n}" if self.count else "}\n}")
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            f.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.kb_path)
+        else:
+            self.tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Asynchronous LLM generation for the fields WormSkill leaves as placeholders.
+
+    Backend                  interface: complete(messages, n) -> n texts, stream(messages)
+    FakeBackend              deterministic local stand-in (offline tests, benchmarks)
+    OpenAICompatibleBackend  POST {base_url}/chat/completions (stdlib HTTP, run off the loop)
+    LLMClient                what WormSkill talks to, wrapping a backend with:
+
+      - bounded concurrency: at most `max_concurrency` backend calls in flight
+      - variant batching: the n variants of one request are a single call
+        (`n` sampled completions) rather than n round trips
+      - coalescing: identical requests already in flight share one call
+      - timeouts and retries with exponential backoff on transient errors
+      - streaming of partial output
+
+Only stdlib asyncio is used, like worm_server.
+"""
+
+import abc
+import asyncio
+import hashlib
+import json
+import random
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+
+# Attempts per call after the first, and the first backoff delay in seconds (doubles per retry)
+LLM_RETRIES = 2
+LLM_BACKOFF = 0.5
+
+# Seconds a backend call (or the wait for the next streamed chunk) may take
+LLM_TIMEOUT = 60.0
+
+# Backend calls in flight at once
+LLM_MAX_CONCURRENCY = 8
+
+Messages = List[Dict[str, str]]
+
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+class GenerationError(RuntimeError):
+    """An LLM call failed for good (after retries, or with a non-transient error)."""
+
+
+class TransientError(GenerationError):
+    """A failure worth retrying (rate limit, 5xx, dropped connection)."""
+
+
+class Backend(abc.ABC):
+    """A text generation service. Subclasses implement complete_one() at least."""
+
+    @abc.abstractmethod
+    async def complete_one(self, messages: Messages) -> str:
+        """One completion for a chat prompt."""
+
+    async def complete(self, messages: Messages, n: int = 1) -> List[str]:
+        """
+        n independent completions for one prompt.
+
+        The default issues n concurrent calls; override when the service
+        samples several completions per request.
+        """
+        return list(await asyncio.gather(*(self.complete_one(messages) for _ in range(n))))
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        """Completion text in chunks as it is produced (default: all at once)."""
+        yield await self.complete_one(messages)
+
+
+def _request_of(messages: Messages) -> Dict[str, Any]:
+    """The request JSON at the end of a build_prompt() user message ({} if absent)."""
+    text = messages[-1]["content"] if messages else ""
+    start = text.rfind("```json")
+    if start == -1:
+        return {}
+    try:
+        return json.loads(text[start + len("```json"):].rsplit("```", 1)[0])
+    except ValueError:
+        return {}
+
+
+class FakeBackend(Backend):
+    """
+    Deterministic offline backend.
+
+    Answers a build_prompt() prompt with a well-formed SKILL.md-shaped JSON
+    response derived from a hash of the prompt (and variant number), after
+    an optional simulated latency. Counts its calls, so tests and benchmarks
+    can check batching and coalescing.
+    """
+
+    def __init__(self, latency: float = 0.0, chunk_words: int = 4):
+        """
+        Args:
+            latency: Simulated seconds per call
+            chunk_words: Words per streamed chunk
+        """
+        self.latency = latency
+        self.chunk_words = chunk_words
+        self.calls = 0
+
+    def _text(self, messages: Messages, variant: int) -> str:
+        digest = hashlib.sha256(json.dumps([messages, variant], ensure_ascii=False).encode("utf-8")).hexdigest()
+        tag = digest[:8]
+        request = _request_of(messages)
+        if request.get("mode") == "power_to_trigger":
+            variant = {"trigger_description": f"Generated trigger {tag}: the moment the power answers."}
+            output = {"trigger_variants": [variant]}
+        else:
+            output = {"power_description": f"Generated power {tag}: an answer to the trigger's core problem."}
+        output.update({
+            "limitations": [f"Limitation {tag}"],
+            "secondary_effects": [f"Secondary effect {tag}"],
+            "counterplay": [f"Counterplay {tag}"],
+        })
+        return json.dumps({"mode": request.get("mode"), "output": output}, ensure_ascii=False)
+
+    async def complete_one(self, messages: Messages) -> str:
+        return (await self.complete(messages, 1))[0]
+
+    async def complete(self, messages: Messages, n: int = 1) -> List[str]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._text(messages, variant) for variant in range(n)]
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        self.calls += 1
+        words = self._text(messages, 0).split(" ")
+        for i in range(0, len(words), self.chunk_words):
+            if self.latency:
+                await asyncio.sleep(self.latency / max(1, len(words) // self.chunk_words))
+            yield " ".join(words[i:i + self.chunk_words]) + (" " if i + self.chunk_words < len(words) else "")
+
+
+class OpenAICompatibleBackend(Backend):
+    """Chat completions over HTTP ({base_url}/chat/completions, `n` samples per request)."""
+
+    def __init__(self, model: str, base_url: str = "https://api.openai.com/v1", api_key: Optional[str] = None,
+                 temperature: float = 0.7, timeout: float = LLM_TIMEOUT):
+        self.model = model
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.api_key = api_key
+        self.temperature = temperature
+        self.timeout = timeout
+
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        import urllib.error
+        import urllib.request
+
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(self.url, json.dumps(payload).encode("utf-8"), headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as e:
+            if e.code == 429 or e.code >= 500:
+                raise TransientError(f"HTTP {e.code} from {self.url}") from e
+            raise GenerationError(f"HTTP {e.code} from {self.url}: {e.read()[:200]!r}") from e
+        except (urllib.error.URLError, OSError) as e:
+            raise TransientError(f"{self.url}: {e}") from e
+
+    async def complete_one(self, messages: Messages) -> str:
+        return (await self.complete(messages, 1))[0]
+
+    async def complete(self, messages: Messages, n: int = 1) -> List[str]:
+        payload = {"model": self.model, "messages": messages, "n": n, "temperature": self.temperature}
+        # urllib blocks: run it on the default thread pool
+        data = await asyncio.get_running_loop().run_in_executor(None, self._post, payload)
+        return [choice["message"]["content"] for choice in data["choices"]]
+
+
+class LLMClient:
+    """Backend wrapper with concurrency limit, coalescing, timeouts and retries."""
+
+    def __init__(self, backend: Backend, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 timeout: float = LLM_TIMEOUT, retries: int = LLM_RETRIES, backoff: float = LLM_BACKOFF):
+        """
+        Args:
+            backend: Service that produces completions
+            max_concurrency: Backend calls in flight at once
+            timeout: Seconds per attempt (per chunk when streaming)
+            retries: Extra attempts after a timeout or TransientError
+            backoff: First retry delay in seconds (doubled each retry, plus jitter)
+        """
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        # Created on first use so it binds to the running event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight: Dict[str, "asyncio.Future[List[str]]"] = {}
+        self._stats = {"requests": 0, "backend_calls": 0, "coalesced": 0, "retries": 0, "timeouts": 0, "failures": 0}
+
+    def stats(self) -> Dict[str, int]:
+        """Request, call, coalescing, retry and failure counters."""
+        return dict(self._stats)
+
+    def _slots(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def generate(self, messages: Messages, n: int = 1) -> List[str]:
+        """
+        n completions for a prompt in one backend call.
+
+        A request identical to one already in flight waits for that call
+        instead of issuing its own.
+
+        Raises:
+            GenerationError: If every attempt failed
+        """
+        self._stats["requests"] += 1
+        key = hashlib.sha256(json.dumps([messages, n], ensure_ascii=False).encode("utf-8")).hexdigest()
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self._stats["coalesced"] += 1
+            # shield: one waiter being cancelled must not cancel the shared call
+            return list(await asyncio.shield(pending))
+
+        future = asyncio.ensure_future(self._call(messages, n))
+        self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return list(await asyncio.shield(future))
+
+    async def _call(self, messages: Messages, n: int) -> List[str]:
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._stats["retries"] += 1
+                delay = self.backoff * 2 ** (attempt - 1)
+                await asyncio.sleep(delay + random.uniform(0, delay))
+            try:
+                async with self._slots():
+                    self._stats["backend_calls"] += 1
+                    texts = await asyncio.wait_for(self.backend.complete(messages, n), self.timeout)
+            except asyncio.TimeoutError:
+                self._stats["timeouts"] += 1
+                error: Exception = GenerationError(f"no response within {self.timeout}s")
+            except TransientError as e:
+                error = e
+            except GenerationError:
+                self._stats["failures"] += 1
+                raise
+            except Exception as e:  # malformed backend response and the like
+                self._stats["failures"] += 1
+                raise GenerationError(f"{type(e).__name__}: {e}") from e
+            else:
+                if len(texts) != n:
+                    self._stats["failures"] += 1
+                    raise GenerationError(f"backend returned {len(texts)} completions, expected {n}")
+                return texts
+        self._stats["failures"] += 1
+        raise GenerationError(f"gave up after {self.retries + 1} attempts: {error}") from error
+
+    async def stream(self, messages: Messages) -> AsyncIterator[str]:
+        """
+        Completion text chunks as they arrive (no coalescing or retries once
+        output has started; a stalled stream raises GenerationError).
+        """
+        self._stats["requests"] += 1
+        async with self._slots():
+            self._stats["backend_calls"] += 1
+            chunks = self.backend.stream(messages).__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    self._stats["timeouts"] += 1
+                    raise GenerationError(f"stream stalled for {self.timeout}s")
+                yield chunk
+
+
+def parse_completion(text: str) -> Dict[str, Any]:
+    """
+    The "output" object of a SKILL.md-shaped JSON completion.
+
+    Accepts a full response ({"mode", "output": {...}}) or a bare output
+    object, optionally wrapped in prose or a code fence.
+
+    Raises:
+        GenerationError: If the text holds no JSON object
+    """
+    match = _JSON_OBJECT_RE.search(text)
+    if match:
+        try:
+            data = json.loads(match.group())
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            output = data.get("output", data)
+            if isinstance(output, dict):
+                return output
+    raise GenerationError(f"completion is not a JSON object: {text[:80]!r}")
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Single-pass keyword matcher for trigger/power analysis.
+
+All keyword tables (trigger types, emotions, power mechanics) are compiled
+into one trie-shaped regular expression. Scanning a text is a single regex
+pass that reports every keyword occurrence, including keywords nested inside
+longer ones ("escape" inside "escape attention") or overlapping them, with
+its position.
+
+With a `normalize` function (e.g. worm_stem.stem) keywords and text are
+reduced word by word before matching, and keywords only match whole words,
+so inflected forms ("betrayed", "триггеры") hit their base keyword.
+Stemmers do not reduce every derived word to its base ("betrayal" stems to
+"betray", the keyword "betray" to "betrai"), so with `prefix` a second pass
+also matches keywords at the start of longer words of the unstemmed text
+("betray" in "betrayal", "know" in "knowledge"), as plain substring matching
+did. Reported keywords and positions still refer to the original table and
+text; a keyword found by both passes is reported once.
+
+Compilation is deferred to the first scan. Building the nested/overlap tables
+is quadratic in the number of keywords, so with a cache_path the compiled
+tables are stored as JSON (keyed by a hash of the keyword tables) and later
+processes just load them.
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# Bump when the compiled artifact layout changes
+MATCHER_FORMAT = 3
+
+_WORD_RE = re.compile(r"\w+")
+_WORD_CHAR_RE = re.compile(r"\w")
+
+
+# group -> label -> [(keyword, position), ...]
+KeywordHits = Dict[str, Dict[str, List[Tuple[str, int]]]]
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """Build a regex alternation shaped like a prefix trie (longest match preferred)."""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}  # end-of-word marker
+
+    def render(node: Dict[str, dict]) -> str:
+        terminal = "" in node
+        branches = [re.escape(char) + render(child) for char, child in node.items() if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            # Greedy optional: prefer the longer keyword, fall back to this one
+            body = ("(?:" + body + ")?") if len(branches) == 1 else body + "?"
+        return body
+
+    return render(trie)
+
+
+class KeywordMatcher:
+    """Compiled multi-table keyword matcher."""
+
+    def __init__(self, tables: Dict[str, Dict[str, List[str]]], cache_path: Optional[Path] = None,
+                 normalize: Optional[Callable[[str], str]] = None, prefix: bool = False):
+        """
+        Args:
+            tables: group name -> {label: [keywords]}, e.g. {"emotion": {"rage": ["anger", ...]}}
+            cache_path: Compiled-table artifact to load from / save to (optional)
+            normalize: Per-word normalizer (e.g. a stemmer); enables whole-word
+                matching of normalized keywords against normalized text
+            prefix: With normalize, also match keywords as word prefixes of the
+                unnormalized text
+        """
+        self._tables = tables
+        self._cache_path = cache_path
+        self._normalize = normalize
+        self._prefix = prefix and normalize is not None
+        self._passes: Optional[List[Dict[str, Any]]] = None
+
+    def _normalize_text(self, text: str) -> Tuple[str, Dict[int, int]]:
+        """
+        Lowercase text with every word normalized.
+
+        Returns:
+            (normalized text, normalized word start -> original word start)
+        """
+        text = text.lower()
+        if self._normalize is None:
+            return text, {}
+        parts: List[str] = []
+        starts: Dict[int, int] = {}
+        length = last = 0
+        for match in _WORD_RE.finditer(text):
+            gap = text[last:match.start()]
+            word = self._normalize(match.group())
+            starts[length + len(gap)] = match.start()
+            parts.append(gap)
+            parts.append(word)
+            length += len(gap) + len(word)
+            last = match.end()
+        parts.append(text[last:])
+        return "".join(parts), starts
+
+    def _normalized_tables(self) -> Dict[str, Dict[str, List[str]]]:
+        return {
+            group: {label: [self._normalize_text(keyword)[0] for keyword in keywords]
+                    for label, keywords in table.items()}
+            for group, table in self._tables.items()
+        }
+
+    def _lowered_tables(self) -> Dict[str, Dict[str, List[str]]]:
+        return {group: {label: [keyword.lower() for keyword in keywords] for label, keywords in table.items()}
+                for group, table in self._tables.items()}
+
+    def _tables_hash(self, normalized: Dict[str, Dict[str, List[str]]]) -> str:
+        data = json.dumps([MATCHER_FORMAT, self._tables, normalized, self._normalize is not None, self._prefix],
+                          ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def _compile(self) -> None:
+        """Load the compiled tables from the artifact, or build (and save) them."""
+        normalized = self._normalized_tables()
+        tables_hash = self._tables_hash(normalized)
+        passes = self._load_compiled(tables_hash) if self._cache_path else None
+        if passes is None:
+            whole_word = self._normalize is not None
+            passes = [self._build_compiled(normalized, whole_word, whole_word)]
+            if self._prefix:
+                passes.append(self._build_compiled(self._lowered_tables(), True, False))
+            if self._cache_path:
+                self._save_compiled(tables_hash, passes)
+
+        for compiled in passes:
+            compiled["labels"] = {keyword: [tuple(key) for key in keys]
+                                  for keyword, keys in compiled["labels"].items()}
+            compiled["pattern"] = re.compile(compiled["pattern"])
+        self._passes = passes
+
+    def _build_compiled(self, forms: Dict[str, Dict[str, List[str]]],
+                        word_start: bool, word_end: bool) -> Dict[str, Any]:
+        """
+        Compile one matching pass.
+
+        Args:
+            forms: The keyword tables as matched (normalized or lowercased)
+            word_start: Keywords only match at the start of a word
+            word_end: Keywords only match at the end of a word
+        """
+        # keyword -> [(group, label)]; one keyword may belong to several labels.
+        # Matching uses the normalized form, reports the first table spelling.
+        labels: Dict[str, List[Tuple[str, str]]] = {}
+        originals: Dict[str, str] = {}
+        for group, table in self._tables.items():
+            for label, keywords in table.items():
+                for keyword, form in zip(keywords, forms[group][label]):
+                    if (group, label) not in labels.setdefault(form, []):
+                        labels[form].append((group, label))
+                    originals.setdefault(form, keyword.lower())
+
+        def word_aligned(keyword: str, start: int, end: int) -> bool:
+            """Whether keyword[start:end] could be a match on its own."""
+            return ((not word_start or start == 0 or not _WORD_CHAR_RE.match(keyword, start - 1))
+                    and (not word_end or end >= len(keyword) or not _WORD_CHAR_RE.match(keyword, end)))
+
+        # The regex reports non-overlapping longest matches, so record which
+        # other keywords can start inside each keyword: fully nested ones
+        # ("escape" in "escape attention") and ones running past its end
+        nested: Dict[str, List[Tuple[str, int]]] = {}
+        overlaps: Dict[str, List[Tuple[str, int]]] = {}
+        for keyword in labels:
+            nested[keyword] = [
+                (other, offset)
+                for other in labels if other != keyword
+                for offset in range(len(keyword) - len(other) + 1)
+                if keyword.startswith(other, offset) and word_aligned(keyword, offset, offset + len(other))
+            ]
+            overlaps[keyword] = [
+                (other, offset)
+                for other in labels
+                for offset in range(1, len(keyword))
+                if len(other) > len(keyword) - offset and other.startswith(keyword[offset:])
+                and word_aligned(keyword, offset, len(keyword))
+            ]
+
+        pattern = "(?:" + _trie_pattern(list(labels)) + ")"
+        if word_start:
+            pattern = r"(?<!\w)" + pattern
+        if word_end:
+            pattern += r"(?!\w)"
+        return {"labels": labels, "originals": originals, "nested": nested, "overlaps": overlaps,
+                "pattern": pattern, "word_end": word_end}
+
+    def _load_compiled(self, tables_hash: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            with open(self._cache_path, "r", encoding="utf-8") as f:
+                compiled = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return compiled["passes"] if compiled.get("tables") == tables_hash else None
+
+    def _save_compiled(self, tables_hash: str, passes: List[Dict[str, Any]]) -> None:
+        tmp_path = Path(str(self._cache_path) + ".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"tables": tables_hash, "passes": passes}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._cache_path)
+        except OSError:
+            pass  # Read-only install: compile again next time
+
+    def scan(self, text: str) -> KeywordHits:
+        """
+        Find every keyword occurrence in text (case-insensitive).
+
+        Returns:
+            group -> label -> [(keyword, position), ...], labels in table order;
+            every group is present, labels only when they have hits. Keywords
+            are reported as spelled in the tables, positions index `text`.
+        """
+        if self._passes is None:
+            self._compile()
+
+        # (group, label) -> {(keyword as spelled, position in text)}
+        by_label: Dict[Tuple[str, str], set] = {}
+        for n, compiled in enumerate(self._passes):
+            text_scanned, starts = self._normalize_text(text) if n == 0 else (text.lower(), {})
+            for keyword, start in self._scan_pass(compiled, text_scanned):
+                hit = (compiled["originals"][keyword], starts.get(start, start))
+                for key in compiled["labels"][keyword]:
+                    by_label.setdefault(key, set()).add(hit)
+
+        return {
+            group: {label: sorted(by_label[(group, label)], key=lambda hit: (hit[1], -len(hit[0])))
+                    for label in table if (group, label) in by_label}
+            for group, table in self._tables.items()
+        }
+
+    @staticmethod
+    def _scan_pass(compiled: Dict[str, Any], text: str) -> set:
+        """(matched form, position) of every keyword occurrence found by one pass."""
+        found = set()
+        for match in compiled["pattern"].finditer(text):
+            keyword, start = match.group(), match.start()
+            found.add((keyword, start))
+            for other, offset in compiled["nested"][keyword]:
+                found.add((other, start + offset))
+            for other, offset in compiled["overlaps"][keyword]:
+                end = start + offset + len(other)
+                if text.startswith(other, start + offset) and not (
+                        compiled["word_end"] and _WORD_CHAR_RE.match(text, end)):
+                    found.add((other, start + offset))
+        return found
+
+
+def hit_counts(hits: Dict[str, List[Tuple[str, int]]]) -> Dict[str, int]:
+    """Collapse one group's hits to label -> occurrence count."""
+    return {label: len(occurrences) for label, occurrences in hits.items()}
+
+
+def merge_tables(*tables: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Concatenate the keyword lists of tables sharing labels (e.g. English + Russian)."""
+    merged: Dict[str, List[str]] = {}
+    for table in tables:
+        for label, keywords in table.items():
+            merged.setdefault(label, []).extend(keywords)
+    return merged
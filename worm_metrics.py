@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing, counters and opt-in profiling for WormSkill.
+
+Stages (kb_load, analyze, score, build_response, search, ...) are timed with
+`metrics.timer(stage)`; counters (requests, cache hits, bytes scanned by
+search) with `metrics.incr(name, n)`. Snapshots report calls, totals and
+p50/p95/p99 latency per stage, and can be exported as JSON or Prometheus text.
+
+A disabled Metrics hands out a shared no-op timer and drops counter updates,
+so leaving the calls in hot paths costs one attribute check each.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+
+# Latency samples kept per stage for percentiles
+RESERVOIR_SIZE = 4096
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _NullTimer:
+    """Timer handed out while metrics are off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    """Times one stage and records it on exit."""
+
+    __slots__ = ("_metrics", "_stage", "_start")
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self._metrics = metrics
+        self._stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._metrics.observe(self._stage, time.perf_counter() - self._start)
+        return False
+
+
+def _percentile(sorted_samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted samples."""
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(q * len(sorted_samples)))]
+
+
+class Metrics:
+    """Stage timers and counters shared by one WormSkill."""
+
+    def __init__(self, enabled: bool = True):
+        """
+        Args:
+            enabled: Record timings and counters (False = near-zero overhead no-ops)
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+        self._calls: Dict[str, int] = {}
+        self._totals: Dict[str, float] = {}
+        self._counters: Dict[str, int] = {}
+        # Per-request stage durations while a trace() is active
+        self._trace: Optional[Dict[str, float]] = None
+
+    def timer(self, stage: str):
+        """Context manager timing one stage."""
+        if not self.enabled and self._trace is None:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record one duration for a stage."""
+        if self._trace is not None:
+            self._trace[stage] = self._trace.get(stage, 0.0) + seconds * 1000
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=RESERVOIR_SIZE)
+                self._calls[stage] = 0
+                self._totals[stage] = 0.0
+            samples.append(seconds)
+            self._calls[stage] += 1
+            self._totals[stage] += seconds
+
+    def incr(self, name: str, n: int = 1) -> None:
+        """Add n to a counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    @contextmanager
+    def trace(self) -> Iterator[Dict[str, float]]:
+        """
+        Collect the stage durations (ms) of one request, even if metrics are off.
+
+            with metrics.trace() as timings:
+                ...
+            # timings == {"analyze": 0.05, "score": 0.01, ...}
+        """
+        previous, self._trace = self._trace, {}
+        try:
+            yield self._trace
+        finally:
+            self._trace = previous
+
+    def reset(self) -> None:
+        """Drop all recorded timings and counters."""
+        with self._lock:
+            self._samples.clear()
+            self._calls.clear()
+            self._totals.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current statistics as a JSON-serializable dict.
+
+        Returns:
+            {"stages": {stage: {"calls", "total_ms", "mean_ms", "p50_ms",
+            "p95_ms", "p99_ms", "max_ms"}}, "counters": {name: value}}
+        """
+        with self._lock:
+            stages = {}
+            for stage, samples in self._samples.items():
+                ordered = sorted(samples)
+                calls = self._calls[stage]
+                stages[stage] = {
+                    "calls": calls,
+                    "total_ms": round(self._totals[stage] * 1000, 4),
+                    "mean_ms": round(self._totals[stage] * 1000 / calls, 4),
+                    **{f"p{int(q * 100)}_ms": round(_percentile(ordered, q) * 1000, 4) for q in QUANTILES},
+                    "max_ms": round(ordered[-1] * 1000, 4),
+                }
+            return {"stages": stages, "counters": dict(self._counters)}
+
+    def to_prometheus(self, prefix: str = "worm") -> str:
+        """Snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent per processing stage",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        with self._lock:
+            sorted_samples = {stage: sorted(samples) for stage, samples in self._samples.items()}
+        for stage, stats in snapshot["stages"].items():
+            for q in QUANTILES:
+                value = _percentile(sorted_samples[stage], q)
+                lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{q}"}} {value:.9f}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["total_ms"] / 1000:.9f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["calls"]}')
+
+        for name, value in snapshot["counters"].items():
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profile(memory: bool = False, sort: str = "cumulative", limit: int = 25) -> Iterator[Dict[str, Any]]:
+    """
+    cProfile (and optionally tracemalloc) around a block of code.
+
+    The yielded dict is filled in when the block exits:
+        {"profile": "<pstats text>", "memory": {"current_bytes", "peak_bytes", "top": [...]}}
+
+    Args:
+        memory: Also trace allocations (noticeably slower)
+        sort: pstats sort key
+        limit: Functions / allocation sites listed
+    """
+    import cProfile
+    import io
+    import pstats
+
+    report: Dict[str, Any] = {}
+    profiler = cProfile.Profile()
+    if memory:
+        import tracemalloc
+        tracemalloc.start()
+    profiler.enable()
+    try:
+        yield report
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+        report["profile"] = out.getvalue()
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:limit]
+            tracemalloc.stop()
+            report["memory"] = {
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "top": [str(stat) for stat in top],
+            }
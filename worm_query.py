@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Query language for knowledge base search.
+
+    master trigger                  both terms (implicit AND)
+    master OR thinker               either term
+    trigger NOT tinker              NOT binds tighter than AND, AND than OR
+    "escape attention"              phrase: consecutive words, in order
+    (brute OR breaker) "trigger event"
+    type:pdf class:master isolation filters on source type / PRT class
+
+Operators are only recognised in upper case; lower-case "and"/"or"/"not"
+are ordinary words. Words are tokenized and stemmed exactly like the index,
+and a word the tokenizer splits ("close-quarters") is matched as a phrase.
+
+Queries are parsed into a small tree and evaluated against a KnowledgeIndex
+using its postings only: phrases are checked with the token positions stored
+next to the char offsets, so no page text is read to answer a query.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+from worm_stem import stem
+from worm_text import tokenize
+
+
+# Filters accepted as field:value
+FILTER_FIELDS = ("type", "class")
+
+_LEXER_RE = re.compile(r'\s*(?:(\()|(\))|"([^"]*)("?)|([^\s()"]+))')
+
+
+class QuerySyntaxError(ValueError):
+    """Malformed search query (unbalanced parentheses or quotes, dangling operator)."""
+
+
+@dataclass
+class Term:
+    term: str  # stemmed, as in the index
+    word: str  # as typed (normalized), for spelling correction
+
+
+@dataclass
+class Phrase:
+    terms: List[str]
+    words: List[str]
+
+
+@dataclass
+class Filter:
+    field: str
+    value: str
+
+
+@dataclass
+class Not:
+    child: "Node"
+
+
+@dataclass
+class And:
+    children: List["Node"]
+
+
+@dataclass
+class Or:
+    children: List["Node"]
+
+
+Node = Union[Term, Phrase, Filter, Not, And, Or]
+
+# doc_id -> {stemmed term: char offsets}
+Matches = Dict[int, Dict[str, List[int]]]
+
+
+def _lex(query: str) -> List[tuple]:
+    """Split a query into ("(" | ")" | "phrase" | "word", text) tokens."""
+    tokens = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        match = _LEXER_RE.match(query, pos)
+        open_paren, close_paren, phrase, closing_quote, word = match.groups()
+        if open_paren:
+            tokens.append(("(", open_paren))
+        elif close_paren:
+            tokens.append((")", close_paren))
+        elif phrase is not None:
+            if not closing_quote:
+                raise QuerySyntaxError(f"unterminated quote in {query!r}")
+            tokens.append(("phrase", phrase))
+        else:
+            tokens.append(("word", word))
+        pos = match.end()
+    return tokens
+
+
+def _words(text: str) -> Optional[Node]:
+    """Term for one word, Phrase if it tokenizes to several, None if it has none."""
+    words = tokenize(text)
+    if not words:
+        return None
+    if len(words) == 1:
+        return Term(stem(words[0]), words[0])
+    return Phrase([stem(word) for word in words], words)
+
+
+class _Parser:
+    """Recursive-descent parser: or_expr := and_expr (OR and_expr)*, and so on."""
+
+    def __init__(self, tokens: List[tuple], class_aliases: Dict[str, str]):
+        self.tokens = tokens
+        self.pos = 0
+        self.class_aliases = class_aliases
+
+    def peek(self) -> Optional[tuple]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def is_operator(self, name: str) -> bool:
+        return self.peek() == ("word", name)
+
+    def parse_or(self) -> Optional[Node]:
+        children = [self.parse_and()]
+        while self.is_operator("OR"):
+            self.pos += 1
+            children.append(self.parse_and())
+        if any(child is None for child in children):
+            if len(children) > 1:
+                raise QuerySyntaxError("OR needs a term on both sides")
+            return None
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self) -> Optional[Node]:
+        children = []
+        while True:
+            token = self.peek()
+            if token is None or token[0] == ")" or self.is_operator("OR"):
+                break
+            if self.is_operator("AND"):
+                self.pos += 1
+                following = self.peek()
+                if not children or following is None or following[0] == ")" or self.is_operator("OR"):
+                    raise QuerySyntaxError("AND needs a term on both sides")
+                continue
+            node = self.parse_unary()
+            if node is not None:
+                children.append(node)
+        if not children:
+            return None
+        return children[0] if len(children) == 1 else And(children)
+
+    def parse_unary(self) -> Optional[Node]:
+        if self.is_operator("NOT"):
+            self.pos += 1
+            token = self.peek()
+            child = None if token is None or token[0] == ")" else self.parse_unary()
+            if child is None:
+                raise QuerySyntaxError("NOT needs a term")
+            return Not(child)
+        return self.parse_primary()
+
+    def parse_primary(self) -> Optional[Node]:
+        kind, text = self.tokens[self.pos]
+        self.pos += 1
+        if kind == "(":
+            node = self.parse_or()
+            if self.peek() is None or self.peek()[0] != ")":
+                raise QuerySyntaxError("unbalanced parentheses")
+            self.pos += 1
+            return node
+        if kind == "phrase":
+            return _words(text)
+
+        field, sep, value = text.partition(":")
+        if sep and field.lower() in FILTER_FIELDS and value:
+            value = value.lower()
+            if field.lower() == "class":
+                value = self.class_aliases.get(value, value)
+            return Filter(field.lower(), value)
+        return _words(text)
+
+
+def parse(query: str, class_aliases: Optional[Dict[str, str]] = None) -> Optional[Node]:
+    """
+    Parse a query string.
+
+    Args:
+        query: Query text (see module docstring)
+        class_aliases: Extra names for class: filters -> class key,
+            e.g. {"повелитель": "master"}
+
+    Returns:
+        Query tree, or None if the query has no searchable terms
+
+    Raises:
+        QuerySyntaxError: On unbalanced parentheses/quotes or dangling operators
+    """
+    parser = _Parser(_lex(query), class_aliases or {})
+    node = parser.parse_or()
+    if parser.peek() is not None:
+        raise QuerySyntaxError("unbalanced parentheses")
+    return node
+
+
+def _merge(into: Dict[str, List[int]], other: Dict[str, List[int]]) -> None:
+    """Add another match's offsets into `into` (kept sorted and unique)."""
+    for term, offsets in other.items():
+        existing = into.get(term)
+        into[term] = offsets if existing is None else sorted(set(existing).union(offsets))
+
+
+def _filter_accepts(node: Filter, doc: Dict[str, Any]) -> bool:
+    if node.field == "type":
+        return doc["type"] == node.value
+    # PRT class: tagged at index time (worm_index); only documents of an
+    # index built without class names fall back to the source file naming it
+    return node.value in doc["classes"] if "classes" in doc else node.value in doc["source"].lower()
+
+
+def anchor_terms(node: Optional[Node]) -> List[str]:
+    """
+    Stemmed terms a result snippet is centered on: the first phrase of the
+    query, else its positive terms in query order (filters and NOT-ed parts
+    never appear in a snippet).
+    """
+    terms: List[str] = []
+
+    def walk(node: Node) -> Optional[List[str]]:
+        if isinstance(node, Phrase):
+            return node.terms
+        if isinstance(node, Term):
+            terms.append(node.term)
+        elif isinstance(node, (And, Or)):
+            for child in node.children:
+                phrase = walk(child)
+                if phrase:
+                    return phrase
+        return None
+
+    phrase = walk(node) if node is not None else None
+    return list(phrase) if phrase else list(dict.fromkeys(terms))
+
+
+def _eval_term(index, term: str) -> Matches:
+    return {entry[0]: {term: entry[1:]} for entry in index.postings.get(term, ())}
+
+
+def _eval_phrase(index, terms: List[str]) -> Matches:
+    """Documents with the terms at consecutive token positions."""
+    plists = [index.postings.get(term) for term in terms]
+    if not all(plists):
+        return {}
+    position_lists = [index.positions.get(term) for term in terms]
+
+    # Per term: doc_id -> (offsets, positions)
+    by_doc = [{entry[0]: (entry[1:], positions) for entry, positions in zip(plist, plen)}
+              for plist, plen in zip(plists, position_lists)]
+    candidates = set.intersection(*(set(docs) for docs in by_doc))
+
+    matches: Matches = {}
+    for doc_id in candidates:
+        first_offsets, first_positions = by_doc[0][doc_id]
+        later = [dict(zip(by_doc[i][doc_id][1], by_doc[i][doc_id][0])) for i in range(1, len(terms))]
+        found: Dict[str, List[int]] = {}
+        for offset, position in zip(first_offsets, first_positions):
+            hits = [positions.get(position + i + 1) for i, positions in enumerate(later)]
+            if all(hit is not None for hit in hits):
+                _merge(found, {terms[0]: [offset], **{term: [hit] for term, hit in zip(terms[1:], hits)}})
+        if found:
+            matches[doc_id] = found
+    return matches
+
+
+def evaluate(index, node: Node) -> Matches:
+    """
+    Evaluate a query tree against a KnowledgeIndex.
+
+    Returns:
+        doc_id -> {stemmed term: offsets} for every matching document; the
+        offsets cover the positive terms that matched (filters and NOT
+        contribute documents, not offsets)
+    """
+    if isinstance(node, Term):
+        return _eval_term(index, node.term)
+
+    if isinstance(node, Phrase):
+        return _eval_phrase(index, node.terms)
+
+    if isinstance(node, Filter):
+        return {doc_id: {} for doc_id, doc in enumerate(index.docs) if _filter_accepts(node, doc)}
+
+    if isinstance(node, Not):
+        excluded = evaluate(index, node.child)
+        return {doc_id: {} for doc_id in range(len(index.docs)) if doc_id not in excluded}
+
+    if isinstance(node, Or):
+        matches: Matches = {}
+        for child in node.children:
+            for doc_id, term_offsets in evaluate(index, child).items():
+                _merge(matches.setdefault(doc_id, {}), term_offsets)
+        return matches
+
+    # And: intersect the positive parts smallest first, then drop NOT-ed documents
+    positive = [child for child in node.children if not isinstance(child, Not)]
+    negative = [child.child for child in node.children if isinstance(child, Not)]
+    if not positive:
+        return evaluate(index, Not(Or(negative)))
+
+    parts = sorted((evaluate(index, child) for child in positive), key=len)
+    matches = {doc_id: dict(term_offsets) for doc_id, term_offsets in parts[0].items()}
+    for part in parts[1:]:
+        if not matches:
+            return {}
+        matches = {doc_id: term_offsets for doc_id, term_offsets in matches.items() if doc_id in part}
+        for doc_id, term_offsets in matches.items():
+            _merge(term_offsets, part[doc_id])
+    for child in negative:
+        if not matches:
+            break
+        excluded = evaluate(index, child)
+        matches = {doc_id: term_offsets for doc_id, term_offsets in matches.items() if doc_id not in excluded}
+    return matches
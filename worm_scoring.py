@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Weighted scoring of the 12 PRT classifications.
+
+Each analysed input becomes a feature vector of keyword hit counts (trigger
+types, emotions, power mechanics). Multiplying by a feature x class weight
+matrix gives a score for every classification at once, and a batch of N
+inputs is scored with a single (N x F) @ (F x 12) matrix product.
+
+NumPy is used for batches of NUMPY_MIN_BATCH inputs or more when installed;
+smaller batches (and installs without NumPy) run the same arithmetic in pure
+Python. NumPy is imported on the first large batch, so single requests never
+pay its ~70 ms import.
+"""
+
+import math
+from typing import Dict, List, Tuple
+
+
+# Smallest batch worth a NumPy matrix product (below it, Python is as fast)
+NUMPY_MIN_BATCH = 32
+
+_np = None
+
+
+def _numpy():
+    """NumPy module, imported on first use (False if not installed)."""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:  # pragma: no cover - exercised only without NumPy
+            _np = False
+    return _np
+
+
+# group -> label -> hit count, as produced by the keyword analysis
+FeatureCounts = Dict[str, Dict[str, int]]
+
+# Score at which the rating curve reaches ~63% of the 1-12 range
+RATING_SCALE = 3.0
+
+
+class ClassificationScorer:
+    """Scores feature vectors against every classification with one weight matrix."""
+
+    def __init__(self, classes: List[str], weights: Dict[Tuple[str, str], Dict[str, float]]):
+        """
+        Args:
+            classes: Classification keys, in output column order
+            weights: (group, label) feature -> {classification: weight}
+        """
+        self.classes = classes
+        self.features = list(weights)
+        self._feature_index = {feature: i for i, feature in enumerate(self.features)}
+        self._rows = [
+            [weights[feature].get(cls, 0.0) for cls in classes]
+            for feature in self.features
+        ]
+        self._matrix = None
+
+    def _columns(self, counts: FeatureCounts) -> List[Tuple[int, float]]:
+        """Sparse feature vector: (feature index, log-damped count)."""
+        columns = []
+        for group, labels in counts.items():
+            for label, count in labels.items():
+                i = self._feature_index.get((group, label))
+                if i is not None and count:
+                    # log1p: repeated mentions add evidence with diminishing returns
+                    columns.append((i, math.log1p(count)))
+        return columns
+
+    def score(self, batch: List[FeatureCounts]) -> List[List[float]]:
+        """
+        Score a batch of inputs against all classifications.
+
+        Returns:
+            One row of len(classes) scores per input
+        """
+        if not batch:
+            return []
+
+        np = _numpy() if len(batch) >= NUMPY_MIN_BATCH else None
+        if np:
+            if self._matrix is None:
+                self._matrix = np.array(self._rows, dtype=np.float64)
+            features = np.zeros((len(batch), len(self.features)), dtype=np.float64)
+            for row, counts in enumerate(batch):
+                for i, value in self._columns(counts):
+                    features[row, i] = value
+            return (features @ self._matrix).tolist()
+
+        scores = []
+        for counts in batch:
+            row = [0.0] * len(self.classes)
+            for i, value in self._columns(counts):
+                for j, weight in enumerate(self._rows[i]):
+                    row[j] += value * weight
+            scores.append(row)
+        return scores
+
+    def rank(self, scores: List[float], limit: int = 2) -> List[Tuple[str, float, int]]:
+        """
+        Best-scoring classifications for one input.
+
+        Returns:
+            Up to `limit` (classification, score, rating) tuples with a positive
+            score, best first (ties keep class order)
+        """
+        order = sorted(range(len(self.classes)), key=lambda j: -scores[j])
+        return [
+            (self.classes[j], scores[j], self.rating(scores[j]))
+            for j in order[:limit] if scores[j] > 0
+        ]
+
+    @staticmethod
+    def rating(score: float) -> int:
+        """Map an unbounded score onto the 1-12 PRT rating scale."""
+        return max(1, min(12, round(1 + 11 * (1 - math.exp(-score / RATING_SCALE)))))
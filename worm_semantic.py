@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Offline semantic retrieval over knowledge base chunks (latent semantic analysis).
+
+Keyword search only finds chunks that share words with the query. Here every
+chunk of the search index is a TF-IDF vector over the stemmed vocabulary,
+reduced with a truncated SVD to SEMANTIC_DIMENSIONS latent dimensions, so
+chunks and queries that use related words land close together even without
+a common term: "build gadgets" finds the TINKERS.pdf chunks, though
+"gadgets" appears nowhere in the knowledge base.
+
+Built from the search index postings on first use (no page text is re-read)
+and stored next to the knowledge base:
+
+    worm_knowledge_base.vectors.npy      float32 chunk vectors (docs x dims), L2-normalized
+    worm_knowledge_base.projection.npy   float32 term -> latent projection (terms x dims)
+    worm_knowledge_base.semantic.json    {"format", "kb", "docs", "dimensions", "terms", "idf"}
+
+Both matrices are memory-mapped when opened. A query is projected with the
+rows of its terms, and scored against every chunk with one matrix-vector
+product followed by an argpartition top-k. Requires NumPy.
+"""
+
+import json
+import math
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from worm_stem import stem
+from worm_text import tokenize
+
+
+# Bump when the on-disk layout or the weighting changes so stale files are rebuilt
+SEMANTIC_FORMAT = 1
+
+# Latent dimensions kept from the SVD (more mostly adds noise on a corpus this size)
+SEMANTIC_DIMENSIONS = 64
+
+# Randomized SVD: extra sampled dimensions and power iterations (accuracy vs build time)
+SVD_OVERSAMPLES = 10
+SVD_POWER_ITERATIONS = 2
+
+# Terms in more than this share of chunks carry no topic signal
+MAX_DF_RATIO = 0.5
+
+# Non-zeros multiplied at once in sparse products (bounds temporary memory)
+SPMM_CHUNK = 1 << 15
+
+
+def semantic_paths_for(kb_path: Path) -> Tuple[Path, Path, Path]:
+    """Return (vectors, projection, metadata) paths stored next to a knowledge base file."""
+    return (kb_path.with_name(kb_path.stem + ".vectors.npy"),
+            kb_path.with_name(kb_path.stem + ".projection.npy"),
+            kb_path.with_name(kb_path.stem + ".semantic.json"))
+
+
+def _tf_weight(tf: int) -> float:
+    return 1.0 + math.log(tf)
+
+
+class _SparseMatrix:
+    """Docs x terms TF-IDF matrix in coordinate form, with the two products the SVD needs."""
+
+    def __init__(self, rows: np.ndarray, cols: np.ndarray, vals: np.ndarray, shape: Tuple[int, int]):
+        self.shape = shape
+        self._by_row = self._sorted(rows, cols, vals, rows)
+        self._by_col = self._sorted(cols, rows, vals, cols)
+
+    @staticmethod
+    def _sorted(keys, others, vals, order_by):
+        order = np.argsort(order_by, kind="stable")
+        return keys[order], others[order], vals[order]
+
+    @staticmethod
+    def _product(keys: np.ndarray, others: np.ndarray, vals: np.ndarray,
+                 dense: np.ndarray, n_out: int) -> np.ndarray:
+        """out[key] += val * dense[other], summed per key with reduceat (keys sorted)."""
+        out = np.zeros((n_out, dense.shape[1]))
+        for start in range(0, len(keys), SPMM_CHUNK):
+            k = keys[start:start + SPMM_CHUNK]
+            products = vals[start:start + SPMM_CHUNK, None] * dense[others[start:start + SPMM_CHUNK]]
+            starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+            out[k[starts]] += np.add.reduceat(products, starts, axis=0)
+        return out
+
+    def dot(self, dense: np.ndarray) -> np.ndarray:
+        """A @ dense"""
+        return self._product(*self._by_row, dense, self.shape[0])
+
+    def tdot(self, dense: np.ndarray) -> np.ndarray:
+        """A.T @ dense"""
+        return self._product(*self._by_col, dense, self.shape[1])
+
+
+def _randomized_svd_projection(matrix: _SparseMatrix, dimensions: int, seed: int = 0) -> np.ndarray:
+    """Top right singular vectors of a sparse matrix (terms x dimensions), Halko et al."""
+    rng = np.random.default_rng(seed)
+    sample = min(dimensions + SVD_OVERSAMPLES, *matrix.shape)
+
+    q, _ = np.linalg.qr(matrix.dot(rng.standard_normal((matrix.shape[1], sample))))
+    for _ in range(SVD_POWER_ITERATIONS):
+        z, _ = np.linalg.qr(matrix.tdot(q))
+        q, _ = np.linalg.qr(matrix.dot(z))
+
+    # B = Q.T @ A is small (sample x terms): its SVD gives A's right singular vectors
+    _, _, vt = np.linalg.svd(matrix.tdot(q).T, full_matrices=False)
+    return vt[:dimensions].T
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+class SemanticIndex:
+    """Dense chunk vectors with a term projection for queries."""
+
+    def __init__(self, vectors: np.ndarray, projection: np.ndarray, terms: List[str], idf: List[float]):
+        """
+        Args:
+            vectors: Chunk vectors (docs x dims, unit length), row i is search index doc i
+            projection: Term -> latent space (terms x dims)
+            terms: Stemmed term of each projection row
+            idf: IDF weight of each projection row
+        """
+        self.vectors = vectors
+        self.projection = projection
+        self.terms = terms
+        self.idf = idf
+        self._columns = {term: column for column, term in enumerate(terms)}
+
+    @classmethod
+    def build(cls, postings: Dict[str, List[List[int]]], n_docs: int) -> "SemanticIndex":
+        """
+        Compute chunk vectors from search index postings.
+
+        Args:
+            postings: stemmed term -> [[doc_id, offset, ...], ...] (KnowledgeIndex.postings)
+            n_docs: Number of documents in the search index
+        """
+        # Words seen in at least two chunks but not in most of them
+        max_df = max(2, int(MAX_DF_RATIO * n_docs))
+        terms = sorted(term for term, plist in postings.items()
+                       if 2 <= len(plist) <= max_df and term.isalpha())
+        idf = [math.log((1 + n_docs) / (1 + len(postings[term]))) + 1.0 for term in terms]
+
+        rows, cols, vals = [], [], []
+        for column, term in enumerate(terms):
+            for entry in postings[term]:
+                rows.append(entry[0])
+                cols.append(column)
+                vals.append(_tf_weight(len(entry) - 1) * idf[column])
+
+        rows_array = np.array(rows, dtype=np.int64)
+        cols_array = np.array(cols, dtype=np.int64)
+        vals_array = np.array(vals)
+        # Unit-length rows so long chunks do not dominate the decomposition
+        norms = np.sqrt(np.bincount(rows_array, weights=vals_array ** 2, minlength=n_docs))
+        vals_array /= norms[rows_array]
+
+        if len(terms) < 2 or n_docs < 2:
+            return cls(np.zeros((n_docs, 1), np.float32), np.zeros((len(terms), 1), np.float32), terms, idf)
+
+        matrix = _SparseMatrix(rows_array, cols_array, vals_array, (n_docs, len(terms)))
+        projection = _randomized_svd_projection(matrix, min(SEMANTIC_DIMENSIONS, n_docs - 1, len(terms) - 1))
+        vectors = _normalize_rows(matrix.dot(projection))
+        return cls(vectors.astype(np.float32), projection.astype(np.float32), terms, idf)
+
+    @classmethod
+    def open(cls, kb_path: Path, fingerprint: Dict[str, int], n_docs: int) -> Optional["SemanticIndex"]:
+        """Memory-map persisted vectors, or None if they are missing or stale."""
+        vectors_path, projection_path, meta_path = semantic_paths_for(kb_path)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if (meta.get("format") != SEMANTIC_FORMAT or meta.get("kb") != fingerprint
+                or meta.get("docs") != n_docs or meta.get("dimensions") != SEMANTIC_DIMENSIONS):
+            return None
+
+        try:
+            vectors = np.load(vectors_path, mmap_mode="r")
+            projection = np.load(projection_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if vectors.shape[0] != n_docs or projection.shape[0] != len(meta["terms"]):
+            return None
+
+        return cls(vectors, projection, meta["terms"], meta["idf"])
+
+    def save(self, kb_path: Path, fingerprint: Dict[str, int]) -> None:
+        """Persist matrices and metadata atomically (temp files, then rename; metadata last)."""
+        vectors_path, projection_path, meta_path = semantic_paths_for(kb_path)
+        for path, matrix in ((vectors_path, self.vectors), (projection_path, self.projection)):
+            tmp_path = path.with_name(path.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+            os.replace(tmp_path, path)
+
+        tmp_meta = meta_path.with_name(meta_path.name + ".tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({
+                "format": SEMANTIC_FORMAT,
+                "kb": fingerprint,
+                "docs": len(self.vectors),
+                "dimensions": SEMANTIC_DIMENSIONS,
+                "terms": self.terms,
+                "idf": self.idf
+            }, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_meta, meta_path)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Unit-length latent vectors for query texts (len(texts) x dims; zero if no known term)."""
+        queries = np.zeros((len(texts), self.projection.shape[1]), dtype=np.float32)
+        for i, text in enumerate(texts):
+            counts: Dict[int, int] = {}
+            for word in tokenize(text):
+                column = self._columns.get(stem(word))
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+            if counts:
+                columns = list(counts)
+                weights = np.array([_tf_weight(counts[c]) * self.idf[c] for c in columns], dtype=np.float32)
+                queries[i] = weights @ self.projection[columns]
+        return _normalize_rows(queries)
+
+    def search_many(self, texts: List[str], k: int,
+                    accept: Optional[Callable[[int], bool]] = None) -> List[List[Tuple[float, int]]]:
+        """
+        Top-k chunks for each text, scored by cosine similarity in one matrix product.
+
+        Args:
+            texts: Queries or whole trigger/power descriptions
+            k: Results per text
+            accept: Optional predicate on doc id (e.g. source type filter)
+
+        Returns:
+            Per text: [(score, doc_id), ...] best first (texts without any
+            known term get no results)
+        """
+        queries = self.embed(texts)
+        scores = np.asarray(self.vectors) @ queries.T  # docs x texts
+        if accept is not None:
+            scores[~np.fromiter((accept(doc_id) for doc_id in range(len(scores))), bool, len(scores))] = -np.inf
+
+        results = []
+        k = min(k, len(scores))
+        for column, query in enumerate(queries):
+            if k == 0 or not query.any():
+                results.append([])
+                continue
+            column_scores = scores[:, column]
+            top = np.argpartition(-column_scores, k - 1)[:k]
+            top = top[np.argsort(-column_scores[top], kind="stable")]
+            results.append([(float(column_scores[d]), int(d)) for d in top if np.isfinite(column_scores[d])])
+        return results
+
+    def search(self, text: str, k: int, accept: Optional[Callable[[int], bool]] = None) -> List[Tuple[float, int]]:
+        """Top-k chunks for one text (see search_many)."""
+        return self.search_many([text], k, accept)[0]
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Long-running JSON/HTTP service for WormSkill (stdlib asyncio only).
+
+The skill, its search index and page store are loaded once at startup and
+shared by every request, so clients no longer pay the knowledge base load per
+invocation. Connections are HTTP/1.1 keep-alive.
+
+    GET  /health          {"status": "ok", "cache": {...}}
+    GET  /metrics         stage timings and counters, Prometheus text format
+    GET  /metrics.json    the same as JSON
+    POST /process         one request (SKILL.md schema) -> one response
+                          (?metrics=1 adds per-stage timings under "metadata")
+    POST /process_batch   {"records": [...]} or [...] -> {"results": [...]}
+                          (at most MAX_BATCH_RECORDS records, larger -> 413)
+    POST /search          {"query", "source_types"?, "k"?, "ranked"?, "fuzzy"?} -> {"results": [...]}
+                          (query syntax: worm_query; malformed queries -> 400;
+                          "semantic": true ranks by meaning instead, see worm_semantic)
+    POST /dedup           {"request", "key"?, "label"?, "k"?} -> {"duplicates": [...]}
+                          (near-duplicate earlier submissions, see worm_dedup;
+                          with "key" the request is recorded as a submission)
+
+Requests are handled concurrently up to --max-concurrency; the rest wait.
+Skill calls run on a single background thread (the skill and its cache are
+not thread-safe) so the event loop keeps serving I/O. With --workers N,
+batches are split into chunks and spread over N worker processes, each with
+its own WormSkill.
+
+Usage:
+    python worm_server.py --port 8765 --workers 4
+"""
+
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from worm_batch import _init_worker, _process_chunk, iter_chunks, process_chunk
+from worm_skill import WormSkill
+
+
+# Largest request body accepted
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# Seconds an idle keep-alive connection is kept open (until the request line and headers arrive)
+KEEPALIVE_TIMEOUT = 15.0
+
+# Seconds allowed to receive a request body once its headers have arrived
+BODY_TIMEOUT = 120.0
+
+# Records dispatched to a worker process per task
+BATCH_CHUNK_SIZE = 256
+
+# Largest /process_batch request, in records
+MAX_BATCH_RECORDS = 10_000
+
+# Chunks of one batch queued on the worker pool at once, per worker
+BATCH_CHUNKS_PER_WORKER = 2
+
+# Description field each /process mode requires (SKILL.md schema)
+MODE_TEXT_FIELDS = {"trigger_to_power": "trigger_description", "power_to_trigger": "power_description"}
+
+# Accepted num_variants (SKILL.md: 1-3)
+MAX_VARIANTS = 3
+
+
+class HTTPError(Exception):
+    """Request failure reported to the client as a JSON error body."""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _validate_request(body: Any) -> None:
+    """Raise a 400 HTTPError unless body is a well-formed /process request."""
+    if not isinstance(body, dict):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "request must be a JSON object")
+    field = MODE_TEXT_FIELDS.get(body.get("mode"))
+    if field is None:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f'"mode" must be one of {", ".join(MODE_TEXT_FIELDS)}')
+    if not isinstance(body.get(field), str):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f'"{field}" must be a string')
+    for name in ("language", "known_classification"):
+        if body.get(name) is not None and not isinstance(body[name], str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f'"{name}" must be a string')
+    if "num_variants" in body:
+        _int_field(body, "num_variants", 1, maximum=MAX_VARIANTS)
+
+
+def _int_field(body: Dict[str, Any], name: str, default: int, maximum: Optional[int] = None) -> int:
+    """An integer request field (numeric strings accepted), or a 400 HTTPError."""
+    value = body.get(name, default)
+    try:
+        if isinstance(value, (bool, float)):
+            raise ValueError
+        value = int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f'"{name}" must be an integer')
+    if value < 1 or (maximum is not None and value > maximum):
+        limit = f"between 1 and {maximum}" if maximum is not None else "at least 1"
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f'"{name}" must be {limit}')
+    return value
+
+
+def _search_options(body: Any) -> Dict[str, Any]:
+    """Validated keyword arguments of a /search request, or a 400 HTTPError."""
+    if not isinstance(body, dict) or not isinstance(body.get("query"), str):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, 'expected {"query": "..."}')
+    source_types = body.get("source_types")
+    if source_types is not None and not (isinstance(source_types, list)
+                                         and all(isinstance(t, str) for t in source_types)):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, '"source_types" must be a list of strings')
+    return {"source_types": source_types, "k": _int_field(body, "k", 10)}
+
+
+class WormServer:
+    """Routes JSON requests to one shared WormSkill."""
+
+    def __init__(self, skill: WormSkill, max_concurrency: int = 64, workers: int = 0):
+        """
+        Args:
+            skill: Loaded skill instance shared by all requests
+            max_concurrency: Requests processed at once; further requests queue
+            workers: Worker processes for /process_batch (0 = run batches on
+                the skill thread)
+        """
+        self.skill = skill
+        self.max_concurrency = max_concurrency
+        self.workers = workers
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._skill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="worm-skill")
+        self._pool = None
+        if workers > 0:
+            self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                             initargs=(str(skill.kb_path), skill.passages))
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/metrics"): self.metrics,
+            ("GET", "/metrics.json"): self.metrics_json,
+            ("POST", "/process"): self.process,
+            ("POST", "/process_batch"): self.process_batch,
+            ("POST", "/search"): self.search,
+            ("POST", "/dedup"): self.dedup,
+        }
+
+    def close(self) -> None:
+        """Shut down the executors."""
+        self._skill_executor.shutdown(wait=False)
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, func, *args, **kwargs) -> Any:
+        """Run a skill call on the skill thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._skill_executor, partial(func, *args, **kwargs))
+
+    # Endpoints
+
+    async def health(self, body: Any, params: Dict[str, str]) -> Dict[str, Any]:
+        return {"status": "ok", "cache": self.skill.cache_stats()}
+
+    async def metrics(self, body: Any, params: Dict[str, str]) -> str:
+        return self.skill.metrics.to_prometheus()
+
+    async def metrics_json(self, body: Any, params: Dict[str, str]) -> Dict[str, Any]:
+        return self.skill.metrics_snapshot()
+
+    async def process(self, body: Any, params: Dict[str, str]) -> Dict[str, Any]:
+        _validate_request(body)
+        include_metrics = params.get("metrics", "0") not in ("0", "false", "")
+        try:
+            return await self._run(self.skill.process, body, include_metrics=include_metrics)
+        except (KeyError, ValueError, TypeError) as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{type(e).__name__}: {e}")
+
+    async def process_batch(self, body: Any, params: Dict[str, str]) -> Dict[str, Any]:
+        records = body.get("records") if isinstance(body, dict) else body
+        if not isinstance(records, list):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'expected a JSON list or {"records": [...]}')
+        if len(records) > MAX_BATCH_RECORDS:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                            f"batch has {len(records)} records, at most {MAX_BATCH_RECORDS} are accepted")
+
+        chunks = list(iter_chunks(records, BATCH_CHUNK_SIZE))
+        if self._pool:
+            loop = asyncio.get_running_loop()
+            slots = asyncio.Semaphore(BATCH_CHUNKS_PER_WORKER * self.workers)
+
+            async def run_chunk(chunk):
+                async with slots:
+                    return await loop.run_in_executor(self._pool, _process_chunk, chunk)
+
+            parts = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+        else:
+            parts = [await self._run(process_chunk, self.skill, chunk) for chunk in chunks]
+
+        results = [response for part in parts for response in part]
+        return {"results": results, "errors": sum(1 for r in results if "error" in r)}
+
+    async def search(self, body: Any, params: Dict[str, str]) -> Dict[str, Any]:
+        options = _search_options(body)
+        if body.get("semantic"):
+            results = await self._run(self.skill.semantic_search, body["query"], **options)
+            return {"results": results}
+        try:
+            results = await self._run(self.skill.search_knowledge_base, body["query"], **options,
+                                      ranked=bool(body.get("ranked", True)),
+                                      fuzzy=bool(body.get("fuzzy", True)))
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{type(e).__name__}: {e}")
+        return {"results": results}
+
+    async def dedup(self, body: Any, params: Dict[str, str]) -> Dict[str, Any]:
+        if not isinstance(body, dict) or not isinstance(body.get("request"), dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'expected {"request": {...}}')
+        _validate_request(body["request"])
+        k = _int_field(body, "k", 3)
+        if body.get("key") is not None:
+            duplicates = await self._run(self.skill.add_submission, str(body["key"]), body["request"],
+                                         label=body.get("label"), k=k)
+        else:
+            duplicates = await self._run(self.skill.find_duplicates, body["request"], k)
+        return {"duplicates": duplicates}
+
+    # HTTP/1.1
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve requests on one connection until the client closes it or it idles out."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(self._read_head(reader), KEEPALIVE_TIMEOUT)
+                    if head is None:
+                        return
+                    method, target, length, keep_alive = head
+                    # The body gets its own deadline: a large upload is not an idle connection
+                    try:
+                        body = await asyncio.wait_for(reader.readexactly(length), BODY_TIMEOUT) if length else b""
+                    except asyncio.TimeoutError:
+                        raise HTTPError(HTTPStatus.REQUEST_TIMEOUT, f"body not received within {BODY_TIMEOUT}s")
+                except HTTPError as e:
+                    await self._respond(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    return
+
+                async with self._semaphore:
+                    status, payload = await self._dispatch(method, target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_head(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, int, bool]]:
+        """
+        Parse the request line and headers of one request.
+
+        Returns:
+            (method, target, body length, keep-alive), or None when the
+            client closed the connection
+        """
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed request line")
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "chunked bodies are not supported")
+        try:
+            length = int(headers.get("content-length") or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"body exceeds {MAX_BODY_BYTES} bytes")
+
+        return method.upper(), target, length, keep_alive
+
+    async def _dispatch(self, method: str, target: str, raw: bytes) -> Tuple[HTTPStatus, Any]:
+        """Route a request and turn failures into JSON error responses."""
+        url = urlsplit(target)
+        path = url.path
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"{method} not allowed on {path}"}
+            return HTTPStatus.NOT_FOUND, {"error": f"no route for {path}"}
+
+        try:
+            body = json.loads(raw) if raw else None
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": f"invalid JSON: {e}"}
+
+        try:
+            return HTTPStatus.OK, await handler(body, params)
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: HTTPStatus, payload: Any, keep_alive: bool) -> None:
+        # Strings are sent as-is (Prometheus exposition); everything else as JSON
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(host: str, port: int, server: WormServer) -> None:
+    """Run the service until cancelled."""
+    listener = await asyncio.start_server(server.handle_connection, host, port)
+    addresses = ", ".join(f"{s.getsockname()[0]}:{s.getsockname()[1]}" for s in listener.sockets)
+    print(f"[+] Serving on {addresses}", file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Worm Trigger-Power PRT HTTP service")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=8765, help="Bind port")
+    parser.add_argument("--kb", default="worm_knowledge_base.json", help="Knowledge base file")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="Requests processed at once")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Worker processes for /process_batch (0 = skill thread only, -1 = one per CPU core)")
+    parser.add_argument("--no-metrics", action="store_true", help="Disable stage timers and counters")
+    parser.add_argument("--passages", action="store_true",
+                        help="Cite the closest KB passages in reasoning sources (needs NumPy)")
+    args = parser.parse_args(argv)
+
+    skill = WormSkill(args.kb, metrics=not args.no_metrics, passages=args.passages)
+    # Open index and page store now rather than on the first search
+    skill.index, skill.store
+    if args.passages:
+        skill.semantic
+    print(f"[*] Loaded {len(skill.index.docs)} searchable chunks from {args.kb}", file=sys.stderr)
+
+    workers = (os.cpu_count() or 1) if args.workers < 0 else args.workers
+    server = WormServer(skill, args.max_concurrency, workers)
+    try:
+        asyncio.run(serve(args.host, args.port, server))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
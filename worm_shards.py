@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Sharded, precompressed copies of the knowledge base for the index.html viewer.
+
+Fetching and pretty-printing the whole worm_knowledge_base.json locks up a
+phone, so the viewer reads this instead (next to the knowledge base):
+
+    worm_knowledge_base.shards/manifest.json
+        {"format", "name", "description", "encodings",
+         "sources": [{"name", "type", "item_field", "items", "bytes",
+                      "parts": [{"file", "first", "count", "bytes", "gzip", "br"?}, ...]}, ...]}
+    worm_knowledge_base.shards/<hash>.json       one part of one source:
+        {"source", "part", "first", "fields"?, "items": [...]}
+
+A source's item list (PDF "content" pages, wiki "sections") is split into
+parts of about SHARD_BYTES, so a page is fetched without the rest of its
+PDF; the first part also carries the source's other fields. Wiki entries
+fetched before text extraction (raw_html only) are given sections the way
+the search index derives them (worm_html), and their HTML is left out. Each part is
+stored as plain .json, .json.gz and, if the brotli module is installed,
+.json.br: static servers that negotiate encodings (nginx gzip_static /
+brotli_static) can send the precompressed bytes, and the viewer decompresses
+the .gz itself with DecompressionStream where the server does not.
+
+Part files are named by content hash, so unchanged parts are neither
+rewritten nor re-downloaded (they can be cached forever); only the small
+manifest changes. The manifest is replaced atomically once every part it
+names exists, and parts it no longer names are then removed.
+
+Usage:
+    python worm_shards.py [--kb worm_knowledge_base.json]
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from worm_kb_io import iter_kb_sources, read_kb_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Bump when the manifest or part layout changes
+SHARDS_FORMAT = 2
+
+# Target uncompressed bytes per part (a part always holds at least one item)
+SHARD_BYTES = 64 * 1024
+
+# Source fields holding the list that is split across parts, in order of preference
+ITEM_FIELDS = ("content", "sections")
+
+
+def shards_dir_for(kb_path: Path) -> Path:
+    """Return the shard directory stored next to a knowledge base file."""
+    return kb_path.with_name(kb_path.stem + ".shards")
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _item_field(data: Dict[str, Any]) -> Optional[str]:
+    return next((field for field in ITEM_FIELDS if isinstance(data.get(field), list)), None)
+
+
+def _with_items(data: Dict[str, Any]) -> Dict[str, Any]:
+    """The source as sharded: raw_html-only wiki entries get extracted sections instead."""
+    if _item_field(data) or not isinstance(data.get("raw_html"), str):
+        return data
+    from worm_html import extract_sections
+    fields = {key: value for key, value in data.items() if key != "raw_html"}
+    return {**fields, "sections": extract_sections(data["raw_html"])}
+
+
+def split_source(name: str, data: Dict[str, Any],
+                 shard_bytes: int = SHARD_BYTES) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Serialize one source as parts of about `shard_bytes`.
+
+    Yields:
+        (first item, item count, part JSON bytes)
+    """
+    field = _item_field(data)
+    items = data[field] if field else []
+    fields = {key: value for key, value in data.items() if key != field}
+
+    part, first, batch, size = 0, 0, [], len(_dumps(fields))
+    for i, item in enumerate(items):
+        encoded = _dumps(item)
+        if batch and size + len(encoded) > shard_bytes:
+            yield first, len(batch), _part(name, part, first, fields, batch)
+            part, first, batch, size = part + 1, i, [], 0
+        batch.append(encoded)
+        size += len(encoded) + 1
+    yield first, len(batch), _part(name, part, first, fields, batch)
+
+
+def _part(name: str, part: int, first: int, fields: Dict[str, Any], items: List[bytes]) -> bytes:
+    head = {"source": name, "part": part, "first": first}
+    if part == 0:
+        head["fields"] = fields
+    # Items are already encoded: splice them in rather than re-serializing
+    return _dumps(head)[:-1] + b',"items":[' + b",".join(items) + b"]}"
+
+
+def _write(path: Path, data: bytes) -> None:
+    """Write a file atomically (temp file, then rename)."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_shards(kb_path: Path, out_dir: Optional[Path] = None,
+                 shard_bytes: int = SHARD_BYTES) -> Dict[str, int]:
+    """
+    (Re)build the shard directory from a knowledge base, one source in memory at a time.
+
+    Args:
+        kb_path: Knowledge base to split
+        out_dir: Shard directory (default: next to the knowledge base)
+        shard_bytes: Target uncompressed bytes per part
+
+    Returns:
+        {"sources", "parts", "written", "removed", "bytes", "gzip_bytes"}
+    """
+    kb_path = Path(kb_path)
+    out_dir = Path(out_dir) if out_dir else shards_dir_for(kb_path)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    encodings = ["gzip"] + (["br"] if brotli else [])
+    header = read_kb_header(kb_path)
+    sources = []
+    referenced = {"manifest.json"}
+    stats = {"sources": 0, "parts": 0, "written": 0, "removed": 0, "bytes": 0, "gzip_bytes": 0}
+
+    for name, data in iter_kb_sources(kb_path):
+        data = _with_items(data)
+        field = _item_field(data)
+        parts = []
+        for first, count, raw in split_source(name, data, shard_bytes):
+            file_name = hashlib.sha256(raw).hexdigest()[:32] + ".json"
+            path = out_dir / file_name
+            referenced.update((file_name, file_name + ".gz", file_name + ".br"))
+
+            gz_path = path.with_name(file_name + ".gz")
+            br_path = path.with_name(file_name + ".br")
+            if not (path.exists() and gz_path.exists() and (brotli is None or br_path.exists())):
+                _write(path, raw)
+                # mtime=0 keeps the bytes (and so the file) identical across rebuilds
+                _write(gz_path, gzip.compress(raw, 9, mtime=0))
+                if brotli:
+                    _write(br_path, brotli.compress(raw))
+                stats["written"] += 1
+
+            part = {"file": file_name, "first": first, "count": count,
+                    "bytes": len(raw), "gzip": gz_path.stat().st_size}
+            if brotli:
+                part["br"] = br_path.stat().st_size
+            parts.append(part)
+            stats["gzip_bytes"] += part["gzip"]
+
+        sources.append({
+            "name": name,
+            "type": data.get("type", ""),
+            "item_field": field,
+            "items": len(data[field]) if field else 0,
+            "bytes": sum(part["bytes"] for part in parts),
+            "parts": parts,
+        })
+        stats["sources"] += 1
+        stats["parts"] += len(parts)
+        stats["bytes"] += sources[-1]["bytes"]
+
+    manifest = {"format": SHARDS_FORMAT, **header, "encodings": encodings, "sources": sources}
+    _write(out_dir / "manifest.json", _dumps(manifest))
+
+    # Parts of the previous build that the new manifest no longer names
+    for path in out_dir.iterdir():
+        if path.name not in referenced and not path.name.endswith(".tmp"):
+            path.unlink()
+            stats["removed"] += 1
+    return stats
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write the sharded knowledge base for index.html")
+    parser.add_argument("--kb", default="worm_knowledge_base.json", help="Knowledge base to split")
+    parser.add_argument("--output", help="Shard directory (default: <kb>.shards next to the knowledge base)")
+    args = parser.parse_args()
+
+    stats = write_shards(Path(args.kb), Path(args.output) if args.output else None)
+    print(f"[+] {stats['sources']} sources -> {stats['parts']} parts "
+          f"({stats['written']} written, {stats['removed']} stale files removed)")
+    print(f"[*] {stats['bytes'] / 1024:.0f}KB JSON, {stats['gzip_bytes'] / 1024:.0f}KB gzip"
+          + ("" if brotli else " (install brotli for .br copies)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,14 +2,42 @@
 """
 Worm Trigger-Power PRT Classification Skill
 Main processor module for bidirectional trigger↔power generation
+
+Importing this module and constructing WormSkill are kept cheap for
+short-lived CLI/serverless calls: the search index, page store and their
+dependencies are imported and opened on the first search, and the keyword
+matcher's tables are loaded from a compiled artifact on the first analysis.
+Supporting passages for reasoning sources (NumPy semantic vectors) are
+opt-in, so plain classification never loads them.
 """
 
+import hashlib
 import json
 import re
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Any, Optional, Iterable, Iterator, Tuple, Union
 from dataclasses import dataclass
 
+from worm_matcher import KeywordMatcher, hit_counts, merge_tables
+from worm_scoring import ClassificationScorer
+from worm_cache import ResultCache
+from worm_metrics import Metrics, profile
+from worm_stem import STEMMER_VERSION, stem
+
+if TYPE_CHECKING:
+    from worm_dedup import DedupIndex
+    from worm_examples import PromptBuilder
+    from worm_fuzzy import TrigramIndex
+    from worm_index import KnowledgeIndex
+    from worm_llm import Backend, LLMClient
+    from worm_semantic import SemanticIndex
+    from worm_store import PageStore
+
+# A word (as the index tokenizes it), and a word with the separators after it
+_WORD_RE = re.compile(r"\w+")
+_WORD_GAP_RE = re.compile(r"\w+\W*")
+
 
 @dataclass
 class Classification:
@@ -48,11 +76,17 @@ class WormSkill:
         "trump": {"ru": "Козырь", "en": "Trump"},
     }
 
+    # Russian/English names accepted by class: search filters -> class key
+    CLASS_ALIASES = {
+        **{names["ru"].lower(): key for key, names in CLASSIFICATIONS.items()},
+        **{names["en"].lower() + "s": key for key, names in CLASSIFICATIONS.items()},
+    }
+
     # Trigger type keywords (for power_to_trigger inference)
     TRIGGER_KEYWORDS = {
         "brute": ["physical damage", "endurance", "pain", "injury", "assault", "beating"],
         "mover": ["confinement", "trapped", "pursuit", "escape", "restricted movement"],
-        "shaker": ["environmental", "surrounded", "territory", "area threat", "hazard"],
+        "shaker": ["environmental", "surrounded", "territory", "area threat", "hazard", "biohazard"],
         "blaster": ["distance", "ranged threat", "keep away", "long-range"],
         "striker": ["close-quarters", "touch", "intimate", "melee", "personal"],
         "changer": ["identity crisis", "transform", "be someone else", "body dysphoria"],
@@ -64,10 +98,266 @@ class WormSkill:
         "trump": ["parahuman conflict", "betrayed by powers", "power used against", "cape fight"],
     }
 
-    def __init__(self, knowledge_base_path: str = "worm_knowledge_base.json"):
-        """Initialize skill with knowledge base."""
+    # Emotion keywords (for trigger analysis)
+    EMOTION_KEYWORDS = {
+        "helpless": ["helpless", "powerless", "unable", "can't", "couldn't"],
+        "isolation": ["alone", "isolated", "abandoned", "nobody", "no one"],
+        "disgust": ["disgust", "revolting", "filthy", "gross", "vile"],
+        "rage": ["rage", "anger", "fury", "hate", "enraged"],
+        "fear": ["fear", "terror", "afraid", "scared", "frightened"],
+        "betrayal": ["betray", "trust", "backstab", "deceive", "lied"],
+    }
+
+    # Power mechanic keywords (for power analysis)
+    MECHANIC_KEYWORDS = {
+        "control": ["control", "command"],
+        "transformation": ["transform", "change"],
+        "projectile": ["shoot", "blast", "throw"],
+        "touch": ["touch", "contact"],
+        "area": ["area", "zone", "radius"],
+        "information": ["sense", "know", "detect"],
+    }
+
+    # Russian keyword sets (matched alongside the English ones after stemming)
+    TRIGGER_KEYWORDS_RU = {
+        "brute": ["физическая боль", "выносливость", "травма", "ранение", "нападение", "избиение", "побои"],
+        "mover": ["заточение", "ловушка", "взаперти", "погоня", "преследование", "побег", "сбежать"],
+        "shaker": ["окружили", "окружение", "территория", "опасная среда", "угроза вокруг", "стихийное бедствие"],
+        "blaster": ["на расстоянии", "дальняя угроза", "держать подальше", "издалека"],
+        "striker": ["ближний бой", "прикосновение", "вплотную", "рукопашная", "лицом к лицу"],
+        "changer": ["кризис идентичности", "превращение", "стать другим", "чужое тело", "ненависть к своему телу"],
+        "stranger": ["разоблачение", "прятаться", "скрываться", "заметили", "остаться незамеченным"],
+        "master": ["социальная изоляция", "беспомощность", "потеря контроля", "предательство группы", "одиночество"],
+        "thinker": ["нехватка информации", "не понимать", "неизвестность", "замешательство", "растерянность"],
+        "tinker": ["нужны инструменты", "решить задачу", "нехватка ресурсов", "время на подготовку", "смастерить"],
+        "breaker": ["бегство от реальности", "покинуть тело", "невыносимое настоящее", "измененное состояние"],
+        "trump": ["конфликт кейпов", "бой кейпов", "преданный силами", "сила против", "конфликт с парачеловеком"],
+    }
+
+    EMOTION_KEYWORDS_RU = {
+        "helpless": ["беспомощный", "бессильный", "бессилие", "не мог", "не могла"],
+        "isolation": ["одинокий", "одиночество", "изоляция", "брошенный", "никто"],
+        "disgust": ["отвращение", "мерзкий", "омерзительный", "грязный", "гадкий"],
+        "rage": ["ярость", "гнев", "злость", "ненависть", "бешенство"],
+        "fear": ["страх", "ужас", "бояться", "испуганный", "напуганный"],
+        "betrayal": ["предательство", "предать", "доверие", "обман", "солгать"],
+    }
+
+    MECHANIC_KEYWORDS_RU = {
+        "control": ["контроль", "контролировать", "управлять", "командовать", "подчинять"],
+        "transformation": ["превращаться", "трансформация", "изменять", "менять облик"],
+        "projectile": ["стрелять", "выстрел", "бросать", "швырять", "снаряд"],
+        "touch": ["прикосновение", "касание", "коснуться", "контакт"],
+        "area": ["область", "зона", "радиус"],
+        "information": ["чувствовать", "ощущать", "обнаруживать", "восприятие"],
+    }
+
+    # How much each detected emotion points at each classification
+    EMOTION_CLASS_WEIGHTS = {
+        "helpless": {"master": 0.6, "breaker": 0.3},
+        "isolation": {"master": 0.6, "stranger": 0.4},
+        "disgust": {"master": 0.3, "changer": 0.3, "shaker": 0.2},
+        "rage": {"brute": 0.5, "blaster": 0.4, "striker": 0.3},
+        "fear": {"mover": 0.5, "stranger": 0.3, "breaker": 0.2},
+        "betrayal": {"trump": 0.5, "master": 0.3},
+    }
+
+    # How much each power mechanic points at each classification
+    MECHANIC_CLASS_WEIGHTS = {
+        "control": {"master": 1.0},
+        "transformation": {"changer": 1.0},
+        "projectile": {"blaster": 1.0},
+        "touch": {"striker": 1.0},
+        "area": {"shaker": 1.0},
+        "information": {"thinker": 1.0},
+    }
+
+    # Justifications for classifications inferred from power mechanics
+    POWER_JUSTIFICATIONS = {
+        "master": "Control-based power",
+        "changer": "Transformation ability",
+        "blaster": "Ranged attack",
+        "striker": "Touch-based effect",
+        "shaker": "Area control",
+        "thinker": "Information-gathering ability",
+    }
+
+    # All keyword tables (English and Russian per label) compiled into a
+    # single-pass matcher over stemmed words, plus word prefixes for derived
+    # forms the stemmer keeps apart ("betrayal"); compiled on first use, from
+    # the artifact next to this file when the tables are unchanged
+    KEYWORD_MATCHER = KeywordMatcher({
+        "trigger": merge_tables(TRIGGER_KEYWORDS, TRIGGER_KEYWORDS_RU),
+        "emotion": merge_tables(EMOTION_KEYWORDS, EMOTION_KEYWORDS_RU),
+        "mechanic": merge_tables(MECHANIC_KEYWORDS, MECHANIC_KEYWORDS_RU),
+    }, cache_path=Path(__file__).with_name("worm_keywords.matcher.json"), normalize=stem, prefix=True)
+
+    # Feature (keyword group, label) x classification weight matrix
+    SCORER = ClassificationScorer(list(CLASSIFICATIONS), {
+        **{("trigger", t): {t: 1.0} for t in TRIGGER_KEYWORDS},
+        **{("emotion", e): w for e, w in EMOTION_CLASS_WEIGHTS.items()},
+        **{("mechanic", m): w for m, w in MECHANIC_CLASS_WEIGHTS.items()},
+    })
+
+    # Supporting KB passages cited per response when passages are enabled
+    PASSAGE_SOURCES = 3
+
+    def __init__(self, knowledge_base_path: str = "worm_knowledge_base.json",
+                 cache: Union[bool, ResultCache] = True, metrics: Union[bool, Metrics] = False,
+                 passages: bool = False, llm: Union["Backend", "LLMClient", None] = None):
+        """
+        Initialize skill with knowledge base.
+
+        Nothing is loaded or hashed here (construction is O(1)): the page
+        store and search index are opened on the first search, and the raw
+        JSON is only parsed if they need to be (re)built or `knowledge_base`
+        is accessed directly.
+
+        Args:
+            knowledge_base_path: Path to worm_knowledge_base.json
+            cache: Result cache for process() - True for the default in-memory
+                cache, False to disable, or a configured ResultCache
+            metrics: Per-stage timers and counters - True to record, False
+                for no-op timers, or a shared Metrics instance
+            passages: Cite the KB passages semantically closest to each
+                description in reasoning[].sources instead of the whole
+                knowledge base (needs NumPy; ignored without it)
+            llm: Generation backend (or a configured LLMClient) that fills the
+                placeholder fields in aprocess()/aprocess_many()/astream()
+        """
         self.kb_path = Path(knowledge_base_path)
-        self.knowledge_base = self._load_knowledge_base()
+        if not self.kb_path.exists():
+            raise FileNotFoundError(f"Knowledge base not found: {self.kb_path}")
+
+        self._knowledge_base: Optional[Dict[str, Any]] = None
+        self._index: Optional["KnowledgeIndex"] = None
+        self._store: Optional["PageStore"] = None
+        self._fuzzy: Optional["TrigramIndex"] = None
+        self._semantic: Union["SemanticIndex", bool, None] = None  # False: NumPy missing
+        self._prompts: Optional["PromptBuilder"] = None
+        self._dedup: Optional["DedupIndex"] = None
+        self.passages = passages
+        self._tables_hash: Optional[str] = None
+
+        if cache is True:
+            cache = ResultCache()
+        self.cache: Optional[ResultCache] = cache or None
+        self.metrics = metrics if isinstance(metrics, Metrics) else Metrics(enabled=metrics)
+
+        if llm is not None:
+            from worm_llm import Backend, LLMClient
+            if isinstance(llm, Backend):
+                llm = LLMClient(llm)
+        self.llm: Optional["LLMClient"] = llm
+
+    @property
+    def knowledge_base(self) -> Dict[str, Any]:
+        """Full knowledge base dict (parsed from JSON on first access)."""
+        if self._knowledge_base is None:
+            self._knowledge_base = self._load_knowledge_base()
+        return self._knowledge_base
+
+    @property
+    def index(self) -> "KnowledgeIndex":
+        """Search index (loaded or built on first access)."""
+        if self._index is None:
+            self._load_search_artifacts()
+        return self._index
+
+    @property
+    def store(self) -> "PageStore":
+        """Memory-mapped page texts (opened or built on first access)."""
+        if self._store is None:
+            self._load_search_artifacts()
+        return self._store
+
+    @property
+    def fuzzy(self) -> "TrigramIndex":
+        """Trigram index over the corpus vocabulary (loaded on the first misspelled query)."""
+        if self._fuzzy is None:
+            self._load_search_artifacts(fuzzy=True)
+        return self._fuzzy
+
+    @property
+    def semantic(self) -> Optional["SemanticIndex"]:
+        """Dense chunk vectors for semantic retrieval (memory-mapped on first use; None without NumPy)."""
+        if self._semantic is None:
+            with self.metrics.timer("kb_load"):
+                self._open_semantic()
+        return self._semantic or None
+
+    @property
+    def prompts(self) -> "PromptBuilder":
+        """Few-shot prompt builder over the bundled SKILL.md and TESTS.md (parsed on first use)."""
+        if self._prompts is None:
+            from worm_examples import ExampleStore, PromptBuilder
+
+            tests_path = Path(__file__).with_name("TESTS.md")
+            if self._tables_hash is None:
+                self._tables_hash = self._keyword_tables_hash()
+            store = ExampleStore.open(tests_path, self._tables_hash)
+            if store is None:
+                class_names = {key: [names["en"], names["ru"]] for key, names in self.CLASSIFICATIONS.items()}
+                store = ExampleStore.build(tests_path.read_text(encoding="utf-8"), class_names,
+                                           lambda input_data: self._feature_counts(self._analyze_input(input_data)))
+                try:
+                    store.save(tests_path, self._tables_hash)
+                except OSError:
+                    pass  # Read-only install: parse again next time
+            self._prompts = PromptBuilder(Path(__file__).with_name("SKILL.md"), store)
+        return self._prompts
+
+    @property
+    def dedup(self) -> "DedupIndex":
+        """
+        MinHash/LSH index of submitted descriptions (worm_submissions.dedup.*
+        next to the knowledge base; created seeded with the TESTS.md examples).
+        """
+        if self._dedup is None:
+            from worm_dedup import DedupIndex
+            from worm_examples import description_of, parse_examples
+
+            path = self.kb_path.with_name("worm_submissions.dedup")
+            dedup = DedupIndex.open(path)
+            if dedup is None:
+                dedup = DedupIndex()
+                tests = Path(__file__).with_name("TESTS.md").read_text(encoding="utf-8")
+                for example in parse_examples(tests):
+                    dedup.add(f"TESTS.md#{example['number']}", description_of(example["input"]),
+                              f"Example {example['number']}: {example['title']}")
+                try:
+                    dedup.save(path)
+                except OSError:
+                    dedup.path = None  # Read-only install: submissions are kept in memory only
+            self._dedup = dedup
+        return self._dedup
+
+    def _keyword_tables_hash(self) -> str:
+        """Hash of every table that shapes process() output (part of the cache key)."""
+        tables = [
+            self.CLASSIFICATIONS, self.TRIGGER_KEYWORDS, self.EMOTION_KEYWORDS, self.MECHANIC_KEYWORDS,
+            self.TRIGGER_KEYWORDS_RU, self.EMOTION_KEYWORDS_RU, self.MECHANIC_KEYWORDS_RU,
+            self.EMOTION_CLASS_WEIGHTS, self.MECHANIC_CLASS_WEIGHTS, self.POWER_JUSTIFICATIONS,
+            STEMMER_VERSION,
+        ]
+        data = json.dumps(tables, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def _cache_fingerprint(self) -> str:
+        """Current cache generation: keyword tables + knowledge base file version."""
+        if self._tables_hash is None:
+            self._tables_hash = self._keyword_tables_hash()
+        # Same size/mtime pair as worm_index.kb_fingerprint, without importing the index
+        stat = self.kb_path.stat()
+        return f"{self._tables_hash}:{int(self.passages)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Result cache hit/miss statistics (empty if caching is disabled)."""
+        return self.cache.stats() if self.cache else {}
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """Stage timings, counters and cache statistics (see Metrics.snapshot)."""
+        return {**self.metrics.snapshot(), "cache": self.cache_stats()}
 
     def _load_knowledge_base(self) -> Dict[str, Any]:
         """Load knowledge base from JSON."""
@@ -77,41 +367,415 @@ class WormSkill:
         with open(self.kb_path, "r", encoding="utf-8") as f:
             return json.load(f)
 
-    def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    def prepare_search(self) -> Dict[str, int]:
+        """
+        Open the search index, page store and trigram index, building and
+        saving them first if the KB changed. The ingestion scripts call this
+        after rewriting the KB, so no search pays for the rebuild.
+
+        Returns:
+            {"chunks": searchable chunks, "words": vocabulary of the trigram index}
+        """
+        self._load_search_artifacts(fuzzy=True)
+        return {"chunks": len(self._index.docs), "words": len(self._fuzzy.terms)}
+
+    def _load_search_artifacts(self, fuzzy: bool = False) -> None:
+        """
+        Open the persisted index and page store (and trigram index), rebuilding
+        them if the KB changed.
+        """
+        with self.metrics.timer("kb_load"):
+            self._open_search_artifacts(fuzzy)
+
+    def _open_search_artifacts(self, fuzzy: bool = False) -> None:
+        from worm_fuzzy import TrigramIndex
+        from worm_index import KnowledgeIndex, index_path_for, kb_fingerprint
+        from worm_store import PageStore
+
+        index_path = index_path_for(self.kb_path)
+        fingerprint = kb_fingerprint(self.kb_path)
+
+        index = self._index if self._index is not None else KnowledgeIndex.load(index_path, fingerprint)
+        store = self._store if self._store is not None else PageStore.open(self.kb_path, fingerprint)
+        trigram_index = TrigramIndex.open(self.kb_path, fingerprint) if fuzzy else None
+
+        if index is None or store is None or (fuzzy and trigram_index is None):
+            # Index, store and trigram index are built from the same pass over
+            # the KB (shared doc ids and vocabulary), so they are always
+            # rebuilt together. The parsed JSON is not kept around afterwards.
+            self.metrics.incr("kb_rebuilds")
+            knowledge_base = self._knowledge_base or self._load_knowledge_base()
+            index = KnowledgeIndex.build(knowledge_base, {
+                key: [key, names["en"], names["ru"]] for key, names in self.CLASSIFICATIONS.items()})
+            store = PageStore.build(knowledge_base)
+            trigram_index = TrigramIndex.build(index.vocabulary)
+            index.vocabulary = None
+            try:
+                index.save(index_path, fingerprint)
+                store.save(self.kb_path, fingerprint)
+                trigram_index.save(self.kb_path, fingerprint)
+            except OSError:
+                pass  # Read-only install: keep the in-memory artifacts
+
+        self._index, self._store = index, store
+        if trigram_index is not None:
+            self._fuzzy = trigram_index
+
+    def _open_semantic(self) -> None:
+        """Open the semantic vectors, computing them from the index postings if missing or stale."""
+        try:
+            from worm_semantic import SemanticIndex
+        except ImportError:  # NumPy not installed: no semantic retrieval
+            self._semantic = False
+            return
+        from worm_index import kb_fingerprint
+
+        index = self.index
+        fingerprint = kb_fingerprint(self.kb_path)
+        semantic_index = SemanticIndex.open(self.kb_path, fingerprint, len(index.docs))
+        if semantic_index is None:
+            # Only needs the postings: no KB re-parse
+            semantic_index = SemanticIndex.build(index.postings, len(index.docs))
+            try:
+                semantic_index.save(self.kb_path, fingerprint)
+            except OSError:
+                pass
+        self._semantic = semantic_index
+
+    def process(self, input_data: Dict[str, Any], include_metrics: bool = False) -> Dict[str, Any]:
         """
         Main processing endpoint.
 
         Args:
             input_data: JSON input matching schema in SKILL.md
+            include_metrics: Add {"metadata": {"timings_ms": {stage: ms}}} for
+                this request (works whether or not metrics are enabled)
 
         Returns:
             JSON output matching schema in SKILL.md
         """
+        with (self.metrics.trace() if include_metrics else nullcontext()) as timings:
+            result = self.process_many([input_data])[0]
+        if isinstance(result, Exception):
+            raise result
+        if include_metrics:
+            return {**result, "metadata": {"timings_ms": {k: round(v, 4) for k, v in timings.items()}}}
+        return result
+
+    def profile_process(self, input_data: Dict[str, Any], memory: bool = False) -> Dict[str, Any]:
+        """
+        Run one request under cProfile (and tracemalloc if memory=True).
+
+        The result cache is bypassed so the full pipeline is profiled.
+
+        Returns:
+            {"result": ..., "profile": "<pstats text>", "memory": {...}}
+        """
+        cache, self.cache = self.cache, None
+        try:
+            with profile(memory=memory) as report:
+                result = self.process(input_data, include_metrics=True)
+        finally:
+            self.cache = cache
+        return {"result": result, **report}
+
+    def process_many(self, records: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Process a list of requests with a single vectorized scoring pass.
+
+        Records found in the result cache are returned from it; the rest are
+        analysed, then scored against the 12 classifications in one matrix
+        product. A record that fails gets its exception returned in its place
+        instead of raising.
+
+        Args:
+            records: JSON inputs matching schema in SKILL.md
+
+        Returns:
+            One JSON output (or exception) per record, in order
+        """
+        metrics = self.metrics
+        metrics.incr("requests", len(records))
+        results: List[Union[Dict[str, Any], Exception, None]] = [None] * len(records)
+
+        # Serve repeated requests from the cache
+        keys: List[Optional[str]] = [None] * len(records)
+        if self.cache:
+            with metrics.timer("cache_lookup"):
+                self.cache.set_generation(self._cache_fingerprint())
+                for i, input_data in enumerate(records):
+                    keys[i] = self.cache.key(input_data)
+                    results[i] = self.cache.get(keys[i])
+            hits = sum(1 for r in results if r is not None)
+            metrics.incr("cache_hits", hits)
+            metrics.incr("cache_misses", len(records) - hits)
+
+        analyses: Dict[int, Dict[str, Any]] = {}
+        with metrics.timer("analyze"):
+            for i, input_data in enumerate(records):
+                if results[i] is not None:
+                    continue
+                try:
+                    analyses[i] = self._analyze_input(input_data)
+                except Exception as e:
+                    results[i] = e
+        if not analyses:
+            return results
+
+        with metrics.timer("score"):
+            all_scores = self.SCORER.score([self._feature_counts(a) for a in analyses.values()])
+
+        if self.passages:
+            with metrics.timer("retrieve"):
+                self._attach_passages(records, analyses)
+
+        with metrics.timer("build_response"):
+            for (i, analysis), scores in zip(analyses.items(), all_scores):
+                try:
+                    results[i] = self._build_response(records[i], analysis, scores)
+                except Exception as e:
+                    results[i] = e
+                    continue
+                if self.cache:
+                    self.cache.put(keys[i], results[i])
+
+        metrics.incr("errors", sum(1 for r in results if isinstance(r, Exception)))
+        return results
+
+    def build_prompt(self, input_data: Dict[str, Any], k: int = 3) -> List[Dict[str, str]]:
+        """
+        Chat messages for generating a request's response with an LLM.
+
+        The system message is SKILL.md (cached, identical for every request);
+        the user message holds the k TESTS.md examples closest to the request
+        - same mode, similar wording, shared predicted classes and keyword
+        features - followed by the request JSON.
+
+        Args:
+            input_data: JSON input matching schema in SKILL.md
+            k: Few-shot examples to include
+
+        Returns:
+            [{"role": "system", "content": ...}, {"role": "user", "content": ...}]
+        """
+        with self.metrics.timer("prompt"):
+            analysis = self._analyze_input(input_data)
+            features = self._feature_counts(analysis)
+            scores = self.SCORER.score([features])[0]
+            ranked = sorted(zip(scores, self.CLASSIFICATIONS), key=lambda pair: -pair[0])
+            classes = [c for score, c in ranked[:3] if score > 0]
+            return self.prompts.build(input_data, k, classes, features)
+
+    def find_duplicates(self, input_data: Dict[str, Any], k: int = 3,
+                        threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Earlier submissions (and TESTS.md examples) whose description nearly
+        matches the request's, most similar first.
+
+        Args:
+            input_data: Request (its trigger or power description is compared)
+            k: Maximum matches
+            threshold: Minimum estimated Jaccard similarity of the word
+                shingles (default worm_dedup.DEDUP_THRESHOLD)
+
+        Returns:
+            [{"key", "label", "similarity"}, ...]
+        """
+        from worm_dedup import DEDUP_THRESHOLD
+        from worm_examples import description_of
+
+        with self.metrics.timer("dedup"):
+            return self.dedup.query(description_of(input_data), k,
+                                    DEDUP_THRESHOLD if threshold is None else threshold)
+
+    def add_submission(self, key: str, input_data: Dict[str, Any], label: Optional[str] = None,
+                       k: int = 3) -> List[Dict[str, Any]]:
+        """
+        Record a submission for later duplicate checks (appended to the index
+        files) and return the near-duplicates it already had.
+
+        Args:
+            key: Submission id returned by later find_duplicates() calls
+            input_data: Submitted request
+            label: Optional display name
+            k: Maximum matches reported
+
+        Returns:
+            find_duplicates() of the request before it was added
+        """
+        from worm_examples import description_of
+
+        duplicates = self.find_duplicates(input_data, k)
+        with self.metrics.timer("dedup"):
+            self.dedup.add(key, description_of(input_data), label)
+        self.metrics.incr("submissions")
+        self.metrics.incr("duplicate_submissions", int(bool(duplicates)))
+        return duplicates
+
+    async def aprocess(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        process() with the placeholder fields generated by the LLM backend.
+
+        Raises:
+            GenerationError: If generation failed (after the client's retries)
+        """
+        result = (await self.aprocess_many([input_data]))[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def aprocess_many(self, records: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Classify records (as process_many), then generate their text concurrently.
+
+        Each record is one backend call: the num_variants trigger variants of
+        a power_to_trigger request are sampled together (n completions), so a
+        batch never waits on serial per-variant round trips. The LLMClient
+        bounds how many calls are in flight and merges identical ones.
+        Classification runs on the calling thread; only generation awaits.
+
+        Returns:
+            One JSON output (or exception) per record, in order
+        """
+        import asyncio
+
+        if self.llm is None:
+            raise ValueError("no LLM backend configured (WormSkill(llm=...))")
+        results = self.process_many(records)
+        pending = [i for i, result in enumerate(results) if not isinstance(result, Exception)]
+        with self.metrics.timer("generate"):
+            generated = await asyncio.gather(*(self._generate(records[i], results[i]) for i in pending),
+                                             return_exceptions=True)
+        for i, outcome in zip(pending, generated):
+            if isinstance(outcome, Exception):
+                results[i] = outcome
+        self.metrics.incr("generations", len(pending))
+        self.metrics.incr("generation_errors", sum(1 for outcome in generated if isinstance(outcome, Exception)))
+        return results
+
+    async def astream(self, input_data: Dict[str, Any]) -> AsyncIterator[str]:
+        """Raw completion text for a request, chunk by chunk as the backend produces it."""
+        if self.llm is None:
+            raise ValueError("no LLM backend configured (WormSkill(llm=...))")
+        async for chunk in self.llm.stream(self.build_prompt(input_data)):
+            yield chunk
+
+    async def _generate(self, input_data: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """Fill a process() result's placeholder fields from one (n-completion) backend call."""
+        from worm_llm import parse_completion
+
+        variants = len(result["output"].get("trigger_variants", ())) or 1
+        # Each completion is one variant: ask for one, sample `variants` of them
+        prompt_input = {**input_data, "num_variants": 1} if variants > 1 else input_data
+        texts = await self.llm.generate(self.build_prompt(prompt_input), n=variants)
+        completions = [parse_completion(text) for text in texts]
+
+        output = result["output"]
+        first = completions[0]
+        for field in ("limitations", "secondary_effects", "counterplay"):
+            if isinstance(first.get(field), list) and first[field]:
+                output[field] = first[field]
+        if "power_description" in output and isinstance(first.get("power_description"), str):
+            output["power_description"] = first["power_description"]
+        for variant, completion in zip(output.get("trigger_variants", ()), completions):
+            generated = (completion.get("trigger_variants") or [{}])[0]
+            if isinstance(generated.get("trigger_description"), str):
+                variant["trigger_description"] = generated["trigger_description"]
+
+    def _attach_passages(self, records: List[Dict[str, Any]], analyses: Dict[int, Dict[str, Any]]) -> None:
+        """Retrieve the closest KB passages for every analysed description in one product."""
+        if self.semantic is None:
+            return
+        descriptions = [records[i].get("trigger_description") or records[i].get("power_description") or ""
+                        for i in analyses]
+        # Several chunks of one page collapse into a single citation
+        hits = self.semantic.search_many(descriptions, self.PASSAGE_SOURCES * 2)
+        for analysis, doc_hits in zip(analyses.values(), hits):
+            sources = dict.fromkeys(self._passage_source(doc_id) for _, doc_id in doc_hits)
+            analysis["passages"] = list(sources)[:self.PASSAGE_SOURCES]
+            self.metrics.incr("passages", len(analysis["passages"]))
+
+    def _passage_source(self, doc_id: int) -> str:
+        """Citation for a search index chunk in SKILL.md's format (file.pdf#p3, Page_Name(wiki))."""
+        doc = self.index.docs[doc_id]
+        if doc["type"] == "wiki":
+            return f"{doc['source'].removeprefix('wiki_')}(wiki)"
+        return f"{doc['source']}#p{doc['page']}"
+
+    def _reasoning_sources(self, analysis: Dict[str, Any]) -> List[str]:
+        """Sources cited for a response's reasoning: retrieved passages, else the whole KB."""
+        return [*(analysis.get("passages") or ["worm_knowledge_base.json"]), "SKILL.md"]
+
+    def _analyze_input(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the keyword analysis for the request's mode."""
         mode = input_data.get("mode")
 
         if mode == "trigger_to_power":
-            return self._trigger_to_power(input_data)
+            return self._analyze_trigger(input_data["trigger_description"])
         elif mode == "power_to_trigger":
-            return self._power_to_trigger(input_data)
+            return self._analyze_power(input_data["power_description"], input_data.get("known_classification"))
         else:
             raise ValueError(f"Unknown mode: {mode}. Use 'trigger_to_power' or 'power_to_trigger'")
 
-    def _trigger_to_power(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _build_response(self, input_data: Dict[str, Any], analysis: Dict[str, Any],
+                        scores: List[float]) -> Dict[str, Any]:
+        """Assemble the mode's JSON output from its analysis and classification scores."""
+        if input_data["mode"] == "trigger_to_power":
+            return self._trigger_to_power(input_data, analysis, scores)
+        return self._power_to_trigger(input_data, analysis, scores)
+
+    @staticmethod
+    def _feature_counts(analysis: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+        """Keyword hit counts of an analysis, grouped as the scorer expects."""
+        return {
+            "trigger": analysis.get("type_counts", {}),
+            "emotion": analysis.get("emotion_counts", {}),
+            "mechanic": analysis.get("mechanic_counts", {}),
+        }
+
+    def process_batch(self, records: Iterable[Dict[str, Any]], workers: int = 1,
+                      chunk_size: int = 256) -> Iterator[Dict[str, Any]]:
+        """
+        Process many requests with this (already loaded) skill instance.
+
+        Records are consumed lazily and responses are yielded in input order,
+        so memory stays bounded for arbitrarily long inputs. A failing record
+        yields {"index": i, "error": {"type": ..., "message": ...}} instead of
+        raising.
+
+        Args:
+            records: Iterable of JSON inputs matching schema in SKILL.md
+            workers: Worker processes; above 1 the batch runs on a process pool
+                where each worker loads its own WormSkill once
+            chunk_size: Records analysed and scored together (and dispatched
+                to a worker per task)
+
+        Returns:
+            Iterator of JSON outputs, one per record
+        """
+        from worm_batch import iter_chunks, process_chunk, process_parallel
+
+        if workers > 1:
+            yield from process_parallel(records, str(self.kb_path), workers, chunk_size, self.passages)
+            return
+
+        for chunk in iter_chunks(records, chunk_size):
+            yield from process_chunk(self, chunk)
+
+    def _trigger_to_power(self, input_data: Dict[str, Any], trigger_analysis: Dict[str, Any],
+                          scores: List[float]) -> Dict[str, Any]:
         """
         Generate power from trigger description.
 
         This is a reference implementation. For production use, integrate with
         LLM API (Claude, GPT-4, etc.) using the SKILL.md prompt and few-shot
-        examples from TESTS.md.
+        examples from TESTS.md (see build_prompt).
         """
         trigger_desc = input_data["trigger_description"]
         language = input_data.get("language", "en")
 
-        # Analyze trigger (simplified keyword matching)
-        trigger_analysis = self._analyze_trigger(trigger_desc)
-
         # Generate classification
-        classifications = self._infer_classifications_from_trigger(trigger_analysis)
+        classifications = self._infer_classifications_from_trigger(trigger_analysis, scores)
 
         # Build response
         return {
@@ -136,7 +800,7 @@ class WormSkill:
                     {
                         "point": "Classification based on trigger analysis",
                         "because": f"Detected keywords: {', '.join(trigger_analysis['keywords'][:3])}",
-                        "sources": ["worm_knowledge_base.json", "SKILL.md"]
+                        "sources": self._reasoning_sources(trigger_analysis)
                     }
                 ],
                 "confidence": 0.5,  # Low confidence without LLM
@@ -144,22 +808,20 @@ class WormSkill:
             }
         }
 
-    def _power_to_trigger(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _power_to_trigger(self, input_data: Dict[str, Any], power_analysis: Dict[str, Any],
+                          scores: List[float]) -> Dict[str, Any]:
         """
         Generate trigger(s) from power description.
 
         This is a reference implementation. For production use, integrate with
-        LLM API using the SKILL.md prompt and few-shot examples from TESTS.md.
+        LLM API using the SKILL.md prompt and few-shot examples from TESTS.md
+        (see build_prompt).
         """
         power_desc = input_data["power_description"]
         num_variants = input_data.get("num_variants", 1)
-        known_class = input_data.get("known_classification")
-
-        # Analyze power
-        power_analysis = self._analyze_power(power_desc, known_class)
 
         # Generate classification if not provided
-        classifications = self._infer_classifications_from_power(power_analysis)
+        classifications = self._infer_classifications_from_power(power_analysis, scores)
 
         # Build response
         return {
@@ -197,7 +859,7 @@ class WormSkill:
                     {
                         "point": "Classification inferred from power mechanics",
                         "because": f"Detected types: {', '.join([c['type'] for c in classifications])}",
-                        "sources": ["worm_knowledge_base.json", "SKILL.md"]
+                        "sources": self._reasoning_sources(power_analysis)
                     }
                 ],
                 "confidence": 0.5,
@@ -210,52 +872,38 @@ class WormSkill:
 
     def _analyze_trigger(self, trigger_desc: str) -> Dict[str, Any]:
         """Analyze trigger description to extract key features."""
-        trigger_lower = trigger_desc.lower()
-        detected_types = []
-
-        # Keyword matching
-        for trigger_type, keywords in self.TRIGGER_KEYWORDS.items():
-            if any(kw in trigger_lower for kw in keywords):
-                detected_types.append(trigger_type)
-
-        # Emotion detection (simplified)
-        emotions = []
-        emotion_keywords = {
-            "helpless": ["helpless", "powerless", "unable", "can't", "couldn't"],
-            "isolation": ["alone", "isolated", "abandoned", "nobody", "no one"],
-            "disgust": ["disgust", "revolting", "filthy", "gross", "vile"],
-            "rage": ["rage", "anger", "fury", "hate", "enraged"],
-            "fear": ["fear", "terror", "afraid", "scared", "frightened"],
-            "betrayal": ["betray", "trust", "backstab", "deceive", "lied"],
-        }
+        hits = self.KEYWORD_MATCHER.scan(trigger_desc)
+
+        # Most-mentioned trigger types first (ties keep table order)
+        type_counts = hit_counts(hits["trigger"])
+        detected_types = sorted(type_counts, key=lambda t: -type_counts[t])
+
+        emotion_counts = hit_counts(hits["emotion"])
+        emotions = sorted(emotion_counts, key=lambda e: -emotion_counts[e])
 
-        for emotion, keywords in emotion_keywords.items():
-            if any(kw in trigger_lower for kw in keywords):
-                emotions.append(emotion)
+        # Keywords actually found for the top two types
+        keywords = []
+        for ttype in detected_types[:2]:
+            matched = list(dict.fromkeys(kw for kw, _ in hits["trigger"][ttype]))
+            keywords.extend(matched[:2])
 
         return {
             "types": detected_types[:3],  # Top 3
-            "keywords": [kw for kws in [self.TRIGGER_KEYWORDS[t] for t in detected_types[:2]] for kw in kws[:2]],
+            "type_counts": type_counts,
+            "keywords": keywords,
             "emotions": emotions,
+            "emotion_counts": emotion_counts,
             "text_length": len(trigger_desc)
         }
 
     def _analyze_power(self, power_desc: str, known_class: Optional[str] = None) -> Dict[str, Any]:
         """Analyze power description to extract key features."""
-        power_lower = power_desc.lower()
-
         # Parse known classification if provided
         parsed_class = self._parse_classification(known_class) if known_class else []
 
         # Detect power mechanics
-        mechanics = {
-            "control": "control" in power_lower or "command" in power_lower,
-            "transformation": "transform" in power_lower or "change" in power_lower,
-            "projectile": "shoot" in power_lower or "blast" in power_lower or "throw" in power_lower,
-            "touch": "touch" in power_lower or "contact" in power_lower,
-            "area": "area" in power_lower or "zone" in power_lower or "radius" in power_lower,
-            "information": "sense" in power_lower or "know" in power_lower or "detect" in power_lower,
-        }
+        mechanic_counts = hit_counts(self.KEYWORD_MATCHER.scan(power_desc)["mechanic"])
+        mechanics = {mechanic: mechanic in mechanic_counts for mechanic in self.MECHANIC_KEYWORDS}
 
         # Map mechanics to likely trigger emotions
         emotion_map = {
@@ -266,28 +914,30 @@ class WormSkill:
         }
 
         likely_emotions = []
-        for mechanic, present in mechanics.items():
-            if present and mechanic in emotion_map:
+        for mechanic in sorted(mechanic_counts, key=lambda m: -mechanic_counts[m]):
+            if mechanic in emotion_map:
                 likely_emotions.extend(emotion_map[mechanic])
 
         return {
             "parsed_classification": parsed_class,
             "mechanics": mechanics,
+            "mechanic_counts": mechanic_counts,
             "likely_emotions": likely_emotions[:3],
             "threat_type": "Unknown",  # Would need LLM
             "text_length": len(power_desc)
         }
 
-    def _infer_classifications_from_trigger(self, analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Infer PRT classifications from trigger analysis."""
+    def _infer_classifications_from_trigger(self, analysis: Dict[str, Any],
+                                            scores: List[float]) -> List[Dict[str, Any]]:
+        """Infer PRT classifications from trigger analysis scores."""
         classifications = []
 
-        for i, ttype in enumerate(analysis["types"][:2]):  # Primary + secondary
+        for i, (ttype, score, rating) in enumerate(self.SCORER.rank(scores)):  # Primary + secondary
             classifications.append({
                 "type": ttype,
-                "rating": 5,  # Default mid-range (would need LLM for accurate rating)
+                "rating": rating,
                 "primary": i == 0,
-                "justification": f"Trigger analysis suggests {ttype} classification"
+                "justification": f"Trigger analysis suggests {ttype} classification (score {score:.2f})"
             })
 
         if not classifications:
@@ -301,30 +951,27 @@ class WormSkill:
 
         return classifications
 
-    def _infer_classifications_from_power(self, analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Infer PRT classifications from power analysis."""
+    def _infer_classifications_from_power(self, analysis: Dict[str, Any],
+                                          scores: List[float]) -> List[Dict[str, Any]]:
+        """Infer PRT classifications from power analysis scores."""
         if analysis["parsed_classification"]:
             return analysis["parsed_classification"]
 
         # Infer from mechanics
         classifications = []
-        mechanics = analysis["mechanics"]
-
-        if mechanics["control"]:
-            classifications.append({"type": "master", "rating": 6, "primary": True, "justification": "Control-based power"})
-        if mechanics["transformation"]:
-            classifications.append({"type": "changer", "rating": 5, "primary": not classifications, "justification": "Transformation ability"})
-        if mechanics["projectile"]:
-            classifications.append({"type": "blaster", "rating": 6, "primary": not classifications, "justification": "Ranged attack"})
-        if mechanics["touch"]:
-            classifications.append({"type": "striker", "rating": 7, "primary": not classifications, "justification": "Touch-based effect"})
-        if mechanics["area"]:
-            classifications.append({"type": "shaker", "rating": 6, "primary": not classifications, "justification": "Area control"})
+
+        for i, (ptype, score, rating) in enumerate(self.SCORER.rank(scores)):  # Primary + secondary
+            classifications.append({
+                "type": ptype,
+                "rating": rating,
+                "primary": i == 0,
+                "justification": self.POWER_JUSTIFICATIONS.get(ptype, f"Power analysis suggests {ptype} classification")
+            })
 
         if not classifications:
             classifications.append({"type": "brute", "rating": 4, "primary": True, "justification": "Default classification"})
 
-        return classifications[:2]  # Primary + secondary
+        return classifications
 
     def _parse_classification(self, class_str: str) -> List[Dict[str, Any]]:
         """Parse classification string like 'Master 8 / Thinker 3'."""
@@ -363,58 +1010,183 @@ class WormSkill:
 
         return questions[:3]  # Max 3 questions
 
-    def search_knowledge_base(self, query: str, source_types: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    def search_knowledge_base(self, query: str, source_types: Optional[List[str]] = None,
+                              k: int = 10, ranked: bool = True, fuzzy: bool = True) -> List[Dict[str, Any]]:
         """
         Search knowledge base for relevant information.
 
         Args:
-            query: Search query (keywords)
+            query: Search query - keywords (all must match), "quoted phrases",
+                AND/OR/NOT with parentheses, type:pdf|wiki and class:<PRT class>
+                filters (see worm_query)
             source_types: Filter by source type (["pdf", "wiki"])
+            k: Maximum number of results
+            ranked: Order by BM25 relevance (adds "score" to each result);
+                False returns the first k matches in corpus order
+            fuzzy: Search misspelled words (not in the corpus) as their
+                closest corpus words; results then carry "did_you_mean"
 
         Returns:
             List of matching entries with context
+
+        Raises:
+            QuerySyntaxError: If the query is malformed (a ValueError)
+        """
+        with self.metrics.timer("search"):
+            results = self._search(query, source_types, k, ranked, fuzzy)
+        self.metrics.incr("search_queries")
+        self.metrics.incr("search_results", len(results))
+        return results
+
+    def suggest_query(self, query: str) -> Optional[str]:
+        """
+        Did-you-mean for a query: its words missing from the corpus replaced by
+        the closest corpus words (None if every word is known or none is close).
+        """
+        from worm_fuzzy import apply_corrections, correct_query
+        from worm_query import parse
+
+        _, corrections = correct_query(parse(query, self.CLASS_ALIASES), self.index.postings, self.fuzzy)
+        return apply_corrections(query, corrections) if corrections else None
+
+    def semantic_search(self, text: str, source_types: Optional[List[str]] = None,
+                        k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Find the chunks closest in meaning to a text (no shared words needed).
+
+        Args:
+            text: Free text - a question or a whole trigger/power description
+            source_types: Filter by source type (["pdf", "wiki"])
+            k: Maximum number of results
+
+        Returns:
+            Matching entries like search_knowledge_base, with the cosine
+            similarity as "score" (empty without NumPy)
         """
-        results = []
-        query_lower = query.lower()
-
-        for source_name, source_data in self.knowledge_base["sources"].items():
-            if source_types and source_data["type"] not in source_types:
-                continue
-
-            if source_data["type"] == "pdf":
-                for page_data in source_data.get("content", []):
-                    text = page_data["text"].lower()
-                    if query_lower in text:
-                        results.append({
-                            "source": source_name,
-                            "type": "pdf",
-                            "page": page_data["page"],
-                            "snippet": self._extract_snippet(page_data["text"], query_lower)
-                        })
-
-            elif source_data["type"] == "wiki":
-                if source_data.get("status") == "success":
-                    content = source_data.get("raw_html", "").lower()
-                    if query_lower in content:
-                        results.append({
-                            "source": source_name,
-                            "type": "wiki",
-                            "url": source_data["url"],
-                            "snippet": f"Found '{query}' in {source_name}"
-                        })
-
-        return results[:10]  # Top 10 results
-
-    def _extract_snippet(self, text: str, query: str, context_chars: int = 150) -> str:
-        """Extract snippet around query match."""
-        text_lower = text.lower()
-        idx = text_lower.find(query)
-
-        if idx == -1:
-            return text[:context_chars]
+        with self.metrics.timer("search.semantic"):
+            if self.semantic is None:
+                return []
+            docs = self.index.docs
+            accept = (lambda doc_id: docs[doc_id]["type"] in source_types) if source_types else None
+            results = []
+            for score, doc_id in self.semantic.search(text, k, accept):
+                result = self._search_result(doc_id, {}, [])
+                result["score"] = round(score, 4)
+                results.append(result)
+        self.metrics.incr("search_queries")
+        self.metrics.incr("search_results", len(results))
+        return results
+
+    def _search(self, query: str, source_types: Optional[List[str]], k: int, ranked: bool,
+                fuzzy: bool = True) -> List[Dict[str, Any]]:
+        from worm_query import anchor_terms, parse
+
+        metrics = self.metrics
+        accept = (lambda doc: doc["type"] in source_types) if source_types else None
+
+        node = parse(query, self.CLASS_ALIASES)
+        did_you_mean = None
+        if fuzzy:
+            from worm_fuzzy import apply_corrections, correct_query, missing_words
+            if missing_words(node, self.index.postings):
+                with metrics.timer("search.fuzzy"):
+                    node, corrections = correct_query(node, self.index.postings, self.fuzzy)
+                if corrections:
+                    metrics.incr("search_fuzzy_corrections", len(corrections))
+                    did_you_mean = query = apply_corrections(query, corrections)
+
+        with metrics.timer("search.rank"):
+            if ranked:
+                hits = [(doc_id, term_offsets, score) for score, doc_id, term_offsets
+                        in self.index.top_k(node, k, accept)]
+            else:
+                hits = []
+                for doc_id, term_offsets in self.index.match(node):
+                    if len(hits) == k:
+                        break
+                    if accept is None or accept(self.index.docs[doc_id]):
+                        hits.append((doc_id, term_offsets, None))
+
+        with metrics.timer("search.snippet"):
+            anchor = anchor_terms(node)
+            results = []
+            for doc_id, term_offsets, score in hits:
+                result = self._search_result(doc_id, term_offsets, anchor)
+                if ranked:
+                    result["score"] = round(score, 4)
+                if did_you_mean:
+                    result["did_you_mean"] = did_you_mean
+                results.append(result)
+        if metrics.enabled:
+            metrics.incr("search_bytes_scanned", sum(self.store.size(doc_id) for doc_id, _, _ in hits))
+
+        return results
+
+    def _search_result(self, doc_id: int, term_offsets: Dict[str, List[int]], anchor: List[str]) -> Dict[str, Any]:
+        """
+        Build one search result (source/type/page/snippet) for a matched document.
 
+        Args:
+            doc_id: Matched document
+            term_offsets: Stemmed term -> char offsets of the matched terms
+            anchor: Stemmed query terms to center the snippet on (worm_query.anchor_terms)
+        """
+        doc = self.index.docs[doc_id]
+        text = self.store.text(doc_id)
+        idx, length = self._anchor_span(text, term_offsets, anchor)
+        snippet = self._snippet_at(text, idx, length)
+
+        if doc["type"] == "wiki":
+            return {
+                "source": doc["source"],
+                "type": "wiki",
+                "url": doc["url"],
+                "section": doc["section"],
+                "chunk_id": doc["chunk_id"],
+                "snippet": snippet
+            }
+
+        return {
+            "source": doc["source"],
+            "type": "pdf",
+            "page": doc["page"],
+            "chunk_id": doc["chunk_id"],
+            "snippet": snippet
+        }
+
+    @staticmethod
+    def _anchor_span(text: str, term_offsets: Dict[str, List[int]], anchor: List[str]) -> Tuple[int, int]:
+        """
+        Offset and length of the text a snippet is centered on.
+
+        Prefers an occurrence of the anchor terms as consecutive words, then
+        the first anchor term, then any matched word.
+        """
+        # Filter-only queries match without term offsets: snippet from the start
+        if not any(term_offsets.values()):
+            return 0, 0
+        if len(anchor) > 1 and all(term in term_offsets for term in anchor):
+            later = [set(term_offsets[term]) for term in anchor[1:]]
+            for start in term_offsets[anchor[0]]:
+                end = start
+                for offsets in later:
+                    word = _WORD_GAP_RE.match(text, end)
+                    if word is None or word.end() not in offsets:
+                        break
+                    end = word.end()
+                else:
+                    last = _WORD_RE.match(text, end)
+                    return start, (last.end() if last else end) - start
+
+        first = term_offsets.get(anchor[0]) if anchor else None
+        idx = (first or next(offsets for offsets in term_offsets.values() if offsets))[0]
+        word = _WORD_RE.match(text, idx)
+        return idx, (word.end() - idx) if word else 0
+
+    def _snippet_at(self, text: str, idx: int, length: int, context_chars: int = 150) -> str:
+        """Extract snippet around a known match offset."""
         start = max(0, idx - context_chars // 2)
-        end = min(len(text), idx + len(query) + context_chars // 2)
+        end = min(len(text), idx + length + context_chars // 2)
 
         snippet = text[start:end]
         if start > 0:
@@ -426,16 +1198,60 @@ class WormSkill:
 
 
 # CLI interface
+def run_batch(input_path: str, output_path: Optional[str] = None, workers: int = 1,
+              passages: bool = False) -> int:
+    """Stream JSONL requests from a file (or '-' for stdin) to JSONL responses."""
+    import os
+    import sys
+    import time
+    from worm_batch import read_jsonl, write_jsonl
+
+    skill = WormSkill(passages=passages)
+    workers = workers or os.cpu_count() or 1
+
+    in_stream = sys.stdin if input_path == "-" else open(input_path, "r", encoding="utf-8")
+    out_stream = sys.stdout if output_path in (None, "-") else open(output_path, "w", encoding="utf-8")
+    start = time.perf_counter()
+    try:
+        stats = write_jsonl(skill.process_batch(read_jsonl(in_stream), workers=workers), out_stream)
+    finally:
+        if in_stream is not sys.stdin:
+            in_stream.close()
+        if out_stream is not sys.stdout:
+            out_stream.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"[+] Processed {stats['records']} records ({stats['errors']} errors) "
+          f"in {elapsed:.2f}s with {workers} worker(s): "
+          f"{stats['records'] / elapsed if elapsed else 0:.0f} records/s", file=sys.stderr)
+    return 0
+
+
 def main():
     import sys
     import io
+    import argparse
 
     # Fix Windows console encoding
     if sys.platform == 'win32':
         sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
         sys.stdin = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
 
-    skill = WormSkill()
+    parser = argparse.ArgumentParser(description="Worm Trigger-Power PRT Skill")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="Process JSONL requests from FILE ('-' for stdin) instead of the interactive prompt")
+    parser.add_argument("-o", "--output", metavar="FILE",
+                        help="Write JSONL responses to FILE (default: stdout)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for --batch (0 = one per CPU core)")
+    parser.add_argument("--passages", action="store_true",
+                        help="Cite the closest KB passages in reasoning sources (needs NumPy)")
+    args = parser.parse_args()
+
+    if args.batch:
+        sys.exit(run_batch(args.batch, args.output, args.workers, args.passages))
+
+    skill = WormSkill(passages=args.passages)
 
     print("=== Worm Trigger-Power PRT Skill ===")
     print("Mode: 1) trigger_to_power  2) power_to_trigger  3) search")
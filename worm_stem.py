@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Russian/English stemming shared by the search index and keyword analysis.
+
+Half the corpus is Russian, where inflection (триггер, триггера, триггеры,
+триггеров) defeats plain string matching. Every word is reduced to a stem:
+Cyrillic words with the Snowball Russian algorithm, Latin words with the
+Porter algorithm, anything else (numbers, mixed scripts) is left as is.
+
+Stems are memoized in a term -> stem table, so normalizing a word seen
+before is a dict lookup.
+"""
+
+import re
+from typing import Dict, Optional
+
+
+# Bump when stemming output changes so stemmed artifacts are rebuilt
+STEMMER_VERSION = 1
+
+# Upper bound on memoized stems (the table is cleared when it is reached)
+STEM_CACHE_SIZE = 200_000
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_CYRILLIC_RE = re.compile(r"[а-яё]")
+
+_stem_cache: Dict[str, str] = {}
+
+
+# --- English: Porter (1980) -------------------------------------------------
+
+def _is_consonant(word: str, i: int) -> bool:
+    ch = word[i]
+    if ch in "aeiou":
+        return False
+    if ch == "y":
+        return i == 0 or not _is_consonant(word, i - 1)
+    return True
+
+
+def _measure(stem: str) -> int:
+    """Porter's m: number of vowel-consonant sequences in [C](VC)^m[V]."""
+    m = 0
+    previous_vowel = False
+    for i in range(len(stem)):
+        vowel = not _is_consonant(stem, i)
+        if previous_vowel and not vowel:
+            m += 1
+        previous_vowel = vowel
+    return m
+
+
+def _has_vowel(stem: str) -> bool:
+    return any(not _is_consonant(stem, i) for i in range(len(stem)))
+
+
+def _ends_double_consonant(word: str) -> bool:
+    return len(word) >= 2 and word[-1] == word[-2] and _is_consonant(word, len(word) - 1)
+
+
+def _ends_cvc(word: str) -> bool:
+    return (len(word) >= 3 and _is_consonant(word, len(word) - 3) and not _is_consonant(word, len(word) - 2)
+            and _is_consonant(word, len(word) - 1) and word[-1] not in "wxy")
+
+
+_PORTER_STEP2 = [
+    ("ational", "ate"), ("tional", "tion"), ("enci", "ence"), ("anci", "ance"), ("izer", "ize"),
+    ("abli", "able"), ("alli", "al"), ("entli", "ent"), ("eli", "e"), ("ousli", "ous"),
+    ("ization", "ize"), ("ation", "ate"), ("ator", "ate"), ("alism", "al"), ("iveness", "ive"),
+    ("fulness", "ful"), ("ousness", "ous"), ("aliti", "al"), ("iviti", "ive"), ("biliti", "ble"),
+]
+_PORTER_STEP3 = [
+    ("icate", "ic"), ("ative", ""), ("alize", "al"), ("iciti", "ic"), ("ical", "ic"), ("ful", ""), ("ness", ""),
+]
+_PORTER_STEP4 = [
+    "al", "ance", "ence", "er", "ic", "able", "ible", "ant", "ement", "ment", "ent", "ion",
+    "ou", "ism", "ate", "iti", "ous", "ive", "ize",
+]
+
+
+def _replace_longest(word: str, rules, min_measure: int) -> str:
+    """Apply the rule for the longest matching suffix if the remaining stem is long enough."""
+    for suffix, replacement in sorted(rules, key=lambda rule: -len(rule[0])):
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            if suffix == "ion" and not stem.endswith(("s", "t")):
+                return word
+            return stem + replacement if _measure(stem) > min_measure else word
+    return word
+
+
+def stem_en(word: str) -> str:
+    """Porter stem of a lowercase English word."""
+    if len(word) <= 2:
+        return word
+
+    # Step 1a: plurals
+    if word.endswith("sses"):
+        word = word[:-2]
+    elif word.endswith("ies"):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+
+    # Step 1b: -eed, -ed, -ing
+    if word.endswith("eed"):
+        if _measure(word[:-3]) > 0:
+            word = word[:-1]
+    else:
+        for suffix in ("ed", "ing"):
+            if word.endswith(suffix) and _has_vowel(word[:-len(suffix)]):
+                word = word[:-len(suffix)]
+                if word.endswith(("at", "bl", "iz")):
+                    word += "e"
+                elif _ends_double_consonant(word) and word[-1] not in "lsz":
+                    word = word[:-1]
+                elif _measure(word) == 1 and _ends_cvc(word):
+                    word += "e"
+                break
+
+    # Step 1c: terminal y
+    if word.endswith("y") and _has_vowel(word[:-1]):
+        word = word[:-1] + "i"
+
+    # Steps 2-4: derivational suffixes
+    word = _replace_longest(word, _PORTER_STEP2, 0)
+    word = _replace_longest(word, _PORTER_STEP3, 0)
+    word = _replace_longest(word, [(suffix, "") for suffix in _PORTER_STEP4], 1)
+
+    # Step 5: final -e, double l
+    if word.endswith("e"):
+        stem = word[:-1]
+        m = _measure(stem)
+        if m > 1 or (m == 1 and not _ends_cvc(stem)):
+            word = stem
+    if word.endswith("ll") and _measure(word) > 1:
+        word = word[:-1]
+
+    return word
+
+
+# --- Russian: Snowball -------------------------------------------------------
+
+_RU_VOWELS = "аеиоуыэюя"
+
+
+def _ru_suffixes(*groups: str):
+    """Space-separated suffix lists, longest first."""
+    return sorted((suffix for group in groups for suffix in group.split()), key=len, reverse=True)
+
+
+_RU_PERFECTIVE_1 = _ru_suffixes("в вши вшись")
+_RU_PERFECTIVE_2 = _ru_suffixes("ив ивши ившись ыв ывши ывшись")
+_RU_REFLEXIVE = _ru_suffixes("ся сь")
+_RU_ADJECTIVE = _ru_suffixes("ее ие ые ое ими ыми ей ий ый ой ем им ым ом его ого ему ому их ых ую юю ая яя ою ею")
+_RU_PARTICIPLE_1 = _ru_suffixes("ем нн вш ющ щ")
+_RU_PARTICIPLE_2 = _ru_suffixes("ивш ывш ующ")
+_RU_VERB_1 = _ru_suffixes("ла на ете йте ли й л ем н ло но ет ют ны ть ешь нно")
+_RU_VERB_2 = _ru_suffixes("ила ыла ена ейте уйте ите или ыли ей уй ил ыл им ым ен ило ыло ено ят ует уют ит ыт "
+                          "ены ить ыть ишь ую ю")
+_RU_NOUN = _ru_suffixes("а ев ов ие ье е иями ями ами еи ии и ией ей ой ий й иям ям ием ем ам ом о у ах иях ях "
+                        "ы ь ию ью ю ия ья я")
+_RU_SUPERLATIVE = _ru_suffixes("ейш ейше")
+_RU_DERIVATIONAL = _ru_suffixes("ост ость")
+
+
+def _ru_strip(rv: str, suffixes, after_a: bool = False) -> Optional[str]:
+    """Remove the longest matching suffix from rv (group 1 suffixes must follow а/я)."""
+    for suffix in suffixes:
+        if rv.endswith(suffix):
+            stem = rv[:-len(suffix)]
+            if after_a and not stem.endswith(("а", "я")):
+                continue
+            return stem
+    return None
+
+
+def _ru_strip_groups(rv: str, group1, group2) -> Optional[str]:
+    """Longest match across a group-1 (after а/я) and a group-2 suffix list."""
+    best = None
+    for suffixes, after_a in ((group1, True), (group2, False)):
+        stem = _ru_strip(rv, suffixes, after_a)
+        if stem is not None and (best is None or len(stem) < len(best)):
+            best = stem
+    return best
+
+
+def _ru_regions(word: str):
+    """Start offsets of RV and R2."""
+    rv = len(word)
+    for i, ch in enumerate(word):
+        if ch in _RU_VOWELS:
+            rv = i + 1
+            break
+
+    def next_region(start: int) -> int:
+        for i in range(start + 1, len(word)):
+            if word[i] not in _RU_VOWELS and word[i - 1] in _RU_VOWELS:
+                return i + 1
+        return len(word)
+
+    return rv, next_region(next_region(0))
+
+
+def stem_ru(word: str) -> str:
+    """Snowball stem of a lowercase Russian word."""
+    word = word.replace("ё", "е")
+    rv_start, r2_start = _ru_regions(word)
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    # Step 1: perfective gerund, else reflexive + adjectival / verb / noun
+    stem = _ru_strip_groups(rv, _RU_PERFECTIVE_1, _RU_PERFECTIVE_2)
+    if stem is not None:
+        rv = stem
+    else:
+        reflexive = _ru_strip(rv, _RU_REFLEXIVE)
+        if reflexive is not None:
+            rv = reflexive
+        stem = _ru_strip(rv, _RU_ADJECTIVE)
+        if stem is not None:
+            participle = _ru_strip_groups(stem, _RU_PARTICIPLE_1, _RU_PARTICIPLE_2)
+            rv = participle if participle is not None else stem
+        else:
+            stem = _ru_strip_groups(rv, _RU_VERB_1, _RU_VERB_2)
+            if stem is None:
+                stem = _ru_strip(rv, _RU_NOUN)
+            if stem is not None:
+                rv = stem
+
+    # Step 2: и
+    if rv.endswith("и"):
+        rv = rv[:-1]
+
+    # Step 3: derivational ост(ь) inside R2
+    for suffix in _RU_DERIVATIONAL:
+        if rv.endswith(suffix) and rv_start + len(rv) - len(suffix) >= r2_start:
+            rv = rv[:-len(suffix)]
+            break
+
+    # Step 4: superlative, нн, ь
+    if rv.endswith("нн"):
+        rv = rv[:-1]
+    else:
+        stem = _ru_strip(rv, _RU_SUPERLATIVE)
+        if stem is not None:
+            rv = stem[:-1] if stem.endswith("нн") else stem
+        elif rv.endswith("ь"):
+            rv = rv[:-1]
+
+    return prefix + rv
+
+
+# --- Shared entry points -----------------------------------------------------
+
+def stem(term: str) -> str:
+    """Stem of one normalized (lowercase) term, memoized."""
+    cached = _stem_cache.get(term)
+    if cached is not None:
+        return cached
+
+    if _CYRILLIC_RE.search(term):
+        result = stem_ru(term)
+    elif term.isascii() and term.isalpha():
+        result = stem_en(term)
+    else:
+        result = term
+
+    if len(_stem_cache) >= STEM_CACHE_SIZE:
+        _stem_cache.clear()
+    _stem_cache[term] = result
+    return result
+
+
+def stem_text(text: str) -> str:
+    """Lowercase text with every word replaced by its stem (punctuation and spacing kept)."""
+    return _WORD_RE.sub(lambda match: stem(match.group()), text.lower())
+
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Compact on-disk page store for the Worm knowledge base.
+
+Every searchable document (PDF page chunk or wiki section chunk) is written as UTF-8
+into a single blob file, with a small JSON offset table alongside it. The
+blob is memory-mapped, so opening the store costs the same however large the
+corpus is and only the chunks a search actually touches are decoded.
+
+    worm_knowledge_base.pages.bin    concatenated UTF-8 document texts
+    worm_knowledge_base.pages.json   {"format", "kb", "bounds": [0, end0, end1, ...]}
+"""
+
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from worm_index import iter_kb_documents
+
+
+# Bump when the on-disk layout changes so stale stores are rebuilt
+STORE_FORMAT = 4
+
+
+def store_paths_for(kb_path: Path) -> Tuple[Path, Path]:
+    """Return (blob, offset table) paths stored next to a knowledge base file."""
+    return (kb_path.with_name(kb_path.stem + ".pages.bin"),
+            kb_path.with_name(kb_path.stem + ".pages.json"))
+
+
+class PageStore:
+    """Random access to page texts by document id."""
+
+    def __init__(self, buffer: Union[mmap.mmap, bytes], bounds: List[int]):
+        """
+        Args:
+            buffer: UTF-8 blob (memory-mapped file or in-memory bytes)
+            bounds: Byte boundaries, document i spans bounds[i]:bounds[i + 1]
+        """
+        self._buffer = buffer
+        self._bounds = bounds
+
+    def __len__(self) -> int:
+        return len(self._bounds) - 1
+
+    def text(self, doc_id: int) -> str:
+        """Decode a single document's text."""
+        return self._buffer[self._bounds[doc_id]:self._bounds[doc_id + 1]].decode("utf-8")
+
+    def size(self, doc_id: int) -> int:
+        """Encoded length of a document in bytes (without decoding it)."""
+        return self._bounds[doc_id + 1] - self._bounds[doc_id]
+
+    def close(self) -> None:
+        """Release the memory map (no-op for in-memory stores)."""
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    @classmethod
+    def open(cls, kb_path: Path, fingerprint: Dict[str, int]) -> Optional["PageStore"]:
+        """Memory-map a persisted store, or None if it is missing or stale."""
+        blob_path, table_path = store_paths_for(kb_path)
+        try:
+            with open(table_path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if table.get("format") != STORE_FORMAT or table.get("kb") != fingerprint:
+            return None
+
+        try:
+            with open(blob_path, "rb") as f:
+                if os.fstat(f.fileno()).st_size != table["bounds"][-1]:
+                    return None
+                # mmap cannot map an empty file
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if table["bounds"][-1] else b""
+        except OSError:
+            return None
+
+        return cls(buffer, table["bounds"])
+
+    @classmethod
+    def build(cls, knowledge_base: Dict[str, Any]) -> "PageStore":
+        """Build an in-memory store from a loaded knowledge base (same doc ids as the index)."""
+        chunks = []
+        bounds = [0]
+        for _, text in iter_kb_documents(knowledge_base):
+            data = text.encode("utf-8")
+            chunks.append(data)
+            bounds.append(bounds[-1] + len(data))
+
+        return cls(b"".join(chunks), bounds)
+
+    def save(self, kb_path: Path, fingerprint: Dict[str, int]) -> None:
+        """Persist blob and offset table atomically (temp files, then rename)."""
+        blob_path, table_path = store_paths_for(kb_path)
+
+        tmp_blob = blob_path.with_name(blob_path.name + ".tmp")
+        with open(tmp_blob, "wb") as f:
+            f.write(self._buffer[:])
+        os.replace(tmp_blob, blob_path)
+
+        # The table is written last: a store is only valid once it names the KB
+        tmp_table = table_path.with_name(table_path.name + ".tmp")
+        with open(tmp_table, "w", encoding="utf-8") as f:
+            json.dump({"format": STORE_FORMAT, "kb": fingerprint, "bounds": self._bounds}, f)
+        os.replace(tmp_table, table_path)
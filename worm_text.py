@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Text normalization and chunking helpers shared by extraction, the knowledge
+base index and search.
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+# Word characters cover both Latin and Cyrillic text in the corpus
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Blank line (PDF extraction pads them with spaces and zero-width spaces)
+PARAGRAPH_BREAK_RE = re.compile(r"\n[ \t\r\f\v\u200b]*\n")
+
+# Sentence end followed by whitespace
+SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?…])\s+")
+
+# Characters trimmed from chunk edges
+EDGE_WHITESPACE = " \t\r\n\f\v\u200b"
+
+# Target chunk size in characters
+CHUNK_MAX_CHARS = 600
+
+
+def normalize(text: str) -> str:
+    """Canonical form for matching: NFKC (unfolds ligatures, full-width forms) + lowercase."""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def iter_tokens(text: str) -> Iterator[Tuple[str, int]]:
+    """Yield (normalized term, char_offset) pairs for every word in text."""
+    for match in TOKEN_RE.finditer(text):
+        term = match.group()
+        yield (normalize(term) if not term.isascii() else term.lower()), match.start()
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized terms."""
+    return [term for term, _ in iter_tokens(text)]
+
+
+def _spans(text: str, separator: "re.Pattern", start: int, end: int) -> List[Tuple[int, int]]:
+    """Non-empty, edge-trimmed spans of text[start:end] between separators."""
+    spans = []
+    pos = start
+    for match in list(separator.finditer(text, start, end)) + [None]:
+        piece_end = match.start() if match else end
+        piece = text[pos:piece_end]
+        stripped = piece.strip(EDGE_WHITESPACE)
+        if stripped:
+            left = pos + len(piece) - len(piece.lstrip(EDGE_WHITESPACE))
+            spans.append((left, left + len(stripped)))
+        if match:
+            pos = match.end()
+    return spans
+
+
+def _hard_split(text: str, start: int, end: int, max_chars: int) -> List[Tuple[int, int]]:
+    """Split an over-long span at whitespace near max_chars."""
+    spans = []
+    while end - start > max_chars:
+        cut = text.rfind(" ", start + max_chars // 2, start + max_chars)
+        cut = cut if cut != -1 else start + max_chars
+        spans.append((start, cut))
+        start = cut
+        while start < end and text[start] in EDGE_WHITESPACE:
+            start += 1
+    if start < end:
+        spans.append((start, end))
+    return spans
+
+
+def _pack(spans: List[Tuple[int, int]], max_chars: int) -> List[Tuple[int, int]]:
+    """Merge adjacent spans while the merged span stays within max_chars."""
+    packed: List[Tuple[int, int]] = []
+    for start, end in spans:
+        if packed and end - packed[-1][0] <= max_chars:
+            packed[-1] = (packed[-1][0], end)
+        else:
+            packed.append((start, end))
+    return packed
+
+
+def split_chunks(text: str, max_chars: int = CHUNK_MAX_CHARS) -> List[Tuple[int, int]]:
+    """
+    Split text into paragraph-sized chunks.
+
+    Paragraphs are packed together up to max_chars; longer paragraphs are
+    split at sentence boundaries (and at whitespace as a last resort).
+
+    Returns:
+        (start, end) character offsets into text
+    """
+    pieces: List[Tuple[int, int]] = []
+    for start, end in _spans(text, PARAGRAPH_BREAK_RE, 0, len(text)):
+        if end - start <= max_chars:
+            pieces.append((start, end))
+            continue
+        for s_start, s_end in _pack(_spans(text, SENTENCE_BREAK_RE, start, end), max_chars):
+            pieces.extend(_hard_split(text, s_start, s_end, max_chars))
+
+    return _pack(pieces, max_chars)
+
+
+def chunk_id(source: str, page: int, number: int) -> str:
+    """Stable chunk identifier: same source, page and position give the same id."""
+    return f"{source}#p{page}.{number}"
+
+
+def chunk_page(source: str, page: int, text: str) -> List[Dict[str, Any]]:
+    """Chunk records (id + character offsets into the page text) for one page."""
+    return [
+        {"id": chunk_id(source, page, n), "start": start, "end": end}
+        for n, (start, end) in enumerate(split_chunks(text))
+    ]